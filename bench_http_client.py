@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+# global imports
+from optparse import OptionParser
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import urllib.request
+import threading
+import json
+import time
+import ssl
+import logging
+# local imports
+import utils
+import http_client
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    body = json.dumps({'2.4GHz': [{'band': '2.4GHz', 'air_load': 30, 'interference': 2, 'channel': 6}] * 4}).encode()
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def get_with_urlopen(url):
+    context = ssl._create_unverified_context()
+    with urllib.request.urlopen(urllib.request.Request(url), context=context) as response:
+        return json.loads(response.read().decode('utf8'))
+
+
+def bench(name, func, url, requests):
+    t1 = time.monotonic()
+    for i in range(requests):
+        func(url)
+    elapsed = time.monotonic() - t1
+    utils.logger.log(logging.INFO, "{}: {} requests in {:.3f}sec ({:.3f}ms/request)".format(
+        name, requests, elapsed, elapsed * 1000.0 / requests))
+    return elapsed
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('--requests', dest='requests', type='int', default=2000, help='number of requests per client, default: 2000 (optional)')
+    (opts, args) = parser.parse_args()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = 'http://127.0.0.1:{}/wifi_monitoring/air_data'.format(server.server_address[1])
+    client = http_client.HttpClient()
+    legacy = bench('urlopen per request', get_with_urlopen, url, opts.requests)
+    pooled = bench('HttpClient keep-alive', client.get_json, url, opts.requests)
+    utils.logger.log(logging.INFO, "speedup: {:.2f}x".format(legacy / pooled))
+    client.close()
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+# global imports
+from optparse import OptionParser
+import os
+import glob
+import time
+import shutil
+import tempfile
+import logging
+# local imports
+import utils
+import make_summary
+
+
+def make_results(dir_path, files, work_dirs, rows):
+    # per scenario band summaries as mini_data_collector writes them: header, sample rows, averages row
+    header = 'time [sec],sample time [sec],nominal bit rate [Kbps]' + ',metric' * 26
+    row = '30.0,30.012,40000,60000, 8,10.6,33.9,Failed!,44.5,70,80,60,5,6,70,40,2,3,5,35756.0,3,100000,1000,-40,37.7,50.9,-90,3.8'
+    avg_row = ',,,,,10.4,33.7,Failed!,44.2,70.0,80.0,60.0,5.0,,70.0,40.0,2.0,3.0,5.0,35822.9,3.0,100000.0,1000.0,-40.0,35.5,50.5,-90.0,2.3,'
+    body = '\n'.join([header] + [row] * rows + [avg_row]) + '\n'
+    for i in range(files):
+        work_dir = os.path.join(dir_path, '1018{:04d}_1.2.{}'.format(i % work_dirs, i % work_dirs))
+        os.makedirs(work_dir, exist_ok=True)
+        fn = os.path.join(work_dir, 'TP{}_dut_ch6_40000_int_ch{}_60000_2.4GHz.csv'.format(i, 1 + i % 11))
+        with open(fn, 'w') as fh:
+            fh.write(body)
+
+
+def legacy_scan(dir_path, out_file):
+    # the previous make_summary: glob and readlines()[-1] of every file, one after the other
+    with open(out_file, 'w') as out:
+        out.write(','.join(make_summary.SUMMARY_HEADER) + '\n')
+        for fn in glob.glob(os.path.join(dir_path, '**', '*.csv'), recursive=True):
+            scenario_id = os.path.basename(fn)
+            scenario_id = scenario_id[: scenario_id.find('.csv')]
+            last_line = open(fn, 'r').readlines()[-1]
+            out.write(','.join([scenario_id] + [item for item in last_line.split(',') if len(item.strip()) > 0]) + '\n')
+
+
+def bench(name, func, *args):
+    t1 = time.monotonic()
+    func(*args)
+    elapsed = time.monotonic() - t1
+    utils.logger.log(logging.INFO, "{}: {:.3f}sec".format(name, elapsed))
+    return elapsed
+
+
+def summary_gen(dir_path, out_file, index_file=None, workers=8):
+    make_summary.SummaryGen(dir_path=[dir_path], out_file=out_file, index_file=index_file, recursive=True,
+                            workers=workers).run()
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('--files', dest='files', type='int', default=10000, help='number of synthetic result files, default: 10000 (optional)')
+    parser.add_option('--work-dirs', dest='work_dirs', type='int', default=20, help='number of work dirs they are spread over, default: 20 (optional)')
+    parser.add_option('--rows', dest='rows', type='int', default=1200, help='sample rows per result file, default: 1200, a 20 minute scenario sampled every second; with a few dozen rows the whole file is one read and tail-seek gains nothing (optional)')
+    parser.add_option('--workers', dest='workers', type='int', default=8, help='threads of the parallel scan, default: 8 (optional)')
+    (opts, args) = parser.parse_args()
+    utils.logger.setLevel(logging.INFO)
+    tmp_dir = tempfile.mkdtemp(prefix='bench_make_summary_')
+    try:
+        results_dir = os.path.join(tmp_dir, 'results')
+        make_results(results_dir, opts.files, opts.work_dirs, opts.rows)
+        index_file = os.path.join(tmp_dir, 'result_index.db')
+        out_file = os.path.join(tmp_dir, 'summary.csv')
+        legacy = bench('readlines scan of {} files'.format(opts.files), legacy_scan, results_dir, out_file)
+        serial = bench('tail-seek scan, 1 worker', summary_gen, results_dir, out_file, None, 1)
+        parallel = bench('tail-seek scan, {} workers'.format(opts.workers), summary_gen, results_dir, out_file, None,
+                         opts.workers)
+        bench('first run with an index file', summary_gen, results_dir, out_file, index_file, opts.workers)
+        incremental = bench('rerun with an up to date index file', summary_gen, results_dir, out_file, index_file,
+                            opts.workers)
+        utils.logger.log(logging.INFO, "speedup: tail-seek {:.2f}x, parallel {:.2f}x, incremental {:.2f}x".format(
+            legacy / serial, legacy / parallel, legacy / incremental))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+if __name__ == "__main__":
+    main()
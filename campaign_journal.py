@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+# global imports
+import os
+import json
+import time
+import threading
+
+
+class CampaignJournal(object):
+    # append-only JSON lines file: one 'campaign' record per started campaign followed by 'started', 'done' and
+    # 'failed' records per scenario; the last record of a scenario is its state, so a crash never loses more
+    # than the scenario that was running
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.campaign = None
+        self.scenarios = {}
+
+    def load(self):
+        # state of the last campaign in the file
+        self.campaign = None
+        self.scenarios = {}
+        if not os.path.isfile(self.path):
+            return self.campaign
+        with open(self.path, 'r') as fh:
+            for line in fh:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # torn write of the record that was being appended when the process died
+                    continue
+                if record.get('event') == 'campaign':
+                    self.campaign = record
+                    self.scenarios = {}
+                elif 'scenario_id' in record:
+                    self.scenarios[record['scenario_id']] = record
+        return self.campaign
+
+    def append(self, record):
+        record['time'] = time.time()
+        line = json.dumps(record, sort_keys=True) + '\n'
+        with self.lock:
+            with open(self.path, 'a+') as fh:
+                # a torn last record is closed off first, otherwise this one would be lost on the same line
+                if fh.tell() > 0:
+                    fh.seek(fh.tell() - 1)
+                    if fh.read(1) != '\n':
+                        line = '\n' + line
+                fh.write(line)
+                fh.flush()
+                os.fsync(fh.fileno())
+            if record.get('event') == 'campaign':
+                self.campaign = record
+                self.scenarios = {}
+            elif 'scenario_id' in record:
+                self.scenarios[record['scenario_id']] = record
+
+    def start_campaign(self, work_dir, tests_file):
+        self.append({'event': 'campaign', 'work_dir': work_dir, 'tests_file': tests_file})
+
+    def status(self, scenario_id):
+        with self.lock:
+            record = self.scenarios.get(scenario_id)
+        return record['event'] if record else None
+
+    def is_done(self, scenario_id):
+        return self.status(scenario_id) == 'done'
+
+    def scenario_started(self, scenario_id, rig_name):
+        self.append({'event': 'started', 'scenario_id': scenario_id, 'rig': rig_name})
+
+    def scenario_finished(self, scenario_id, rig_name, started, outputs, error=None):
+        record = {'event': 'failed' if error else 'done', 'scenario_id': scenario_id, 'rig': rig_name,
+                  'started': started, 'duration': round(time.time() - started, 3), 'outputs': outputs}
+        if error:
+            record['error'] = str(error)
+        self.append(record)
+
+    def finished(self, rig_name):
+        # scenarios the rig ran to their end, passed or not
+        with self.lock:
+            return len([record for record in self.scenarios.values()
+                        if record['event'] in ('done', 'failed') and record.get('rig') == rig_name])
+
+    def counts(self):
+        with self.lock:
+            events = [record['event'] for record in self.scenarios.values()]
+        return dict((event, events.count(event)) for event in set(events))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+# global imports
+import logging
+# local imports
+import utils
+
+
+class ScenarioPlanner(object):
+    # rows are [test id, dut_channel, dut_data, int_channel, int_data]
+    DEFAULT_COSTS = {'scenario_overhead': 30.0,     # station preparation, iperf start/stop [sec]
+                     'channel_change_cost': 20.0,   # serial login and interferer retune [sec]
+                     'bitrate_change_cost': 5.0,    # link adaptation to a new DUT load [sec]
+                     'reboot_cost': 240.0}          # both routers back on the management url [sec]
+
+    def __init__(self, duration, delay, reboot_every=5, costs=None):
+        self.duration = float(duration)
+        self.delay = float(delay)
+        self.reboot_every = reboot_every
+        self.costs = dict(ScenarioPlanner.DEFAULT_COSTS)
+        self.costs.update(costs or {})
+        self.utils = utils.Utils()
+
+    @classmethod
+    def read_costs(cls, parser):
+        return dict((k, parser.getfloat('planner', k, fallback=v)) for k, v in cls.DEFAULT_COSTS.items())
+
+    def transition_cost(self, prev, row):
+        # prev is None at the start of the campaign and right after a reboot, when nothing is configured
+        cost = self.costs['scenario_overhead'] + self.delay + self.duration
+        if prev is None or prev[3] != row[3]:
+            cost += self.costs['channel_change_cost']
+        if prev is None or prev[2] != row[2]:
+            cost += self.costs['bitrate_change_cost']
+        return cost
+
+    def step_costs(self, rows):
+        costs = []
+        prev = None
+        for i, row in enumerate(rows):
+            cost = self.transition_cost(prev, row)
+            prev = row
+            if self.reboot_every and (i + 1) % self.reboot_every == 0:
+                cost += self.costs['reboot_cost']
+                prev = None
+            costs.append(cost)
+        return costs
+
+    def estimate(self, rows):
+        return sum(self.step_costs(rows))
+
+    def plan(self, rows):
+        # greedy nearest neighbour over the transition costs; ties keep the file order
+        remaining = list(rows)
+        planned = []
+        prev = None
+        while remaining:
+            best = min(range(len(remaining)), key=lambda i: self.transition_cost(prev, remaining[i]))
+            row = remaining.pop(best)
+            planned.append(row)
+            prev = None if self.reboot_every and len(planned) % self.reboot_every == 0 else row
+        return planned
+
+    def split(self, rows, num_of_rigs):
+        # every rig reboots after its own reboot_every tests, so one global order would be cut apart between the
+        # rigs; instead rows of one configuration (interferer channel, DUT load) are chunked by the reboot
+        # cadence, the chunks go longest first to the rig with the least planned time and every rig's rows are
+        # planned on their own
+        groups = {}
+        for row in rows:
+            groups.setdefault((row[3], row[2]), []).append(row)
+        size = self.reboot_every or len(rows)
+        chunks = [group[i:i + size] for group in groups.values() for i in range(0, len(group), size)]
+        loads = [0.0] * num_of_rigs
+        rig_rows = [[] for i in range(num_of_rigs)]
+        for chunk in sorted(chunks, key=self.estimate, reverse=True):
+            i = loads.index(min(loads))
+            rig_rows[i] += chunk
+            loads[i] += self.estimate(chunk)
+        return [self.plan(r) for r in rig_rows]
+
+    def log_plan(self, rows, num_of_rigs=1, rig_name=None):
+        self.utils.log(logging.INFO, "planned order{} (test id, dut_channel, dut_data, int_channel, int_data, "
+                                     "est. sec):".format(' of ' + rig_name if rig_name else ''))
+        for row, cost in zip(rows, self.step_costs(rows)):
+            self.utils.log(logging.INFO, "{} {:.0f}".format(row, cost))
+        total = self.estimate(rows) / num_of_rigs
+        self.utils.log(logging.INFO, "estimated runtime: {:.0f}sec ({:.1f}h) on {}".format(
+            total, total / 3600.0, rig_name or '{} rig(s)'.format(num_of_rigs)))
+        return total
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+# global imports
+import os
+import atexit
+import threading
+
+
+class FileWriterPool(object):
+    # drop-in replacement for Utils.write2file: one open handle per output file, rows are batched in memory
+    # and pushed to the OS when a batch is full, every flush_interval seconds and at interpreter shutdown
+    def __init__(self, batch_size=64, flush_interval=5.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.handles = {}
+        self.buffers = {}
+        self.lock = threading.RLock()
+        self.stop_event = None
+        self.registered = False
+
+    def start_timer(self):
+        with self.lock:
+            if self.stop_event is None and self.flush_interval:
+                self.stop_event = threading.Event()
+                threading.Thread(target=self.flush_periodically, args=(self.stop_event,), daemon=True).start()
+
+    def flush_periodically(self, stop_event):
+        while not stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def write(self, fn, mode, data, sep='\n'):
+        with self.lock:
+            if not self.registered:
+                atexit.register(self.close)
+                self.registered = True
+            if mode.startswith('w') or fn not in self.handles:
+                self.close_file(fn)
+                self.handles[fn] = open(fn, mode=mode)
+                self.buffers[fn] = []
+            self.buffers[fn].append(data + sep)
+            if len(self.buffers[fn]) >= self.batch_size:
+                self.flush_file(fn)
+        self.start_timer()
+
+    def flush_file(self, fn, sync=False):
+        handle = self.handles.get(fn)
+        if handle is None:
+            return
+        if self.buffers[fn]:
+            handle.writelines(self.buffers[fn])
+            self.buffers[fn] = []
+        handle.flush()
+        if sync:
+            os.fsync(handle.fileno())
+
+    def flush(self, fn=None):
+        with self.lock:
+            for name in [fn] if fn is not None else list(self.handles):
+                self.flush_file(name)
+
+    def close_file(self, fn):
+        with self.lock:
+            if fn in self.handles:
+                self.flush_file(fn, sync=True)
+                self.handles.pop(fn).close()
+                del self.buffers[fn]
+
+    def rotate(self, fn, rotated_fn, header=None):
+        # the current content is synced and atomically renamed to rotated_fn; the fresh fn (with its header) is
+        # written to a temp file, synced and renamed into place, so after a crash every file that exists is
+        # complete. Writing continues into the fresh fn
+        with self.lock:
+            self.close_file(fn)
+            if os.path.exists(fn):
+                os.replace(fn, rotated_fn)
+            tmp_fn = fn + '.tmp'
+            with open(tmp_fn, mode='w') as fh:
+                if header is not None:
+                    fh.write(header + '\n')
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp_fn, fn)
+            FileWriterPool.sync_dir(fn)
+            self.handles[fn] = open(fn, mode='a')
+            self.buffers[fn] = []
+
+    @classmethod
+    def sync_dir(cls, fn):
+        # the renames are only durable once the directory entry is
+        fd = os.open(os.path.dirname(os.path.abspath(fn)), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        with self.lock:
+            if self.stop_event is not None:
+                self.stop_event.set()
+                self.stop_event = None
+            for fn in list(self.handles):
+                self.close_file(fn)
+            if self.registered:
+                atexit.unregister(self.close)
+                self.registered = False
+
+
+class TrailerFile(object):
+    # header and rows are only appended, the single trailer line after them is rewritten in place, so the file
+    # on disk is complete after every row; an update costs one seek, two writes and a truncate
+    def __init__(self, fn, header):
+        self.fn = fn
+        self.handle = open(fn, mode='w')
+        self.handle.write(header + '\n')
+        self.trailer_pos = self.handle.tell()
+
+    def append(self, row, trailer):
+        self.handle.seek(self.trailer_pos)
+        if row is not None:
+            self.handle.write(row + '\n')
+            self.trailer_pos = self.handle.tell()
+        self.handle.write(trailer + '\n')
+        self.handle.truncate()
+        self.handle.flush()
+
+    def close(self):
+        if not self.handle.closed:
+            self.handle.flush()
+            os.fsync(self.handle.fileno())
+            self.handle.close()
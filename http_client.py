@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+# global imports
+import ssl
+import json
+import time
+import socket
+import threading
+import http.client
+import urllib.parse
+
+
+class HttpError(Exception):
+    def __init__(self, url, status, reason):
+        super(HttpError, self).__init__("HTTP {} {} for {}".format(status, reason, url))
+        self.status = status
+
+
+class HttpClient(object):
+    # keeps idle HTTP/1.1 connections per (scheme, host, port) so consecutive requests skip TCP/TLS setup;
+    # a connection is owned by one request at a time, which makes the client safe to share between threads
+    # errors of a keep-alive connection the server closed while it was idle
+    STALE_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, ConnectionAbortedError, BrokenPipeError)
+
+    def __init__(self, timeout=10, retries=2, backoff=0.5):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.context = ssl._create_unverified_context()
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    def new_connection(self, key):
+        scheme, host, port = key
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout, context=self.context)
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    def acquire(self, key, reuse=True):
+        with self.lock:
+            conns = self.idle.get(key)
+            if conns and reuse:
+                return conns.pop(), True
+        return self.new_connection(key), False
+
+    def release(self, key, conn):
+        with self.lock:
+            self.idle.setdefault(key, []).append(conn)
+
+    @classmethod
+    def set_timeout(cls, conn, timeout):
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+
+    def get_json(self, url, timeout=None):
+        # the timeout bounds the whole call: a keep-alive connection closed by the server is retried at once on a
+        # new one, timeouts, refused connections and 5xx answers up to `retries` times with a growing backoff,
+        # every try only gets what is left of the timeout
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        deadline = time.monotonic() + (timeout if timeout is not None else self.timeout)
+        reuse = True
+        attempt = 0
+        while True:
+            conn, reused = self.acquire(key, reuse)
+            self.set_timeout(conn, max(deadline - time.monotonic(), 0.001))
+            try:
+                conn.request('GET', path, headers={'Accept': 'application/json'})
+                response = conn.getresponse()
+                if response.status != 200:
+                    response.read()
+                    raise HttpError(url, response.status, response.reason)
+                data = json.load(response)
+            except HttpClient.STALE_ERRORS as err:
+                conn.close()
+                if reused:
+                    reuse = False
+                    continue
+                attempt = self.before_retry(err, attempt, deadline)
+                continue
+            except HttpError as err:
+                conn.close()
+                if err.status < 500:
+                    raise
+                attempt = self.before_retry(err, attempt, deadline)
+                continue
+            except (http.client.HTTPException, socket.error) as err:
+                conn.close()
+                attempt = self.before_retry(err, attempt, deadline)
+                continue
+            except ValueError:
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                self.release(key, conn)
+            return data
+
+    def before_retry(self, err, attempt, deadline):
+        # err goes to the caller once the retries are used up or the backoff would pass the deadline
+        attempt += 1
+        backoff = self.backoff * 2 ** (attempt - 1)
+        if attempt > self.retries or time.monotonic() + backoff >= deadline:
+            raise err
+        time.sleep(backoff)
+        return attempt
+
+    def close(self):
+        with self.lock:
+            conns = [conn for conns in self.idle.values() for conn in conns]
+            self.idle.clear()
+        for conn in conns:
+            conn.close()
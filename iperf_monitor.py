@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+# global imports
+import json
+import time
+import threading
+import logging
+
+
+logger = logging.getLogger()
+
+
+class IperfStreamError(Exception):
+    pass
+
+
+class IperfMonitor(object):
+    # reads the `iperf3 --json-stream` output of a client running in the foreground of an SSH channel line by
+    # line; a stream that fails, stalls or stays below min_ratio of the offered load for collapse_intervals
+    # consecutive intervals is reported as failed. A client that is not live (-J, iperf3 before 3.17) only
+    # reports at its end, so only its exit status is watched
+    def __init__(self, name, host_name, channel, nominal, live=True, min_ratio=0.1, collapse_intervals=3,
+                 stall_timeout=5.0):
+        self.name = name
+        self.host_name = host_name
+        self.channel = channel
+        self.nominal = float(nominal)
+        self.live = live
+        self.min_ratio = min_ratio
+        self.collapse_intervals = collapse_intervals
+        self.stall_timeout = stall_timeout
+        # [(wall clock at the interval end, achieved rate [Kbps])]
+        self.rates = []
+        self.low_intervals = 0
+        self.failure = None
+        self.stopping = False
+        # the client ran its full time and exited with 0
+        self.finished = False
+        self.exit_status = None
+        self.started = time.monotonic()
+        self.last_report = self.started
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.read_stream, name='iperf-' + name, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def read_stream(self):
+        buf = b''
+        while True:
+            chunk = self.channel.recv(4096)
+            if not chunk:
+                break
+            buf += chunk
+            while b'\n' in buf:
+                line, buf = buf.split(b'\n', 1)
+                self.handle_line(line)
+        if buf:
+            self.handle_line(buf)
+        rc = self.channel.recv_exit_status()
+        with self.lock:
+            self.exit_status = rc
+            if rc == 0 and self.failure is None:
+                self.finished = True
+            elif not self.stopping and self.failure is None:
+                self.failure = "iperf3 on {} exited with {}".format(self.host_name, rc)
+
+    def handle_line(self, line):
+        try:
+            event = json.loads(line.decode('utf-8', 'replace'))
+        except ValueError:
+            return
+        if event.get('event') == 'error':
+            with self.lock:
+                self.failure = "iperf3 on {}: {}".format(self.host_name, event.get('data'))
+        if event.get('event') != 'interval':
+            return
+        s = event.get('data', {}).get('sum', {})
+        if s.get('omitted'):
+            return
+        rate = s.get('bits_per_second', 0.0) / 1000.0
+        with self.lock:
+            self.rates.append((time.time(), rate))
+            self.last_report = time.monotonic()
+            self.low_intervals = self.low_intervals + 1 if rate < self.min_ratio * self.nominal else 0
+            if self.low_intervals >= self.collapse_intervals and self.failure is None:
+                self.failure = "iperf3 on {} collapsed to {:.0f}Kbps of {:.0f}Kbps offered".format(
+                    self.host_name, rate, self.nominal)
+
+    def is_running(self):
+        # for the start-up probe: a live client has reported, a -J client did not fail within its first second
+        with self.lock:
+            if self.rates or self.failure is not None or self.finished:
+                return True
+            return not self.live and time.monotonic() - self.started >= 1.0
+
+    def is_done(self):
+        with self.lock:
+            return self.exit_status is not None or self.failure is not None
+
+    def latest_rate(self):
+        with self.lock:
+            return self.rates[-1][1] if self.rates and not self.finished else float('nan')
+
+    def check(self):
+        # raises once the stream failed; called by the collector on every tick
+        with self.lock:
+            if self.live and not self.finished and self.failure is None and \
+                    time.monotonic() - self.last_report > self.stall_timeout:
+                self.failure = "no iperf3 report from {} for {:.0f}sec".format(self.host_name,
+                                                                                time.monotonic() - self.last_report)
+            failure = self.failure
+        if failure is not None:
+            raise IperfStreamError(failure)
+
+    def stop(self):
+        # an exit after stop() is expected; the channel itself ends when the process finishes or is killed
+        with self.lock:
+            self.stopping = True
+
+    def close(self):
+        self.stop()
+        self.channel.close()
+        self.thread.join(timeout=1.0)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+# global imports
+import json
+import math
+import bisect
+import logging
+
+
+logger = logging.getLogger()
+
+NAN = float('nan')
+
+
+class IperfResults(object):
+    # receiver side per interval series of an `iperf3 -J/--json-stream --get-server-output` client run; for UDP
+    # only the receiving server knows loss and jitter, so its intervals are preferred over the client's own
+    FIELDS = ['throughput [Kbps]', 'lost [%]', 'jitter [ms]']
+
+    @classmethod
+    def load(cls, fn):
+        try:
+            with open(fn, 'r') as fh:
+                text = fh.read()
+        except IOError as err:
+            logger.log(logging.WARNING, "no iperf3 json in {}: {}".format(fn, err))
+            return None
+        try:
+            return json.loads(text)
+        except ValueError:
+            return cls.from_json_stream(text.splitlines())
+
+    @classmethod
+    def from_json_stream(cls, lines):
+        # `--json-stream` writes one event per line, they are folded into the layout of a -J document
+        doc = {'intervals': []}
+        for line in lines:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if event.get('event') == 'interval':
+                doc['intervals'].append(event.get('data', {}))
+            elif event.get('event') in ('start', 'end', 'server_output_json'):
+                doc[event['event']] = event.get('data', {})
+        return doc if doc['intervals'] or 'server_output_json' in doc else None
+
+    @classmethod
+    def parse(cls, doc):
+        # [(start, end, throughput [Kbps], lost [%], jitter [ms])], start and end in seconds since the epoch
+        if not doc:
+            return []
+        receiver = doc.get('server_output_json') or doc
+        try:
+            t0 = float(receiver['start']['timestamp']['timesecs'])
+        except (KeyError, TypeError, ValueError):
+            t0 = float(doc.get('start', {}).get('timestamp', {}).get('timesecs', 0))
+        series = []
+        for interval in receiver.get('intervals', []):
+            s = interval.get('sum', {})
+            if 'start' not in s or 'end' not in s or s.get('omitted'):
+                continue
+            series.append((t0 + s['start'], t0 + s['end'],
+                           s.get('bits_per_second', NAN) / 1000.0,
+                           s.get('lost_percent', NAN),
+                           s.get('jitter_ms', NAN)))
+        return series
+
+    @classmethod
+    def lookup(cls, series, starts, wall_time):
+        # the interval that covers wall_time, starts is [s[0] for s in series]
+        pos = bisect.bisect_right(starts, wall_time) - 1
+        if pos < 0 or wall_time >= series[pos][1]:
+            return [NAN] * len(IperfResults.FIELDS)
+        return list(series[pos][2:])
+
+    @classmethod
+    def summarize(cls, series):
+        summary = {}
+        for i, field in enumerate(IperfResults.FIELDS):
+            values = [s[2 + i] for s in series if s[2 + i] == s[2 + i]]
+            summary[field] = math.fsum(values) / len(values) if values else NAN
+        summary['intervals'] = len(series)
+        return summary
@@ -0,0 +1,2 @@
+# a local stand-in for the QoE chamber: gateway REST API, station SSH daemons and router serial consoles;
+# `python -m lab_simulator --help` runs the executor against it
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+# global imports
+from optparse import OptionParser
+import os
+import time
+import logging
+# local imports
+import utils
+import wifi_qoe_executor
+from lab_simulator import lab
+from lab_simulator import gateway
+from lab_simulator import radio_model
+
+
+# [test id, dut_channel, dut_data, int_channel, int_data]: the interferer from far off to the DUT's own channel
+DEFAULT_TESTS = [[1, 6, 40000, 1, 60000],
+                 [2, 6, 40000, 11, 60000],
+                 [3, 6, 40000, 8, 60000],
+                 [4, 6, 40000, 6, 60000],
+                 [5, 6, 20000, 6, 60000],
+                 [6, 6, 20000, 6, 20000]]
+
+
+def parse_params(items, option):
+    params = {}
+    for item in items:
+        assert '=' in item, "{} expects key=value, got {}".format(option, item)
+        k, v = item.split('=', 1)
+        params[k.strip()] = float(v)
+    return params
+
+
+def write_tests(fn, rows):
+    with open(fn, 'w') as fh:
+        for row in rows:
+            fh.write(','.join(str(v) for v in row) + '\n')
+    return fn
+
+
+def log_results(executor):
+    for scenario_id, results in sorted(executor.all_scenario_results().items()):
+        if results is None:
+            utils.logger.log(logging.INFO, "{}: no results".format(scenario_id))
+            continue
+        bands = ', '.join('{} {}'.format(band, r['test_result'] or 'Passed') for band, r in sorted(results['bands'].items()))
+        utils.logger.log(logging.INFO, "{}: {} sample(s), {}".format(scenario_id, results['num_of_iter'] + 1, bands))
+
+
+def main():
+    parser = OptionParser(usage='python -m lab_simulator [options]')
+    parser.add_option('--lab-dir', dest='lab_dir', type="string", default='lab_run', help='directory of the lab state, the generated configuration and the results, default: lab_run (optional)')
+    parser.add_option('--rigs', dest='rigs', type="int", default=1, help='number of simulated rigs, default: 1 (optional)')
+    parser.add_option('--speed', dest='speed', type="float", default=60.0, help='lab seconds per wall clock second, default: 60 (optional)')
+    parser.add_option('--profile', dest='profile', type="string", help='json file with gateway profile keys (release, bands, clients, latency, error_rate, missing_field_rate) (optional)')
+    parser.add_option('--model', dest='model', action='append', default=[], help='radio model parameter as key=value, e.g. score_bias=8, may be repeated (optional)')
+    parser.add_option('--timing', dest='timing', action='append', default=[], help='lab timing as key=value in lab seconds, e.g. reboot=60, may be repeated (optional)')
+    parser.add_option('--seed', dest='seed', type="int", help='seed of the gateway values (optional)')
+    parser.add_option('--iperf-version', dest='iperf_version', type="string", help='version the station iperf3 reports, e.g. 3.9 for one without --json-stream, default: 3.17.1 (optional)')
+    parser.add_option('--ssh-port', dest='ssh_port', type="int", default=0, help='port of the station SSH daemons, default: any free port (optional)')
+    parser.add_option('--duration', dest='duration', type="int", default=600, help='scenario duration in lab seconds, default: 600 (optional)')
+    parser.add_option('--period', dest='period', type="float", default=30, help='sampling period in lab seconds, default: 30 (optional)')
+    parser.add_option('--tolerance', dest='tolerance', type="float", default=20.0, help='approved tolerance for bitrate loss in percents, default: 20.0 (optional)')
+    parser.add_option('--tests', dest='tests', type="string", help='QoE executor tests file, default: a built-in interference sweep (optional)')
+    parser.add_option('--serve', dest='serve', action='store_true', default=False, help='only run the lab and write its configuration, until Ctrl+C (optional)')
+    parser.add_option('--parallel-setup', dest='parallel_setup', action='store_true', default=False, help='passed to the executor (optional)')
+    parser.add_option('--plan', dest='plan', type="choice", choices=['file', 'optimized'], default='file', help='passed to the executor (optional)')
+    parser.add_option('--early-stop', dest='early_stop', action='store_true', default=False, help='passed to the executor (optional)')
+    parser.add_option('--trace', dest='trace_file', type="string", help='passed to the executor (optional)')
+    parser.add_option('--delay-before-start', dest='delay', type="int", default=0, help='passed to the executor (optional)')
+    (opts, args) = parser.parse_args()
+    assert opts.rigs > 0, "--rigs should be positive"
+    assert opts.speed > 0, "--speed should be positive"
+    profile = gateway.GatewayProfile.load(opts.profile) if opts.profile else gateway.GatewayProfile()
+    model = radio_model.RadioModel(**parse_params(opts.model, '--model'))
+    os.makedirs(opts.lab_dir, exist_ok=True)
+    test_lab = lab.Lab(opts.lab_dir, rigs=opts.rigs, speed=opts.speed, profile=profile, model=model,
+                       timing=parse_params(opts.timing, '--timing'), ssh_port=opts.ssh_port, seed=opts.seed,
+                       iperf_version=opts.iperf_version).start()
+    try:
+        config_fn = test_lab.write_config(os.path.join(test_lab.lab_dir, 'qoe_executor.cfg'), opts.duration,
+                                          opts.period, opts.tolerance)
+        tests_fn = os.path.abspath(opts.tests) if opts.tests else \
+            write_tests(os.path.join(test_lab.lab_dir, 'tests.csv'), DEFAULT_TESTS)
+        utils.logger.log(logging.INFO, "lab configuration written to {}".format(config_fn))
+        if opts.serve:
+            utils.logger.log(logging.INFO, "lab running, Ctrl+C to stop")
+            while True:
+                time.sleep(3600)
+        # the executor keeps its work dir, journal and index relative to the current directory
+        os.chdir(test_lab.lab_dir)
+        executor = wifi_qoe_executor.QoeExecutor(qoe_config=config_fn, qoe_tests=tests_fn, delay=opts.delay,
+                                                 parallel_setup=opts.parallel_setup, plan=opts.plan,
+                                                 early_stop=opts.early_stop, trace_file=opts.trace_file)
+        t1 = time.monotonic()
+        executor.run()
+        utils.logger.log(logging.INFO, "campaign of {} scenario(s) took {:.1f}sec".format(
+            len(executor.all_scenario_results()), time.monotonic() - t1))
+        log_results(executor)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for line in test_lab.report():
+            utils.logger.log(logging.INFO, "lab: " + line)
+        test_lab.stop()
+
+if __name__ == "__main__":
+    main()
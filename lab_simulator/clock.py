@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+
+# global imports
+import time
+
+
+class VirtualClock(object):
+    # lab time runs `speed` times faster than the wall clock: every duration of the simulated hardware (gateway
+    # latency, reboot, wifi association, iperf interval) is given in lab seconds and slept in real ones
+    def __init__(self, speed=1.0):
+        assert speed > 0, "clock speed should be positive"
+        self.speed = float(speed)
+        self.t0 = time.monotonic()
+
+    def now(self):
+        return (time.monotonic() - self.t0) * self.speed
+
+    def real(self, seconds):
+        return seconds / self.speed
+
+    def lab(self, seconds):
+        return seconds * self.speed
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds / self.speed)
+
+    def deadline(self, seconds):
+        # wall clock time `seconds` lab seconds from now; deadlines are shared with the station tool processes
+        return time.time() + seconds / self.speed
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+
+# global imports
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import json
+import time
+import random
+import threading
+import logging
+# local imports
+from lab_simulator import radio_model
+
+
+logger = logging.getLogger()
+
+
+class GatewayProfile(object):
+    # response shapes and timing of a gateway firmware; latencies are [mean, spread] in lab seconds per endpoint
+    # ('default' for the others), error_rate is the share of requests answered with HTTP 500 and
+    # missing_field_rate the share of entries that lack one of their fields
+    DEFAULTS = {'release': '1.2.3-lab',
+                'bands': ['2.4GHz', '5GHz'],
+                'clients': 1,
+                'channel_5GHz': 36,
+                'latency': {'default': [0.08, 0.03],
+                            '/wifi_monitoring/link_data': [0.2, 0.08],
+                            '/wifi_scoring/link_data': [0.15, 0.05]},
+                'error_rate': 0.0,
+                'missing_field_rate': 0.0}
+
+    def __init__(self, **params):
+        unknown = set(params) - set(GatewayProfile.DEFAULTS)
+        assert not unknown, "unknown gateway profile key(s): {}".format(', '.join(sorted(unknown)))
+        self.params = json.loads(json.dumps(GatewayProfile.DEFAULTS))
+        self.params.update(params)
+        for k, v in self.params.items():
+            setattr(self, k, v)
+
+    @classmethod
+    def load(cls, fn):
+        with open(fn, 'r') as fh:
+            return cls(**json.load(fh))
+
+    def latency_of(self, path):
+        return self.latency.get(path, self.latency.get('default', [0.0, 0.0]))
+
+
+class GatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        gateway = self.server.gateway
+        status, body = gateway.respond(self.path.split('?')[0])
+        body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Gateway(object):
+    # the management REST API of a rig's gateway: the five wifi monitoring/scoring endpoints and the framework
+    # version, with values derived from the rig's radio conditions (iperf loads, interferer channel); while the
+    # gateway reboots every request is answered with 503
+    ENDPOINTS = ['/wifi_monitoring/air_data', '/wifi_monitoring/ap_data', '/wifi_monitoring/link_data',
+                 '/wifi_scoring/air_data', '/wifi_scoring/link_data', '/management/framework_version']
+
+    def __init__(self, lab_clock, state, rig, model, profile, seed=None):
+        self.clock = lab_clock
+        self.state = state
+        self.rig = rig
+        self.model = model
+        self.profile = profile
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = dict((path, 0) for path in Gateway.ENDPOINTS)
+        self.server = None
+
+    def start(self, host='127.0.0.1', port=0):
+        self.server = ThreadingHTTPServer((host, port), GatewayHandler)
+        self.server.daemon_threads = True
+        self.server.gateway = self
+        threading.Thread(target=self.server.serve_forever, name='gateway-' + self.rig, daemon=True).start()
+        return self
+
+    @property
+    def url(self):
+        return 'http://{}:{}'.format(*self.server.server_address[:2])
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def is_down(self):
+        return time.time() < self.state.get(self.rig, 'dut_down_until', 0.0)
+
+    def gauss(self, mean, spread):
+        with self.lock:
+            return self.rng.gauss(mean, spread)
+
+    def chance(self, rate):
+        with self.lock:
+            return rate > 0 and self.rng.random() < rate
+
+    def respond(self, path):
+        mean, spread = self.profile.latency_of(path)
+        self.clock.sleep(max(0.0, self.gauss(mean, spread)))
+        if self.is_down():
+            return 503, {'error': 'service unavailable'}
+        if path not in self.requests:
+            return 404, {'error': 'not found'}
+        with self.lock:
+            self.requests[path] += 1
+        if self.chance(self.profile.error_rate):
+            return 500, {'error': 'internal error'}
+        return 200, self.payload(path)
+
+    def band_conditions(self, band):
+        # (channel, offered DUT load, interferer load, overlap); the DUT and the interferer are on 2.4GHz
+        dut_load, int_load, overlap = radio_model.RadioModel.conditions(self.state, self.rig)
+        if band == '2.4GHz':
+            return self.state.get(self.rig, 'dut_channel', 6), dut_load, int_load, overlap
+        return self.profile.channel_5GHz, 0.0, 0.0, 0.0
+
+    def thin(self, entry):
+        # an entry with one of its fields missing, as a firmware under load sometimes sends
+        if entry and self.chance(self.profile.missing_field_rate):
+            with self.lock:
+                del entry[self.rng.choice(sorted(entry))]
+        return entry
+
+    def payload(self, path):
+        if path == '/management/framework_version':
+            return {'framework_version': {'release': self.profile.release}}
+        now = int(time.time())
+        bands = dict((band, self.band_conditions(band)) for band in self.profile.bands)
+        if path == '/wifi_monitoring/air_data':
+            return dict((band, [self.thin(self.monitoring_air(band, now, *bands[band]))]) for band in bands)
+        if path == '/wifi_monitoring/ap_data':
+            return dict((band, [self.thin(self.monitoring_ap(band, now, *bands[band]))]) for band in bands)
+        if path == '/wifi_monitoring/link_data':
+            return dict((band, [dict([self.monitoring_link(band, now, client, *bands[band])])
+                                for client in range(self.profile.clients)]) for band in bands)
+        if path == '/wifi_scoring/air_data':
+            return [self.thin(self.scoring_air(band, *bands[band])) for band in bands]
+        if path == '/wifi_scoring/link_data':
+            band = self.profile.bands[0]
+            return [self.thin(self.scoring_link(band, client, *bands[band])) for client in range(self.profile.clients)]
+
+    def load_shares(self, dut_load, int_load, overlap):
+        # (air load [%], interference [%]) of the channel
+        airtime = self.model.interferer_airtime(int_load, overlap)
+        air_load = min(100.0, self.model.link_rate(dut_load, int_load, overlap) / self.model.capacity * 100.0 +
+                       airtime * 100.0)
+        return air_load, airtime * 100.0
+
+    def monitoring_air(self, band, now, channel, dut_load, int_load, overlap):
+        air_load, interference = self.load_shares(dut_load, int_load, overlap)
+        return {'band': band, 'status': 'up', 'air_load': round(air_load + self.gauss(0.0, 1.0), 1),
+                'interference': round(max(0.0, interference + self.gauss(0.0, 1.0)), 1), 'channel': channel,
+                'txop': round(max(0.0, 100.0 - air_load), 1), 'noise': round(-92.0 + 4.0 * overlap, 1),
+                'glitch': int(abs(self.gauss(10.0 * overlap, 2.0))),
+                'badplcp': int(abs(self.gauss(5.0 * overlap, 1.0))), 'timestamp': now}
+
+    def monitoring_ap(self, band, now, channel, dut_load, int_load, overlap):
+        total = int(self.model.link_rate(dut_load, int_load, overlap) * 125 * self.clock.now())
+        return {'band': band, 'status': 'up', 'ap_load': round(min(100.0, dut_load / self.model.capacity * 100.0), 1),
+                'channel': channel, 'bandwidth': 20 if band == '2.4GHz' else 80, 'radar_status': 0,
+                'radar_detected_channel': 0, 'tx_bytes_total': total, 'rx_bytes_total': total // 20,
+                'timestamp': now}
+
+    def monitoring_link(self, band, now, client, channel, dut_load, int_load, overlap):
+        # the first client is the DUT station, the others only keep their association
+        mac = '02:00:00:00:{:02x}:{:02x}'.format(0 if band == '2.4GHz' else 5, client)
+        offered = dut_load if client == 0 else 0.0
+        with self.lock:
+            rate = self.model.sample_rate(offered, int_load, overlap, self.rng)
+        airtime = self.model.interferer_airtime(int_load, overlap)
+        entry = {'mac_address': mac, 'tx_data_total': int(rate * 12), 'rx_data_total': int(rate),
+                 'tx_retry_total': int(rate * airtime), 'tx_bytes_total': int(rate * 125 * self.clock.now()),
+                 'rx_bytes_total': int(rate * 6 * self.clock.now()), 'tx_in_net_sec': round(self.clock.now(), 1),
+                 'num_of_samples': 3, 'tx_phyrate_avg': int(130000 - 50000 * airtime),
+                 'rssi': int(round(self.gauss(-45.0, 2.0))), 'datarate': round(rate, 1),
+                 'rtr': round(2.0 + 25.0 * airtime, 1), 'bandwidth': 20 if band == '2.4GHz' else 80, 'is_ldpc': 1,
+                 'sgi': 1, 'tx_nss': 2, 'throughput_level': max(1, 5 - int(airtime * 5)), 'band': band,
+                 'tx_phyrate_raw': int(144400 - 50000 * airtime), 'timestamp': now}
+        return mac, self.thin(entry)
+
+    def scoring_air(self, band, channel, dut_load, int_load, overlap):
+        air_load, interference = self.load_shares(dut_load, int_load, overlap)
+        return {'band': band, 'num_of_samples': 3, 'channel_load': round(air_load, 1),
+                'interference': round(interference, 1), 'channel_noise': round(max(0.0, self.gauss(3.0, 1.0)), 1),
+                'tx_ineff': round(interference / 4.0, 1), 'channel_cca_score': round(100.0 - air_load, 1),
+                'channel': channel}
+
+    def scoring_link(self, band, client, channel, dut_load, int_load, overlap):
+        offered = dut_load if client == 0 else 0.0
+        with self.lock:
+            score = self.model.sample_score(offered, int_load, overlap, self.rng)
+        airtime = self.model.interferer_airtime(int_load, overlap)
+        return {'tx_link_quality_score': round(100.0 - 50.0 * airtime, 1),
+                'tx_link_effective_quality_score': round(score, 1), 'link_quality_level': max(1, 4 - int(airtime * 4)),
+                'channel_cca_user_impact': round(airtime * 100.0, 1), 'tx_phyrate_score': round(90.0 - 40.0 * airtime, 1),
+                'tx_retry_score': round(95.0 - 30.0 * airtime, 1), 'tx_failure_score': round(airtime * 5.0, 1),
+                'num_of_samples': 3, 'hostname': 'station{}'.format(client), 'host_type': 'pc',
+                'mac_address': '02:00:00:00:00:{:02x}'.format(client), 'band': band}
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+# global imports
+import os
+import configparser
+import logging
+# local imports
+from lab_simulator import clock
+from lab_simulator import lab_state
+from lab_simulator import radio_model
+from lab_simulator import gateway
+from lab_simulator import serial_consoles
+from lab_simulator import ssh_server
+
+
+logger = logging.getLogger()
+
+
+class Lab(object):
+    # the test chamber on the local machine: per rig a gateway, a DUT and an interferer router console and four
+    # stations, rig N's stations listening on 127.0.N.1-4; every duration of the simulated hardware runs on a
+    # virtual clock `speed` times faster than the wall clock, and so do the scenario durations and sampling
+    # periods written to the executor configuration
+    ROLES = ['dut_st_lan', 'dut_st_wlan', 'int_st_lan', 'int_st_wlan']
+    TIMING = {'association': 4.0,         # [lab sec] from a wifi (re)connect to the association
+              'server_start': 0.5,        # [lab sec] until an iperf server listens
+              'reboot': 90.0,             # [lab sec] a router stays down after 'system reboot'
+              'serial_delay': 0.05}       # [lab sec] a router console takes per line
+    PASSWORD = 'lab'
+
+    def __init__(self, lab_dir, rigs=1, speed=1.0, profile=None, model=None, timing=None, ssh_port=0,
+                 address_prefix='127.0.', seed=None, iperf_version=None):
+        self.lab_dir = os.path.abspath(lab_dir)
+        self.num_of_rigs = rigs
+        self.clock = clock.VirtualClock(speed)
+        self.profile = profile or gateway.GatewayProfile()
+        self.model = model or radio_model.RadioModel()
+        self.timing = dict(Lab.TIMING)
+        self.timing.update(timing or {})
+        self.address_prefix = address_prefix
+        self.seed = seed
+        self.iperf_version = iperf_version
+        self.state = lab_state.LabState(os.path.join(self.lab_dir, 'state'))
+        self.results_dir = os.path.join(self.lab_dir, 'stations')
+        self.ssh = ssh_server.StationSshServer(self.state.path, os.path.join(self.lab_dir, 'bin'), speed,
+                                               Lab.PASSWORD, ssh_port)
+        # rig name -> {'gateway', 'consoles': {side: PtyConsole}, 'stations': {role: (address, scope)}}
+        self.rigs = {}
+
+    @classmethod
+    def rig_name(cls, i):
+        return 'rig{}'.format(i + 1)
+
+    def start(self):
+        os.makedirs(self.results_dir, exist_ok=True)
+        self.state.set('lab', 'timing', self.timing)
+        self.state.set('lab', 'model', self.model.params)
+        if self.iperf_version:
+            self.state.set('lab', 'iperf_version', self.iperf_version)
+        else:
+            self.state.delete('lab', 'iperf_version')
+        self.ssh.write_tools()
+        addresses = {}
+        for i in range(self.num_of_rigs):
+            rig = Lab.rig_name(i)
+            self.state.set(rig, 'dut_channel', 6)
+            self.state.set(rig, 'int_channel', 1)
+            for side in ('dut', 'int'):
+                self.state.delete(rig, side + '_down_until')
+            seed = None if self.seed is None else self.seed + i
+            gw = gateway.Gateway(self.clock, self.state, rig, self.model, self.profile, seed).start()
+            consoles = dict((side, serial_consoles.PtyConsole(
+                self.clock, serial_consoles.RouterCli(self.clock, self.state, rig, side, self.timing),
+                self.timing['serial_delay']).start()) for side in ('dut', 'int'))
+            stations = {}
+            for j, role in enumerate(Lab.ROLES):
+                address = '{}{}.{}'.format(self.address_prefix, i + 1, j + 1)
+                scope = rig + '.' + role
+                for key in ('ssid', 'server', 'client'):
+                    self.state.delete(scope, key)
+                self.state.set(scope, 'info', {'rig': rig, 'role': role, 'address': address,
+                                               'ssid': self.ssid(rig, role[:3]) if role.endswith('wlan') else None})
+                self.ssh.add_station(address, scope)
+                addresses[address] = scope
+                stations[role] = (address, scope)
+            self.rigs[rig] = {'gateway': gw, 'consoles': consoles, 'stations': stations}
+            logger.log(logging.INFO, "lab: {} gateway at {}, consoles {}, stations {}:{}".format(
+                rig, gw.url, ', '.join(c.port for c in consoles.values()),
+                ', '.join(a for a, s in stations.values()), self.ssh.port))
+        self.state.set('lab', 'addresses', addresses)
+        return self
+
+    @classmethod
+    def ssid(cls, rig, side):
+        return 'lab-{}-{}'.format(side, rig)
+
+    def rig_config(self, rig, duration, period, tolerance):
+        info = self.rigs[rig]
+        config = {'duration': str(max(1, int(round(self.clock.real(duration))))),
+                  'period': repr(self.clock.real(period)),
+                  'tolerance': str(tolerance),
+                  'url': info['gateway'].url,
+                  'iperf_path': '/usr/bin/iperf3',
+                  'iperf_results_dir': self.results_dir,
+                  'ssh_port': str(self.ssh.port)}
+        for side in ('dut', 'int'):
+            config[side + '_serial_com'] = info['consoles'][side].port
+            config[side + '_ssid'] = Lab.ssid(rig, side)
+            config[side + '_wlan_pass'] = Lab.PASSWORD
+        for role, (address, scope) in info['stations'].items():
+            config[role] = scope
+            config[role + '_mng_ip'] = address
+            config[role + '_ip'] = address
+            config[role + '_user'] = 'root'
+            config[role + '_pass'] = Lab.PASSWORD
+        return config
+
+    def write_config(self, fn, duration=600, period=30, tolerance=20.0):
+        # the executor configuration of the lab, the first rig is [DEFAULT]; duration and period are given in
+        # lab seconds and written compressed
+        parser = configparser.ConfigParser(interpolation=None)
+        names = sorted(self.rigs, key=lambda name: int(name[3:]))
+        parser['DEFAULT'] = self.rig_config(names[0], duration, period, tolerance)
+        for rig in names[1:]:
+            parser[rig] = self.rig_config(rig, duration, period, tolerance)
+        with open(fn, 'w') as fh:
+            parser.write(fh)
+        return fn
+
+    def report(self):
+        lines = ["clock speed {:.0f}x, {:.0f} lab sec elapsed, {} ssh exec(s)".format(
+            self.clock.speed, self.clock.now(), self.ssh.execs)]
+        for rig, info in sorted(self.rigs.items()):
+            lines.append("{}: gateway requests {}, console lines {}".format(
+                rig, sum(info['gateway'].requests.values()),
+                ', '.join('{} {}'.format(side, c.cli.commands) for side, c in sorted(info['consoles'].items()))))
+        return lines
+
+    def stop(self):
+        self.ssh.stop()
+        for info in self.rigs.values():
+            info['gateway'].stop()
+            for console in info['consoles'].values():
+                console.stop()
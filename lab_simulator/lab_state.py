@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+# global imports
+import os
+import json
+import errno
+import threading
+
+
+class LabState(object):
+    # state shared by the lab process and the station tools it spawns (iwgetid, iperf3, killall, ...): one json
+    # file per (scope, key) under path, replaced atomically so readers never see a partial value; scopes are
+    # 'lab', a rig name or a '<rig>.<station role>' name
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def fn(self, scope, key):
+        return os.path.join(self.path, scope, key + '.json')
+
+    def get(self, scope, key, default=None):
+        try:
+            with open(self.fn(scope, key), 'r') as fh:
+                return json.load(fh)
+        except (IOError, ValueError):
+            return default
+
+    def set(self, scope, key, value):
+        fn = self.fn(scope, key)
+        os.makedirs(os.path.dirname(fn), exist_ok=True)
+        tmp_fn = "{}.{}.{}.tmp".format(fn, os.getpid(), threading.get_ident())
+        with open(tmp_fn, 'w') as fh:
+            json.dump(value, fh)
+        os.replace(tmp_fn, fn)
+
+    def delete(self, scope, key):
+        try:
+            os.remove(self.fn(scope, key))
+        except OSError as err:
+            if err.errno != errno.ENOENT:
+                raise
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+# global imports
+import os
+
+
+class RadioModel(object):
+    # the DUT's 2.4GHz link shares its channel with the interferer: the interferer takes airtime in proportion
+    # to its load and to the overlap of the two channels, the DUT link gets what is left of the capacity. The
+    # gateway's tx_link_effective_quality_score estimates the resulting bit rate loss with score_error spread
+    # and score_bias offset, a biased score is how a firmware regression looks like in the summaries
+    DEFAULTS = {'capacity': 80000.0,      # [Kbps] of an undisturbed link
+                'rate_noise': 0.02,       # relative spread of the achieved rate per sample/interval
+                'score_error': 3.0,       # [%] spread of the quality score around the true loss
+                'score_bias': 0.0,        # [%] offset of the quality score
+                'idle_rate': 500.0}       # [Kbps] on a link without iperf traffic
+
+    def __init__(self, **params):
+        unknown = set(params) - set(RadioModel.DEFAULTS)
+        assert not unknown, "unknown radio model parameter(s): {}".format(', '.join(sorted(unknown)))
+        self.params = dict(RadioModel.DEFAULTS)
+        self.params.update(params)
+        for k, v in self.params.items():
+            setattr(self, k, float(v))
+
+    @classmethod
+    def overlap(cls, ch1, ch2):
+        # 2.4GHz channels five or more apart do not overlap
+        return max(0.0, 1.0 - abs(int(ch1) - int(ch2)) / 5.0)
+
+    @classmethod
+    def conditions(cls, state, rig):
+        # (offered DUT load [Kbps], offered interferer load [Kbps], channel overlap) of a rig right now
+        loads = []
+        for role in ('dut_st_lan', 'int_st_lan'):
+            client = state.get(rig + '.' + role, 'client')
+            loads.append(float(client['rate']) if client and cls.is_running(client['pid']) else 0.0)
+        overlap = cls.overlap(state.get(rig, 'dut_channel', 6), state.get(rig, 'int_channel', 1))
+        return loads[0], loads[1], overlap
+
+    @classmethod
+    def is_running(cls, pid):
+        try:
+            os.kill(pid, 0)
+        except OSError:
+            return False
+        return True
+
+    def interferer_airtime(self, int_load, overlap):
+        return overlap * min(int_load, self.capacity) / self.capacity
+
+    def link_rate(self, offered, int_load, overlap):
+        # expected achieved rate [Kbps]
+        if offered <= 0:
+            return self.idle_rate
+        return min(offered, self.capacity * max(0.05, 1.0 - self.interferer_airtime(int_load, overlap)))
+
+    def sample_rate(self, offered, int_load, overlap, rng):
+        rate = self.link_rate(offered, int_load, overlap) * (1.0 + rng.gauss(0.0, self.rate_noise))
+        return max(0.0, min(rate, offered) if offered > 0 else rate)
+
+    def loss(self, offered, int_load, overlap):
+        # expected bit rate loss [%]
+        if offered <= 0:
+            return 0.0
+        return (offered - self.link_rate(offered, int_load, overlap)) / offered * 100.0
+
+    def sample_score(self, offered, int_load, overlap, rng):
+        score = self.loss(offered, int_load, overlap) + self.score_bias + rng.gauss(0.0, self.score_error)
+        return max(0.0, min(100.0, score))
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+# global imports
+import os
+import re
+import pty
+import tty
+import time
+import threading
+import logging
+
+
+logger = logging.getLogger()
+
+
+class RouterCli(object):
+    # the command line of a rig's router: a login, 'system reboot' and the cwmp channel setting of the
+    # interferer; a reboot takes the side's access point (and on the DUT side the gateway API) down and drops
+    # the association of its wlan station
+    CHANNEL_RE = re.compile(r'^cwmp set_params \S+\.Channel (\d+)$')
+    PROMPTS = {'login': 'Login: ', 'password': 'Password: ', 'shell': 'router> '}
+
+    def __init__(self, lab_clock, state, rig, side, timing):
+        self.clock = lab_clock
+        self.state = state
+        self.rig = rig
+        self.side = side
+        self.timing = timing
+        self.mode = 'login'
+        self.commands = 0
+
+    def is_down(self):
+        return time.time() < self.state.get(self.rig, self.side + '_down_until', 0.0)
+
+    def handle(self, line):
+        # output of one input line, the prompt included; None while the router reboots
+        if self.is_down():
+            return None
+        self.commands += 1
+        if self.mode == 'login':
+            self.mode = 'password' if line else 'login'
+            return self.PROMPTS[self.mode]
+        if self.mode == 'password':
+            self.mode = 'shell'
+            return 'Welcome to the lab router\r\n' + self.PROMPTS['shell']
+        if line == 'exit':
+            self.mode = 'login'
+            return self.PROMPTS['login']
+        if line == 'system reboot':
+            self.reboot()
+            return 'The system is going down for reboot NOW!\r\n'
+        match = RouterCli.CHANNEL_RE.match(line)
+        if match and self.side == 'int':
+            self.state.set(self.rig, 'int_channel', int(match.group(1)))
+            return 'OK\r\n' + self.PROMPTS['shell']
+        if not line:
+            return self.PROMPTS['shell']
+        return "Unknown command '{}'\r\n{}".format(line, self.PROMPTS['shell'])
+
+    def reboot(self):
+        self.mode = 'login'
+        self.state.set(self.rig, self.side + '_down_until', self.clock.deadline(self.timing.get('reboot', 90.0)))
+        self.state.delete(self.rig + '.' + self.side + '_st_wlan', 'ssid')
+        logger.log(logging.DEBUG, "lab: {} {} router rebooting".format(self.rig, self.side))
+
+
+class PtyConsole(object):
+    # a serial console on a pseudo terminal: the executor opens `port` like a COM port, lines it sends are
+    # answered by the router cli after delay lab seconds
+    def __init__(self, lab_clock, cli, delay=0.05):
+        self.clock = lab_clock
+        self.cli = cli
+        self.delay = delay
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.thread = threading.Thread(target=self.serve, name='console-' + self.port, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def serve(self):
+        buf = b''
+        while True:
+            try:
+                chunk = os.read(self.master, 1024)
+            except OSError:
+                return
+            if not chunk:
+                return
+            buf += chunk.replace(b'\r\n', b'\r').replace(b'\n', b'\r')
+            while b'\r' in buf:
+                line, buf = buf.split(b'\r', 1)
+                self.clock.sleep(self.delay)
+                output = self.cli.handle(line.decode('utf-8', 'replace').strip())
+                if output is None:
+                    continue
+                try:
+                    os.write(self.master, line + b'\r\n' + output.encode())
+                except OSError:
+                    return
+
+    def stop(self):
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
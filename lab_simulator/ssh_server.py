@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+# global imports
+import os
+import re
+import sys
+import socket
+import signal
+import threading
+import subprocess
+import logging
+import paramiko
+# local imports
+from lab_simulator import station_tools
+
+
+logger = logging.getLogger()
+
+
+class SftpHandle(paramiko.SFTPHandle):
+    def stat(self):
+        return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+
+
+class ReadOnlySftp(paramiko.SFTPServerInterface):
+    # the stations share the lab's file system, results are only ever fetched from them
+    def open(self, path, flags, attr):
+        if flags & (os.O_WRONLY | os.O_RDWR):
+            return paramiko.sftp.SFTP_PERMISSION_DENIED
+        try:
+            fh = open(path, 'rb')
+        except (IOError, OSError) as err:
+            return paramiko.SFTPServer.convert_errno(err.errno)
+        handle = SftpHandle(flags)
+        handle.readfile = fh
+        handle.filename = path
+        return handle
+
+    def stat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(path))
+        except OSError as err:
+            return paramiko.SFTPServer.convert_errno(err.errno)
+
+    lstat = stat
+
+    def list_folder(self, path):
+        try:
+            return [paramiko.SFTPAttributes.from_stat(os.stat(os.path.join(path, name)), name)
+                    for name in os.listdir(path)]
+        except OSError as err:
+            return paramiko.SFTPServer.convert_errno(err.errno)
+
+
+class StationInterface(paramiko.ServerInterface):
+    def __init__(self, ssh_server, station):
+        self.ssh_server = ssh_server
+        self.station = station
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_auth_password(self, username, password):
+        if password == self.ssh_server.password:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(target=self.ssh_server.run_command, args=(self.station, channel, command.decode()),
+                         name='exec-' + self.station, daemon=True).start()
+        return True
+
+
+class StationSshServer(object):
+    # the SSH daemons of all stations: one listening socket per station address on a common port; commands run
+    # in a real /bin/sh whose station tools (absolute paths included) are replaced by station_tools wrappers
+    REWRITES = ['/usr/bin/killall', '/usr/bin/pgrep', '/sbin/iwgetid', '/usr/bin/nmcli', '/usr/bin/iperf3',
+                '/qoe/wifi-reconnect.sh']
+
+    def __init__(self, state_dir, bin_dir, speed, password, port=0):
+        self.state_dir = state_dir
+        self.bin_dir = bin_dir
+        self.speed = speed
+        self.password = password
+        self.port = port
+        self.host_key = paramiko.ECDSAKey.generate()
+        self.sockets = []
+        self.transports = []
+        self.execs = 0
+        self.lock = threading.Lock()
+        self.rewrite_re = re.compile(r'(?<![\w/.-])({})(?![\w/.-])'.format(
+            '|'.join(re.escape(path) for path in StationSshServer.REWRITES)))
+
+    def write_tools(self):
+        # one wrapper per tool, PATH lookups and the rewritten absolute paths both end up in station_tools
+        os.makedirs(self.bin_dir, exist_ok=True)
+        root = os.path.dirname(os.path.dirname(os.path.abspath(station_tools.__file__)))
+        for tool in station_tools.StationTools.TOOLS:
+            fn = os.path.join(self.bin_dir, tool)
+            with open(fn, 'w') as fh:
+                fh.write('#!/bin/sh\nPYTHONPATH="{}" exec "{}" -m lab_simulator.station_tools "$0" "$@"\n'.format(
+                    root, sys.executable))
+            os.chmod(fn, 0o755)
+
+    def rewrite(self, command):
+        return self.rewrite_re.sub(lambda match: os.path.join(self.bin_dir, os.path.basename(match.group(1))),
+                                   command)
+
+    def add_station(self, address, station):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind((address, self.port))
+        except OSError as err:
+            sock.close()
+            raise OSError("cannot listen on {}:{} for {} ({}); stations need their own loopback addresses, "
+                          "which Linux provides for all of 127.0.0.0/8".format(address, self.port, station, err))
+        # the first station picks the port when none was given, the others share it
+        self.port = sock.getsockname()[1]
+        sock.listen(16)
+        self.sockets.append(sock)
+        threading.Thread(target=self.accept, args=(sock, station), name='sshd-' + station, daemon=True).start()
+
+    def accept(self, sock, station):
+        while True:
+            try:
+                conn, peer = sock.accept()
+            except OSError:
+                return
+            transport = paramiko.Transport(conn)
+            transport.add_server_key(self.host_key)
+            transport.set_subsystem_handler('sftp', paramiko.SFTPServer, ReadOnlySftp)
+            try:
+                transport.start_server(server=StationInterface(self, station))
+            except (paramiko.SSHException, EOFError, OSError) as err:
+                logger.log(logging.DEBUG, "lab: ssh negotiation with {} failed: {}".format(station, err))
+                continue
+            with self.lock:
+                self.transports.append(transport)
+
+    def run_command(self, station, channel, command):
+        with self.lock:
+            self.execs += 1
+        env = dict(os.environ, LAB_STATE=self.state_dir, LAB_STATION=station, LAB_SPEED=str(self.speed),
+                   PATH=self.bin_dir + os.pathsep + os.environ.get('PATH', ''))
+        proc = subprocess.Popen(['/bin/sh', '-c', self.rewrite(command)], stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, env=env, start_new_session=True)
+
+        def pump(pipe, send):
+            # output is forwarded as it comes (iperf streams), a channel closed by the client ends the command
+            for chunk in iter(lambda: os.read(pipe.fileno(), 4096), b''):
+                try:
+                    send(chunk)
+                except (OSError, EOFError, paramiko.SSHException):
+                    try:
+                        os.killpg(proc.pid, signal.SIGTERM)
+                    except OSError:
+                        pass
+                    return
+
+        pumps = [threading.Thread(target=pump, args=(proc.stdout, channel.sendall), daemon=True),
+                 threading.Thread(target=pump, args=(proc.stderr, channel.sendall_stderr), daemon=True)]
+        for thread in pumps:
+            thread.start()
+        rc = proc.wait()
+        for thread in pumps:
+            thread.join()
+        proc.stdout.close()
+        proc.stderr.close()
+        try:
+            channel.send_exit_status(rc)
+            channel.close()
+        except (OSError, EOFError, paramiko.SSHException):
+            pass
+
+    def stop(self):
+        for sock in self.sockets:
+            sock.close()
+        with self.lock:
+            transports = list(self.transports)
+        for transport in transports:
+            transport.close()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+
+# global imports
+from optparse import OptionParser
+import os
+import sys
+import json
+import time
+import math
+import random
+import signal
+# local imports
+from lab_simulator import clock
+from lab_simulator import lab_state
+from lab_simulator import radio_model
+
+
+class StationTools(object):
+    # the commands the executor runs on a station (iwgetid, nmcli, the wifi reconnect script, iperf3, killall,
+    # pgrep, ss/netstat), emulated against the lab state; every tool runs as its own short lived process, like
+    # the real ones, started by the shell of the fake SSH server
+    TOOLS = {'iwgetid': 'iwgetid', 'nmcli': 'nmcli', 'wifi-reconnect.sh': 'wifi_reconnect', 'iperf3': 'iperf3',
+             'killall': 'killall', 'pgrep': 'pgrep', 'ss': 'ss', 'netstat': 'ss'}
+    IPERF_PORT = 5201
+    IPERF_VERSION = '3.17.1'
+
+    def __init__(self, state, station, lab_clock, out=None):
+        self.state = state
+        self.station = station
+        self.clock = lab_clock
+        self.out = out or sys.stdout
+        self.info = state.get(station, 'info', {})
+        self.rig = self.info.get('rig')
+        self.timing = state.get('lab', 'timing', {})
+
+    def emit(self, line):
+        self.out.write(line + '\n')
+        self.out.flush()
+
+    def run(self, tool, args):
+        if tool not in StationTools.TOOLS:
+            sys.stderr.write("{}: command not found\n".format(tool))
+            return 127
+        return getattr(self, StationTools.TOOLS[tool])(args)
+
+    def associated_ssid(self, station=None):
+        assoc = self.state.get(station or self.station, 'ssid')
+        if assoc and assoc['at'] <= time.time():
+            return assoc['ssid']
+        return None
+
+    def associate(self, ssid):
+        # association starts once the station's access point is up again
+        side = self.info['role'].split('_')[0]
+        start = max(time.time(), self.state.get(self.rig, side + '_down_until', 0.0))
+        at = start + self.clock.real(self.timing.get('association', 4.0))
+        self.state.set(self.station, 'ssid', {'ssid': ssid, 'at': at})
+        return at
+
+    def iwgetid(self, args):
+        ssid = self.associated_ssid()
+        if ssid is None:
+            return 255
+        self.emit(ssid if '-r' in args else 'wlan0     ESSID:"{}"'.format(ssid))
+        return 0
+
+    def nmcli(self, args):
+        if args[:3] != ['dev', 'wifi', 'connect'] or len(args) < 4:
+            sys.stderr.write("Error: argument '{}' not understood.\n".format(' '.join(args)))
+            return 2
+        if args[3] != self.info.get('ssid'):
+            sys.stderr.write("Error: No network with SSID '{}' found.\n".format(args[3]))
+            return 10
+        # nmcli returns once the station is associated
+        self.state.delete(self.station, 'ssid')
+        at = self.associate(args[3])
+        time.sleep(max(0.0, at - time.time()))
+        self.emit("Device 'wlan0' successfully activated.")
+        return 0
+
+    def wifi_reconnect(self, args):
+        self.state.delete(self.station, 'ssid')
+        self.associate(self.info['ssid'])
+        return 0
+
+    def iperf3(self, args):
+        if '--version' in args or '-v' in args:
+            self.emit('iperf {} (lab simulator)'.format(self.state.get('lab', 'iperf_version',
+                                                                       StationTools.IPERF_VERSION)))
+            return 0
+        parser = OptionParser(add_help_option=False)
+        parser.add_option('-s', dest='server', action='store_true', default=False)
+        parser.add_option('-c', dest='client', type='string')
+        parser.add_option('-t', dest='time', type='float', default=10.0)
+        parser.add_option('-i', dest='interval', type='float', default=1.0)
+        parser.add_option('-b', dest='bitrate', type='string', default='1M')
+        parser.add_option('-p', dest='port', type='int', default=StationTools.IPERF_PORT)
+        parser.add_option('-u', dest='udp', action='store_true', default=False)
+        parser.add_option('-J', dest='json', action='store_true', default=False)
+        parser.add_option('--json-stream', dest='json_stream', action='store_true', default=False)
+        parser.add_option('--forceflush', dest='forceflush', action='store_true', default=False)
+        parser.add_option('--get-server-output', dest='server_output', action='store_true', default=False)
+        (opts, rest) = parser.parse_args(args)
+        if opts.server:
+            self.state.set(self.station, 'server', {'pid': os.getpid(),
+                                                    'at': self.clock.deadline(self.timing.get('server_start', 0.5))})
+            return 0
+        if opts.client:
+            return self.iperf_client(opts)
+        sys.stderr.write("iperf3: parameter error - must either be a client (-c) or server (-s)\n")
+        return 1
+
+    @classmethod
+    def parse_bitrate(cls, value):
+        # [Kbps]
+        units = {'K': 1.0, 'M': 1e3, 'G': 1e6}
+        if value[-1:].upper() in units:
+            return float(value[:-1]) * units[value[-1:].upper()]
+        return float(value) / 1e3
+
+    def iperf_client(self, opts):
+        # -t comes from the (compressed) executor configuration and is taken in wall clock seconds, the
+        # reporting interval runs on the lab clock; interval start/end are wall clock seconds since the start
+        # timestamp so that the executor can join them to its samples. --json-stream writes every event as it
+        # comes, otherwise they are collected into one -J document written at the exit
+        doc = None if opts.json_stream else {'start': {}, 'intervals': [], 'end': {}}
+
+        def report(event, data):
+            if doc is None:
+                self.emit(json.dumps({'event': event, 'data': data}))
+            elif event == 'interval':
+                doc['intervals'].append(data)
+            else:
+                doc[event] = data
+
+        try:
+            return self.iperf_udp_client(opts, report)
+        finally:
+            if doc is not None:
+                self.emit(json.dumps(doc, indent=2))
+
+    def iperf_udp_client(self, opts, report):
+        target = self.state.get('lab', 'addresses', {}).get(opts.client)
+        server = self.state.get(target, 'server') if target else None
+        if server is None or server['at'] > time.time():
+            report('error', 'unable to connect to server - server may have stopped running or use a different '
+                            'port, firewall issue, etc.: Connection refused')
+            return 1
+        offered = StationTools.parse_bitrate(opts.bitrate)
+        model = radio_model.RadioModel(**self.state.get('lab', 'model', {}))
+        rng = random.Random()
+        self.state.set(self.station, 'client', {'pid': os.getpid(), 'rate': offered, 'target': target})
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+        t0 = int(time.time())
+        started = time.time()
+        report('start', {
+            'version': 'iperf {} (lab simulator)'.format(self.state.get('lab', 'iperf_version',
+                                                                        StationTools.IPERF_VERSION)),
+            'connecting_to': {'host': opts.client, 'port': opts.port},
+            'timestamp': {'time': time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime(t0)), 'timesecs': t0},
+            'test_start': {'protocol': 'UDP' if opts.udp else 'TCP', 'duration': opts.time, 'blksize': 1448}})
+        step = self.clock.real(opts.interval)
+        received = []
+        try:
+            for i in range(max(1, int(math.ceil(opts.time / step)))):
+                end = started + (i + 1) * step
+                time.sleep(max(0.0, end - time.time()))
+                if self.associated_ssid(target) is None:
+                    # a udp sender only notices a lost station once its packets can no longer be routed
+                    report('error', 'unable to write to stream socket: No route to host')
+                    return 1
+                dut_load, int_load, overlap = radio_model.RadioModel.conditions(self.state, self.rig)
+                if self.info['role'].startswith('dut'):
+                    rate = model.sample_rate(offered, int_load, overlap, rng)
+                else:
+                    rate = model.sample_rate(offered, 0.0, 0.0, rng)
+                s = {'start': end - step - t0, 'end': end - t0, 'seconds': step, 'bytes': int(offered * 125 * step),
+                     'bits_per_second': offered * 1000.0, 'packets': int(offered * step / 11.6), 'omitted': False,
+                     'sender': True}
+                report('interval', {'streams': [dict(s, socket=5)], 'sum': s})
+                lost = (offered - rate) / offered * 100.0 if offered > 0 else 0.0
+                received.append(dict(s, bits_per_second=rate * 1000.0, bytes=int(rate * 125 * step),
+                                     lost_percent=lost, lost_packets=int(s['packets'] * lost / 100.0),
+                                     jitter_ms=abs(rng.gauss(0.5 + 2.0 * overlap * (int_load > 0), 0.2)),
+                                     sender=False))
+            report('end', {'sum': {'start': 0, 'end': time.time() - t0, 'bits_per_second': offered * 1000.0}})
+            report('server_output_json', {'start': {'timestamp': {'timesecs': t0}},
+                                          'intervals': [{'streams': [dict(r, socket=5)], 'sum': r}
+                                                        for r in received]})
+        finally:
+            self.state.delete(self.station, 'client')
+        return 0
+
+    def killall(self, args):
+        if 'iperf3' not in args:
+            sys.stderr.write("{}: no process found\n".format(args[-1] if args else ''))
+            return 1
+        killed = False
+        if self.state.get(self.station, 'server'):
+            self.state.delete(self.station, 'server')
+            killed = True
+        client = self.state.get(self.station, 'client')
+        if client and radio_model.RadioModel.is_running(client['pid']):
+            try:
+                os.kill(client['pid'], signal.SIGTERM)
+                killed = True
+            except OSError:
+                pass
+        self.state.delete(self.station, 'client')
+        if not killed:
+            sys.stderr.write("iperf3: no process found\n")
+            return 1
+        return 0
+
+    def pgrep(self, args):
+        if not args or args[-1] != 'iperf3':
+            return 1
+        pids = []
+        server = self.state.get(self.station, 'server')
+        if server:
+            pids.append(server['pid'])
+        client = self.state.get(self.station, 'client')
+        if client and radio_model.RadioModel.is_running(client['pid']):
+            pids.append(client['pid'])
+        for pid in pids:
+            self.emit(str(pid))
+        return 0 if pids else 1
+
+    def ss(self, args):
+        self.emit('State      Recv-Q Send-Q Local Address:Port   Peer Address:Port')
+        server = self.state.get(self.station, 'server')
+        if server and server['at'] <= time.time():
+            self.emit('LISTEN     0      5      0.0.0.0:{}         0.0.0.0:*'.format(StationTools.IPERF_PORT))
+        return 0
+
+
+def main():
+    tools = StationTools(lab_state.LabState(os.environ['LAB_STATE']), os.environ['LAB_STATION'],
+                         clock.VirtualClock(float(os.environ.get('LAB_SPEED', '1'))))
+    sys.exit(tools.run(os.path.basename(sys.argv[1]), sys.argv[2:]))
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,10 @@ import glob
 import logging
 # local imports
 import utils
+import file_writers
+import sample_store
+import result_index
+import mini_data_collector
 
 SUMMARY_HEADER = ['scenario_id',
                   'actual bitrate loss [%]',             # calculated
@@ -40,53 +44,218 @@ SUMMARY_HEADER = ['scenario_id',
 
 
 class SummaryGen(object):
-    def __init__(self, dir_path, out_file):
-        self.dir_path = dir_path
+    # per-scenario side outputs of mini_data_collector that are not summaries
+    AUX_SUFFIXES = ('_stats.csv', '_iperf.csv', '_raw.csv')
+
+    def __init__(self, dir_path, out_file, index_file=None, filters=None, recursive=False, workers=8):
+        # dir_path is a directory or a list of directories
+        self.dir_paths = [dir_path] if isinstance(dir_path, str) else list(dir_path or [])
+        self.dir_path = ','.join(self.dir_paths) or None
         self.out_file = out_file
+        self.filters = filters or {}
+        self.recursive = recursive
+        self.workers = workers
         self.utils = utils.Utils()
-        self.files_list = glob.glob(os.path.join(self.dir_path, '*.csv'))
+        self.writer = file_writers.FileWriterPool()
+        # without an index file a throwaway in-memory index is filled from dir_path on every run
+        self.index = result_index.ResultIndex(index_file or ':memory:')
+        self.files_list = []
+        pattern = os.path.join('**', '*.csv') if self.recursive else '*.csv'
+        out_file = os.path.abspath(self.out_file)
+        for dir_path in self.dir_paths:
+            dir_path = os.path.abspath(dir_path)
+            self.files_list += [fn for fn in glob.glob(os.path.join(dir_path, pattern), recursive=self.recursive)
+                                if not fn.endswith(SummaryGen.AUX_SUFFIXES) and fn != out_file]
 
     @classmethod
     def check_if_valid(cls, line):
         return True
         #return len(vec) == 25
 
-    def process(self, fn):
-        scenario_id = os.path.basename(fn)
-        scenario_id = scenario_id[: scenario_id.find('.csv')]
+    @classmethod
+    def read_last_line(cls, fn, block_size=4096):
+        # reads backwards from the end of the file in blocks until the start of the last non-empty line
+        with open(fn, 'rb') as fh:
+            end = fh.seek(0, os.SEEK_END)
+            pos = end
+            buf = b''
+            while pos > 0:
+                step = min(block_size, pos)
+                pos -= step
+                fh.seek(pos)
+                buf = fh.read(step) + buf
+                if buf.rstrip(b'\r\n').rfind(b'\n') >= 0:
+                    break
+        lines = buf.rstrip(b'\r\n').rsplit(b'\n', 1)
+        return lines[-1].decode('utf-8', 'replace') + '\n' if end else ''
+
+    def process(self, scenario_id, last_line):
         summary_vec = [scenario_id]
-        last_line = open(fn, 'r').readlines()[-1]
-        if not self.check_if_valid(last_line):
+        # an empty summary file (e.g. a scenario that was cut short) gives no row
+        if not last_line.strip() or not self.check_if_valid(last_line):
             return ''
         vec = [item for item in last_line.split(',') if len(item.strip()) > 0]
         for i in range(len(vec)):
             summary_vec.append(vec[i])
         return ','.join(summary_vec)
 
+    def update_index(self):
+        if not self.dir_paths:
+            return
+        updated = self.index.update(self.files_list, SummaryGen.read_last_line, self.workers)
+        pruned = sum(self.index.prune(dir_path) for dir_path in self.dir_paths)
+        self.utils.log(logging.INFO, "{}: {} file(s) indexed, {} unchanged, {} removed".format(
+            self.dir_path, updated, len(self.files_list) - updated, pruned))
+
     def run(self):
+        self.update_index()
         headers = ','.join(SUMMARY_HEADER)
-        self.utils.write2file(self.out_file, 'w', headers)
-        for f in self.files_list:
-            summary_row = self.process(f)
+        self.writer.write(self.out_file, 'w', headers)
+        for scenario_id, last_line in self.index.query(**self.filters):
+            summary_row = self.process(scenario_id, last_line)
             if len(summary_row) == 0:
                 continue
-            self.utils.write2file(self.out_file, 'a', summary_row)
-            self.utils.log(logging.DEBUG, "{} processed".format(f))
+            self.writer.write(self.out_file, 'a', summary_row)
+            self.utils.log(logging.DEBUG, "{} processed".format(scenario_id))
+        self.writer.close()
+        self.index.close()
         self.utils.log(logging.INFO, "{} created".format(self.out_file))
 
 
+class RunComparison(object):
+    # aligns the scenarios of every candidate work dir with the same scenario id in the baseline work dir and
+    # reports the per metric difference (candidate - baseline) of the final averages
+    DELTA_KEY = 'delta [%] (tx_link_effective_quality_score-actual bitrate loss)'
+    HEADER = ['scenario_id', 'baseline', 'candidate', 'baseline result', 'candidate result', 'regression'] + \
+             ['{} diff'.format(k) for k in mini_data_collector.Units.AVG_METRICS]
+
+    def __init__(self, index, baseline, out_file, threshold=1.0, filters=None):
+        self.index = index
+        self.baseline = baseline
+        self.out_file = out_file
+        self.threshold = threshold
+        self.filters = dict(filters or {})
+        self.utils = utils.Utils()
+        self.writer = file_writers.FileWriterPool()
+
+    @classmethod
+    def parse_avg_row(cls, header, avg_row):
+        # the row is read against the header of its own file, summaries of earlier versions have fewer columns
+        values = dict((k, float('nan')) for k in mini_data_collector.Units.AVG_METRICS)
+        values['test result'] = 'N/A'
+        for k, item in zip(header.split(','), avg_row.strip().split(',')):
+            if k == 'test result':
+                values[k] = item or 'N/A'
+            else:
+                values[k] = sample_store.SampleStore.to_float(item)
+        return values
+
+    def load(self):
+        # {work dir: {scenario id: averages}}, candidates are limited by the work_dir filter if one is given
+        candidate = self.filters.pop('work_dir', None)
+        runs = {}
+        unread = 0
+        columns = ('work_dir', 'scenario_id', 'header', 'avg_row', 'test_id')
+        for work_dir, scenario_id, header, avg_row, test_id in self.index.query(columns, **self.filters):
+            # files not named like a scenario (e.g. earlier summaries) cannot be aligned
+            if test_id is None:
+                continue
+            # registered by an earlier version without the header and not rescanned since
+            if not header:
+                unread += 1
+                continue
+            if candidate is None or work_dir in (candidate, self.baseline):
+                runs.setdefault(work_dir, {})[scenario_id] = RunComparison.parse_avg_row(header, avg_row)
+        if unread:
+            self.utils.log(logging.WARNING, "{} scenario(s) of {} have no header yet and were left out, "
+                                            "index their work dirs with --dir-path".format(unread, self.index.path))
+        return runs
+
+    def is_regression(self, base, cand):
+        reasons = []
+        if base['test result'] == 'Passed!' and cand['test result'] != 'Passed!':
+            reasons.append('test result')
+        if cand[self.DELTA_KEY] - base[self.DELTA_KEY] > self.threshold:
+            reasons.append('delta')
+        return '+'.join(reasons)
+
+    def compare(self, runs):
+        baseline = runs.get(self.baseline, {})
+        rows = []
+        regressions = []
+        for work_dir in sorted(runs):
+            if work_dir == self.baseline:
+                continue
+            candidate = runs[work_dir]
+            for scenario_id in sorted(set(baseline) | set(candidate)):
+                base, cand = baseline.get(scenario_id), candidate.get(scenario_id)
+                if base is None or cand is None:
+                    rows.append([scenario_id, self.baseline, work_dir,
+                                 base['test result'] if base else 'missing',
+                                 cand['test result'] if cand else 'missing', ''] +
+                                [''] * len(mini_data_collector.Units.AVG_METRICS))
+                    continue
+                regression = self.is_regression(base, cand)
+                if regression:
+                    regressions.append((work_dir, scenario_id, regression))
+                rows.append([scenario_id, self.baseline, work_dir, base['test result'], cand['test result'],
+                             regression] +
+                            [mini_data_collector.Tool.format_value(cand[k] - base[k])
+                             for k in mini_data_collector.Units.AVG_METRICS])
+        return rows, regressions
+
+    def run(self):
+        runs = self.load()
+        assert self.baseline in runs, "no scenarios of baseline {} in {}".format(self.baseline, self.index.path)
+        rows, regressions = self.compare(runs)
+        self.writer.write(self.out_file, 'w', ','.join(RunComparison.HEADER))
+        for row in rows:
+            self.writer.write(self.out_file, 'a', ','.join(row))
+        self.writer.close()
+        self.index.close()
+        for work_dir, scenario_id, regression in regressions:
+            self.utils.log(logging.WARNING, "{} regressed in {}: {}".format(scenario_id, work_dir, regression))
+        self.utils.log(logging.INFO, "{} scenario(s) of {} run(s) compared to {}, {} regression(s), {} created".format(
+            len(rows), len(runs) - 1, self.baseline, len(regressions), self.out_file))
+        return regressions
+
+
 def main():
     parser = OptionParser()
-    parser.add_option('--dir-path', dest='dir_path', type="string", help='path to the directory with .csv results (required)')
+    parser.add_option('--dir-path', dest='dir_path', type="string", action='append', help='path to a directory with .csv results, may be repeated (required unless --index is given)')
+    parser.add_option('--recursive', dest='recursive', action='store_true', default=False, help='also scan the subdirectories of --dir-path, e.g. all work dirs (optional)')
+    parser.add_option('--workers', dest='workers', type="int", default=8, help='number of threads reading result files, default: 8 (optional)')
     parser.add_option('--output', dest='output', type="string", default='summary.csv', help='path to output file, default: summary.csv (optioanl)')
+    parser.add_option('--index', dest='index_file', type="string", help='SQLite result index kept between runs, e.g. the one the executor fills (optional)')
+    parser.add_option('--work-dir', dest='work_dir', type="string", help='only scenarios of this date/firmware directory (optional)')
+    parser.add_option('--channel', dest='dut_channel', type="int", help='only scenarios on this DUT channel (optional)')
+    parser.add_option('--bitrate', dest='dut_bitrate', type="int", help='only scenarios with this DUT bit rate in Kbps (optional)')
+    parser.add_option('--compare-to', dest='baseline', type="string", help='compare every other work dir (or --work-dir) to this baseline work dir instead of summarizing (optional)')
+    parser.add_option('--regression-threshold', dest='threshold', type="float", default=1.0, help='increase of the average delta counted as a regression, default: 1.0% (optional)')
     (opts, args) = parser.parse_args()
-    assert opts.dir_path is not None, "--dir-path is required"
-    assert os.path.isdir(opts.dir_path), "{} is not directory or not exists".format(opts.dir_path)
-    sumGen = SummaryGen(dir_path=opts.dir_path, out_file=opts.output)
+    assert opts.dir_path is not None or opts.index_file is not None, "--dir-path or --index is required"
+    for dir_path in opts.dir_path or []:
+        assert os.path.isdir(dir_path), "{} is not directory or not exists".format(dir_path)
+    assert opts.workers > 0, "--workers should be positive"
+    filters = {'work_dir': opts.work_dir, 'dut_channel': opts.dut_channel, 'dut_bitrate': opts.dut_bitrate}
+    sumGen = SummaryGen(dir_path=opts.dir_path, out_file=opts.output, index_file=opts.index_file, filters=filters,
+                        recursive=opts.recursive, workers=opts.workers)
     utils.logger.log(logging.INFO, "Running with arguments:")
     utils.logger.log(logging.INFO, "--dir-path {}".format(sumGen.dir_path))
+    utils.logger.log(logging.INFO, "--recursive {}".format(sumGen.recursive))
+    utils.logger.log(logging.INFO, "--workers {}".format(sumGen.workers))
     utils.logger.log(logging.INFO, "--output {}".format(sumGen.out_file))
-    sumGen.run()
+    utils.logger.log(logging.INFO, "--index {}".format(sumGen.index.path))
+    for k, v in sorted(filters.items()):
+        if v is not None:
+            utils.logger.log(logging.INFO, "filter {} = {}".format(k, v))
+    if opts.baseline is None:
+        sumGen.run()
+        return
+    utils.logger.log(logging.INFO, "--compare-to {}".format(opts.baseline))
+    utils.logger.log(logging.INFO, "--regression-threshold {}".format(opts.threshold))
+    sumGen.update_index()
+    RunComparison(sumGen.index, opts.baseline, opts.output, opts.threshold, filters).run()
 
 if __name__ == "__main__":
     main()
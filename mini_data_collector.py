@@ -10,8 +10,18 @@ import time
 import datetime
 import ssl
 import logging
+import statistics
+from array import array
+from concurrent.futures import ThreadPoolExecutor, wait
 # local imports
 import utils
+import file_writers
+import sample_store
+import summary_stats
+import result_index
+import iperf_results
+import iperf_monitor
+import tracing
 
 
 class Units(object):
@@ -105,7 +115,8 @@ class Units(object):
                                                       "timestamp"]
                          }
 
-    SUMMARY_HEADER = ['time [sec]',                          # calculated
+    SUMMARY_HEADER = ['time [sec]',                          # calculated (nominal tick time)
+                      'sample time [sec]',                   # measured (actual tick time)
                       'nominal bit rate [Kbps]',             # --dut-bitrate (from cmd)
                       'external AP load [Kbps]',             # --external-ap-load (from cmd)
                       'external AP channel',                 # --external-ap-channel (from cmd)
@@ -137,49 +148,32 @@ class Units(object):
                       'noise [dB]',                          # /wifi_monitoring/air_data
                       'wifi_monitoring/air_data.interference [%]']
 
-    SUMMARY_DICT = {'actual bitrate loss [%]': 0,
-                    'delta [%] (tx_link_effective_quality_score-actual bitrate loss)': 0,
-                    'tx_link_effective_quality_score [%]': 0,
-                    'tx_link_quality_score [%]': 0,
-                    'tx_retry_score [%]': 0,
-                    'tx_phyrate_score [%]': 0,
-                    'channel_cca_user_impact [%]': 0,
-                    'channel_cca_score [%]': 0,
-                    'channel_load [%]': 0,
-                    'tx_ineff [%]': 0,
-                    'channel_noise [%]': 0,
-                    'wifi_scoring/air_data.interference [%]': 0,
-                    'datarate [Kbps]': 0,
-                    'rtr [%]': 0,
-                    'tx_phyrate_avg [Kbps]': 0,
-                    'tx_bytes_total [B]': 0,
-                    'rssi' :0,
-                    'air_load [%]': 0,
-                    'txop [%]': 0,
-                    'noise [dB]': 0,
-                    'wifi_monitoring/air_data.interference [%]':0}
-
-    TEMP_DICT = {'actual bitrate loss [%]': 0,
-                 'delta [%] (tx_link_effective_quality_score-actual bitrate loss)': 0,
-                 'tx_link_effective_quality_score [%]': 0,
-                 'tx_link_quality_score [%]': 0,
-                 'tx_retry_score [%]': 0,
-                 'tx_phyrate_score [%]': 0,
-                 'channel_cca_user_impact [%]': 0,
-                 'channel_cca_score [%]': 0,
-                 'channel_load [%]': 0,
-                 'tx_ineff [%]': 0,
-                 'channel_noise [%]': 0,
-                 'wifi_scoring/air_data.interference [%]': 0,
-                 'datarate [Kbps]': 0,
-                 'rtr [%]': 0,
-                 'tx_phyrate_avg [Kbps]': 0,
-                 'tx_bytes_total [B]': 0,
-                 'rssi': 0,
-                 'air_load [%]': 0,
-                 'txop [%]': 0,
-                 'noise [dB]': 0,
-                 'wifi_monitoring/air_data.interference [%]': 0}
+    # summary column -> (endpoint, field) it is taken from, in SUMMARY_HEADER order
+    SUMMARY_SOURCES = [('tx_link_effective_quality_score [%]', '/wifi_scoring/link_data', 'tx_link_effective_quality_score'),
+                       ('tx_link_quality_score [%]', '/wifi_scoring/link_data', 'tx_link_quality_score'),
+                       ('tx_retry_score [%]', '/wifi_scoring/link_data', 'tx_retry_score'),
+                       ('tx_phyrate_score [%]', '/wifi_scoring/link_data', 'tx_phyrate_score'),
+                       ('channel_cca_user_impact [%]', '/wifi_scoring/link_data', 'channel_cca_user_impact'),
+                       ('channel', '/wifi_scoring/air_data', 'channel'),
+                       ('channel_cca_score [%]', '/wifi_scoring/air_data', 'channel_cca_score'),
+                       ('channel_load [%]', '/wifi_scoring/air_data', 'channel_load'),
+                       ('tx_ineff [%]', '/wifi_scoring/air_data', 'tx_ineff'),
+                       ('channel_noise [%]', '/wifi_scoring/air_data', 'channel_noise'),
+                       ('wifi_scoring/air_data.interference [%]', '/wifi_scoring/air_data', 'interference'),
+                       ('datarate [Kbps]', '/wifi_monitoring/link_data', 'datarate'),
+                       ('rtr [%]', '/wifi_monitoring/link_data', 'rtr'),
+                       ('tx_phyrate_avg [Kbps]', '/wifi_monitoring/link_data', 'tx_phyrate_avg'),
+                       ('tx_bytes_total [B]', '/wifi_monitoring/link_data', 'tx_bytes_total'),
+                       ('rssi', '/wifi_monitoring/link_data', 'rssi'),
+                       ('air_load [%]', '/wifi_monitoring/air_data', 'air_load'),
+                       ('txop [%]', '/wifi_monitoring/air_data', 'txop'),
+                       ('noise [dB]', '/wifi_monitoring/air_data', 'noise'),
+                       ('wifi_monitoring/air_data.interference [%]', '/wifi_monitoring/air_data', 'interference')]
+
+    # metrics averaged in the last summary row and described in the _stats.csv file
+    AVG_METRICS = ['actual bitrate loss [%]',
+                   'delta [%] (tx_link_effective_quality_score-actual bitrate loss)'] + \
+                  [k for k, url_sfx, field in SUMMARY_SOURCES if k != 'channel']
 
 
 class Tool(object):
@@ -188,7 +182,8 @@ class Tool(object):
                 '/wifi_scoring/link_data']
 
     def __init__(self, url_val, period_val, output_file_val, dut_bitrate, external_ap_load,
-                 external_ap_channel, tolerance, duration):
+                 external_ap_channel, tolerance, duration, request_timeout=10, export_raw=False,
+                 warmup=2, early_stop=False, min_samples=10, confidence=0.95, index_file=None, monitors=None):
         self.url = url_val
         self.period = period_val
         self.output_file = output_file_val if output_file_val.endswith('.csv') else output_file_val + '.csv'
@@ -198,22 +193,40 @@ class Tool(object):
         self.external_ap_channel = external_ap_channel
         self.tolerance = tolerance
         self.duration = duration
+        self.request_timeout = request_timeout
+        self.export_raw = export_raw
+        self.warmup = warmup
+        self.early_stop = early_stop
+        self.min_samples = min_samples
+        self.z = statistics.NormalDist().inv_cdf((1.0 + confidence) / 2.0)
+        self.summaries = {}
+        self.index_file = index_file
+        # live iperf3 streams (iperf_monitor.IperfMonitor) of an in-process run, checked on every tick
+        self.monitors = monitors or []
+        self.early_stopped = False
         self.suf_list = []
         self.keys = []
         self.utils = utils.Utils()
+        self.writer = file_writers.FileWriterPool()
+        self.store = sample_store.SampleStore()
         self.start = datetime.datetime.now().time()
         self.stop = self.start
         self.num_of_iter = 0
+        self.missed_ticks = 0
+        self.t0 = None
+        self.t0_wall = None
+        self.sample_times = []
 
     def exit_when_done(self):
         msg = "Start time: {}\nEnd time: {}".format(self.start, self.stop)
-        msg += "\nThe tool was terminated after {} iteration(s).\nExiting...".format(self.num_of_iter)
+        msg += "\nThe tool was terminated after {} iteration(s), {} tick(s) missed.\nExiting...".format(
+            self.num_of_iter, self.missed_ticks)
         self.utils.exit_when_done(msg)
 
-    @classmethod
-    def construct_fn(cls, curr_url, suf):
+    def construct_fn(self, curr_url, suf):
+        # raw files sit next to the summaries of their scenario, so rigs and scenarios never share one
         name = curr_url[1:].replace('/', '.')
-        return "{}_{}.csv".format(name, suf)
+        return "{}_{}_{}_raw.csv".format('.'.join(self.output_file.split('.')[:-1]), name, suf)
 
     @classmethod
     def get_headers_for_wifi_monitoring_ap_data_or_wifi_monitoring_air_data(cls, data, suf):
@@ -259,8 +272,7 @@ class Tool(object):
                     flag = 1
                     break
             if flag: continue
-            row = ','.join(row_list)
-            self.utils.write2file(fn, 'a', row)
+            self.record_row(fn, suf, url_suf, row_list)
             return # get only the 1st line
 
     def prepare_data_for_wifi_monitoring_link_data(self, fn, data, suf, url_suf):
@@ -277,8 +289,7 @@ class Tool(object):
                             raise
                 else:
                     continue
-                row = ','.join(row_list)
-                self.utils.write2file(fn, 'a', row)
+                self.record_row(fn, suf, url_suf, row_list)
                 return # get only the 1st line with data
             except:
                 pass
@@ -291,8 +302,7 @@ class Tool(object):
                 row_list.append(str(data[ndx][k]))
             else:
                 return
-        row = ','.join(row_list)
-        self.utils.write2file(fn, 'a', row)
+        self.record_row(fn, suf, url_suf, row_list)
 
     def prepare_data_for_wifi_scoring_link_data(self, fn, data, suf, url_suf):
         row_list = []
@@ -301,8 +311,13 @@ class Tool(object):
                 row_list.append(str(data[0][k]))
             else:
                 return
-        row = ','.join(row_list)
-        self.utils.write2file(fn, 'a', row)
+        self.record_row(fn, suf, url_suf, row_list)
+
+    def record_row(self, fn, suf, url_suf, row_list):
+        sample_no = len(self.sample_times) - 1
+        self.store.append(url_suf, suf, sample_no, Units.WIFI_HEADERS_DICT[url_suf], row_list)
+        if self.export_raw:
+            self.writer.write(fn, 'a', ','.join(row_list))
 
     @classmethod
     def update_units(cls, ks):
@@ -313,7 +328,7 @@ class Tool(object):
 
     def prepare_headers(self, data, curr_url, sfx):
         for suf in self.suf_list:
-            fn = Tool.construct_fn(sfx, suf)
+            fn = self.construct_fn(sfx, suf)
             if curr_url.endswith('/wifi_monitoring/air_data') or curr_url.endswith('/wifi_monitoring/ap_data'):
                 ks = Tool.get_headers_for_wifi_monitoring_ap_data_or_wifi_monitoring_air_data(data, suf)
             elif curr_url.endswith('/wifi_monitoring/link_data'):
@@ -328,15 +343,14 @@ class Tool(object):
             headers = Units.WIFI_HEADERS_DICT[sfx]
             ks = Tool.update_units(headers)
             headers = ','.join(ks)
-            self.utils.write2file(fn, 'w', headers)
+            self.writer.write(fn, 'w', headers)
 
     def prepare_data(self, data, curr_url, url_sfx):
         for suf in self.suf_list:
-            fn = Tool.construct_fn(url_sfx, suf)
+            fn = self.construct_fn(url_sfx, suf)
             if not data:
                 vec_na = ["N/A"] * len(Units.WIFI_HEADERS_DICT[url_sfx])
-                row_na =','.join(vec_na)
-                self.utils.write2file(fn, 'a', row_na)
+                self.record_row(fn, suf, url_sfx, vec_na)
             elif curr_url.endswith('/wifi_monitoring/air_data') or curr_url.endswith('/wifi_monitoring/ap_data'):
                 self.prepare_data_for_wifi_monitoring_ap_data_or_wifi_monitoring_air_data(fn, data, suf, url_sfx)
             elif curr_url.endswith('/wifi_monitoring/link_data'):
@@ -348,200 +362,284 @@ class Tool(object):
             else:
                 pass
 
-    def run(self):
+    def fetch_all(self, pool):
+        # all endpoints of a tick are requested at once and share one sample timestamp
+        futures = {}
+        for sfx in Tool.url_sfxs:
+            curr_url = urllib.parse.urljoin(self.url, sfx)
+            futures[sfx] = pool.submit(self.fetch_endpoint, sfx, curr_url)
+        done, not_done = wait(futures.values(), timeout=self.request_timeout + 1)
+        results = {}
+        for sfx, future in futures.items():
+            if future in done:
+                results[sfx] = future.result()
+            else:
+                self.utils.log(logging.ERROR, "{} did not answer within {}sec".format(sfx, self.request_timeout))
+                results[sfx] = {}
+        return results
+
+    def fetch_endpoint(self, sfx, curr_url):
+        with tracing.tracer.span('fetch', sfx):
+            return self.utils.get_data_from_url(curr_url, self.request_timeout)
+
+    def collect_sample(self, pool, tick, with_headers=False):
+        with tracing.tracer.span('collector', 'tick', tick=tick):
+            self.collect_tick(pool, tick, with_headers)
+
+    def collect_tick(self, pool, tick, with_headers=False):
+        nominal_time = round(tick * self.period, 6)
+        sample_time = time.monotonic() - self.t0
+        self.sample_times.append((nominal_time, sample_time))
+        self.utils.log(logging.DEBUG, "sample #{}: nominal time {:.3f}sec, actual time {:.3f}sec".format(
+            len(self.sample_times) - 1, nominal_time, sample_time))
+        results = self.fetch_all(pool)
         for sfx in Tool.url_sfxs:
             curr_url = urllib.parse.urljoin(self.url, sfx)
-            data = self.utils.get_data_from_url(curr_url)
+            data = results[sfx]
             self.suf_list = data.keys() if isinstance(data, dict) else ['2.4GHz', '5GHz'] if len(data) == 2 else ['2.4GHz']
-            self.prepare_headers(data, curr_url, sfx)
-            self.prepare_data(data, curr_url, sfx)
-
-        while True:
-            time.sleep(self.period)
-            self.num_of_iter += 1
-            for sfx in Tool.url_sfxs:
-                curr_url = urllib.parse.urljoin(self.url, sfx)
-                data = self.utils.get_data_from_url(curr_url)
-                self.suf_list = data.keys() if isinstance(data, dict) else ['2.4GHz', '5GHz'] if len(data) == 2 else ['2.4GHz']
+            with tracing.tracer.span('parse', sfx):
+                if with_headers and self.export_raw:
+                    self.prepare_headers(data, curr_url, sfx)
                 self.prepare_data(data, curr_url, sfx)
-            if self.utils.run_time_in_sec(datetime.datetime.now().time(), self.start) >= self.duration:
-                return KeyboardInterrupt
 
-    def generate_summary_headers(self, output_fn):
-        summary_hdr = ','.join(Units.SUMMARY_HEADER)
-        self.utils.write2file(output_fn, 'w', summary_hdr)
-
-    @classmethod
-    def get_wifi_scoring_link_data_info(cls, suf, cnt):
-        fn = Tool.construct_fn('/wifi_scoring/link_data', suf)
-        fh = open(fn, 'r')
-        if not cnt: fh.readline()
-        for line in fh:
-            if not line: yield '', ''
-            data = line.split(',')
-            data = [item.strip() for item in data]
-            ret_val = data[1] + ',' + data[0] + ',' + data[5] + ',' + data[4] + ',' + data[3] + ','
-            # tx_link_effective_quality_score [%], tx_link_quality_score [%], tx_retry_score [%], tx_phyrate_score [%], channel_cca_user_impact [%]
-            try:
-                Units.TEMP_DICT['tx_link_effective_quality_score [%]'] = float(data[1])
-                Units.TEMP_DICT['tx_link_quality_score [%]'] = float(data[0])
-                Units.TEMP_DICT['tx_retry_score [%]'] = float(data[5])
-                Units.TEMP_DICT['tx_phyrate_score [%]'] = float(data[4])
-                Units.TEMP_DICT['channel_cca_user_impact [%]'] = float(data[3])
-            except:
-                pass
-            yield ret_val, data[1]
+    def wait_for_next_tick(self, tick):
+        # ticks are scheduled against absolute deadlines on the monotonic clock, so fetch time does not
+        # accumulate into the sampling interval; ticks that already passed are skipped and reported
+        deadline = self.t0 + tick * self.period
+        now = time.monotonic()
+        if now >= deadline + self.period:
+            missed = int((now - deadline) // self.period)
+            self.missed_ticks += missed
+            self.utils.log(logging.WARNING, "{} tick(s) missed at {:.3f}sec".format(missed, now - self.t0))
+            tick += missed
+            deadline += missed * self.period
+        if deadline > now:
+            with tracing.tracer.span('sleep', 'wait for next tick'):
+                time.sleep(deadline - now)
+        return tick
 
-    @classmethod
-    def get_wifi_scoring_air_data_info(cls, suf, cnt):
-        fn = Tool.construct_fn('/wifi_scoring/air_data', suf)
-        fh = open(fn, 'r')
-        if not cnt: fh.readline()
-        for line in fh:
-            if not line: yield ''
-            data = line.split(',')
-            data = [item.strip() for item in data]
-            ret_val = data[7] + ',' + data[6] + ',' + data[2] + ',' + data[5] + ',' + data[4] + ',' + data[3] + ','
-            # channel, channel_cca_score [%], channel_load [%], tx_ineff [%], channel_noise [%], wifi_scoring/air_data.interference [%]
-            try:
-                Units.TEMP_DICT['channel_cca_score [%]'] = float(data[6])
-                Units.TEMP_DICT['channel_load [%]'] = float(data[2])
-                Units.TEMP_DICT['tx_ineff [%]'] = float(data[5])
-                Units.TEMP_DICT['channel_noise [%]'] = float(data[4])
-                Units.TEMP_DICT['wifi_scoring/air_data.interference [%]'] = float(data[3])
-            except:
-                pass
-            yield ret_val
+    def run(self):
+        self.t0 = time.monotonic()
+        # wall clock of the first tick, external series (iperf3) are aligned to the samples by it
+        self.t0_wall = time.time()
+        with ThreadPoolExecutor(max_workers=len(Tool.url_sfxs)) as pool:
+            tick = 0
+            self.collect_sample(pool, tick, with_headers=True)
+            self.update_summary()
+            self.check_monitors()
+            while True:
+                tick = self.wait_for_next_tick(tick + 1)
+                self.num_of_iter += 1
+                self.collect_sample(pool, tick)
+                self.update_summary()
+                self.check_monitors()
+                if time.monotonic() - self.t0 >= self.duration:
+                    return KeyboardInterrupt
+                if self.early_stop and self.is_verdict_stable():
+                    self.utils.log(logging.INFO, "verdict stable after {} samples, stopping early".format(
+                        len(self.sample_times)))
+                    self.early_stopped = True
+                    return
+
+    def check_monitors(self):
+        # the achieved iperf rate of every stream is stored with the sample, a failed stream ends the collection
+        sample_no = len(self.sample_times) - 1
+        for monitor in self.monitors:
+            self.store.append('/iperf', monitor.name, sample_no, ['rate [Kbps]'], [monitor.latest_rate()])
+        for monitor in self.monitors:
+            monitor.check()
+
+    def is_verdict_stable(self):
+        # the collection may end once the confidence interval of mean |delta| lies entirely on one side of the
+        # tolerance for every band; a band seen without valid samples keeps the collection going
+        delta_key = 'delta [%] (tx_link_effective_quality_score-actual bitrate loss)'
+        if not self.summaries:
+            return False
+        for summary in self.summaries.values():
+            running = summary['running'][delta_key]
+            if running.n < self.min_samples:
+                return False
+            low, high = running.confidence_interval(self.z)
+            if low <= self.tolerance < high:
+                return False
+        return True
+
+    def get_band_summary(self, suf):
+        if suf not in self.summaries:
+            output_fn = '.'.join(self.output_file.split('.')[:-1]) + '_' + suf + '.csv'
+            self.summaries[suf] = {'file': file_writers.TrailerFile(output_fn, ','.join(Units.SUMMARY_HEADER)),
+                                   'next_sample': 0,
+                                   'errors': 0,
+                                   'running': dict((k, summary_stats.RunningStats()) for k in Units.AVG_METRICS),
+                                   'columns': dict((k, array('d')) for k in Units.AVG_METRICS)}
+        return self.summaries[suf]
+
+    def update_summary(self):
+        with tracing.tracer.span('collector', 'summary update'):
+            self.update_summaries()
+
+    def update_summaries(self):
+        # rows of all complete samples are written as they arrive, the averages row after them is rewritten
+        # from the running accumulators; a band first seen late gets N/A rows for the samples before
+        sample_no = len(self.sample_times) - 1
+        for suf in list(self.summaries) + [suf for suf in self.suf_list if suf not in self.summaries]:
+            summary = self.get_band_summary(suf)
+            while summary['next_sample'] <= sample_no:
+                row_data = self.prepare_summary_row(summary, suf, summary['next_sample'])
+                summary['file'].append(row_data, self.prepare_avg_row(Tool.running_stats(summary)))
+                summary['next_sample'] += 1
 
     @classmethod
-    def get_wifi_monitoring_link_data_info(cls, suf, cnt):
-        fn = Tool.construct_fn('/wifi_monitoring/link_data', suf)
-        fh = open(fn, 'r')
-        if not cnt: fh.readline()
-        for line in fh:
-            if not line: yield '', ''
-            data = line.split(',')
-            data = [item.strip() for item in data]
-            ret_val = data[10] + ',' + data[11] + ',' + data[8] + ',' + data[4] + ',' + data[9] + ','
-            # datarate [Kbs], rtr [%], tx_phyrate_avg [Kbs], tx_bytes_total [Bytes], rssi
-            try:
-                Units.TEMP_DICT['datarate [Kbps]'] = float(data[10])
-                Units.TEMP_DICT['rtr [%]'] = float(data[11])
-                Units.TEMP_DICT['tx_phyrate_avg [Kbps]'] = float(data[8])
-                Units.TEMP_DICT['tx_bytes_total [B]'] = float(data[4])
-                Units.TEMP_DICT['rssi'] = float(data[9])
-            except:
-                pass
-            yield ret_val, data[10]
+    def running_stats(cls, summary):
+        return dict((k, {'samples': running.n, 'mean': running.mean}) for k, running in summary['running'].items())
 
-    @classmethod
-    def get_wifi_monitoring_air_data_info(cls, suf, cnt):
-        fn = Tool.construct_fn('/wifi_monitoring/air_data', suf)
-        fh = open(fn, 'r')
-        if not cnt: fh.readline()
-        for line in fh:
-            if not line: yield ''
-            data = line.split(',')
-            data = [item.strip() for item in data]
-            ret_val = data[2] + ',' + data[5] + ',' + data[6] + ',' + data[3]
-            # air_load [%], txop [%], noise [dB], wifi_monitoring/air_data.interference [%]
-            try:
-                Units.TEMP_DICT['air_load [%]'] = float(data[2])
-                Units.TEMP_DICT['txop [%]'] = float(data[5])
-                Units.TEMP_DICT['noise [dB]'] = float(data[6])
-                Units.TEMP_DICT['wifi_monitoring/air_data.interference [%]'] = float(data[3])
-            except:
-                pass
-            yield ret_val
+    def prepare_summary_row(self, summary, suf, cnt):
+        nominal_time, sample_time = self.sample_times[cnt]
+        time_info = str(nominal_time) + ',' + '{:.3f}'.format(sample_time) + ','
+        values = self.get_summary_values(suf, cnt)
+        try:
+            actual_bitrate_loss_val, delta_val = self.get_bitrate_loss_and_delta(values)
+            if abs(delta_val) <= self.tolerance: passed = ','
+            else: passed = 'Failed!,'
+            delta = str(delta_val) + ','
+            actual_bitrate_loss = str(actual_bitrate_loss_val) + ','
+        except:
+            passed = delta = actual_bitrate_loss = 'N/A,'
+            summary['errors'] += 1
+        else:
+            if cnt >= self.warmup:
+                # the delta is averaged by its absolute value
+                metrics = {'actual bitrate loss [%]': actual_bitrate_loss_val,
+                           'delta [%] (tx_link_effective_quality_score-actual bitrate loss)': abs(delta_val)}
+                for k, url_sfx, field in Units.SUMMARY_SOURCES:
+                    if k in summary['columns']:
+                        metrics[k] = values[k]
+                for k, value in metrics.items():
+                    summary['columns'][k].append(value)
+                    if value == value:
+                        summary['running'][k].add(value)
+
+        samples_info = ','.join(self.format_value(values[k]) for k, url_sfx, field in Units.SUMMARY_SOURCES)
+        return time_info + self.get_args_from_cmd() + actual_bitrate_loss + delta + passed + samples_info
 
     def get_args_from_cmd(self):
         ret_val = str(self.dut_bitrate) + ',' + str(self.external_ap_load) + ', ' + str(self.external_ap_channel) + ','
         # nominal bit rate [Mbs], external AP load [Mbs], external AP channel
         return ret_val
 
-    @classmethod
-    def reset_temp_res_dict(cls):
-        for k in Units.TEMP_DICT.keys():
-            Units.TEMP_DICT[k] = 0
-
-    @classmethod
-    def accumulate_temp_results(cls, actual_bitrate_loss_val):
-        for k in Units.SUMMARY_DICT.keys():
-            if k == 'actual bitrate loss [%]':
-                Units.SUMMARY_DICT[k] += actual_bitrate_loss_val
-            else:
-                Units.SUMMARY_DICT[k] += Units.TEMP_DICT[k]
-
-    def prepare_avg_row(self, num_of_records_for_avg, delta_total):
+    def prepare_avg_row(self, stats):
+        delta_stats = stats['delta [%] (tx_link_effective_quality_score-actual bitrate loss)']
+        if not delta_stats['samples']:
+            return ','.join(["N/A"] * len(Units.SUMMARY_HEADER))
         res = ""
-        delta_avg = 0
-        if num_of_records_for_avg == 0:
-            return "N/A," * 26 + "N/A"
         for k in Units.SUMMARY_HEADER:
-            if k == 'delta [%] (tx_link_effective_quality_score-actual bitrate loss)':
-                delta_avg = delta_total / num_of_records_for_avg
-                res += str(delta_avg) + ','
-            elif k == 'test result':
-                res += 'Passed!,' if abs(delta_avg) <= self.tolerance else 'Failed!,'
-            elif k in Units.SUMMARY_DICT:
-                res += str(Units.SUMMARY_DICT[k]/num_of_records_for_avg) + ','
+            if k == 'test result':
+                res += 'Passed!,' if abs(delta_stats['mean']) <= self.tolerance else 'Failed!,'
+            elif k in stats:
+                res += (str(stats[k]['mean']) if stats[k]['samples'] else 'N/A') + ','
             else:
                 res += ','
         return res
 
-    def generate_summary(self):
-        for suf in self.suf_list:
-            output_fn = '.'.join(self.output_file.split('.')[:-1]) + '_' + suf + '.csv'
-            self.generate_summary_headers(output_fn)
-            cnt = 0
-            num_of_records_for_avg = 0
-            num_of_errors = 0
-            wifi_scoring_link_data_gen = Tool.get_wifi_scoring_link_data_info(suf, cnt)
-            wifi_scoring_air_data_gen = Tool.get_wifi_scoring_air_data_info(suf, cnt)
-            wifi_monitoring_link_data_gen = Tool.get_wifi_monitoring_link_data_info(suf, cnt)
-            wifi_monitoring_air_data_gen = Tool.get_wifi_monitoring_air_data_info(suf, cnt)
-            flag = 0
-            delta_total = 0.0
-            while cnt < self.num_of_iter-1:
-                time_info = str(self.period * cnt) + ','
-                self.reset_temp_res_dict()
-                try:
-                    wifi_scoring_link_data_info, tx_link_effective_quality_score = next(wifi_scoring_link_data_gen)
-                    wifi_scoring_air_data_info = next(wifi_scoring_air_data_gen)
-                    wifi_monitoring_link_data_info, datarate = next(wifi_monitoring_link_data_gen)
-                    wifi_monitoring_air_data_info = next(wifi_monitoring_air_data_gen)
-                except FileNotFoundError as err:
-                    self.utils.log(logging.ERROR, "An error occurred: " + err)
-                    flag = 1
-                if not wifi_scoring_link_data_info or not wifi_scoring_air_data_info or not wifi_monitoring_link_data_info or not wifi_monitoring_air_data_info:
-                    break
-                args_from_cmd = self.get_args_from_cmd()
-                try:
-                    actual_bitrate_loss_val = (float(self.dut_bitrate) - float(datarate)) / float(self.dut_bitrate) * 100.0
-                    delta_val = float(tx_link_effective_quality_score) - actual_bitrate_loss_val
-                    if abs(delta_val) <= self.tolerance: passed = ','
-                    else: passed = 'Failed!,'
-                    delta = str(delta_val) + ','
-                    actual_bitrate_loss = str(actual_bitrate_loss_val) + ','
-                except:
-                    passed = delta = actual_bitrate_loss = 'N/A,'
-                    num_of_errors += 1
-                else:
-                    if cnt > 1: # drop the first 2 results
-                        num_of_records_for_avg += 1
-                        delta_total += abs(delta_val)
-                        self.accumulate_temp_results(actual_bitrate_loss_val)
+    def generate_stats(self, output_fn, stats, columns):
+        delta_key = 'delta [%] (tx_link_effective_quality_score-actual bitrate loss)'
+        pass_ratio = summary_stats.SummaryStats.pass_ratio(columns[delta_key], self.tolerance)
+        stats_fn = output_fn[:-len('.csv')] + '_stats.csv'
+        self.writer.write(stats_fn, 'w', ','.join(summary_stats.STATS_HEADER))
+        for row in summary_stats.SummaryStats.to_rows(stats, Units.AVG_METRICS, {delta_key: pass_ratio}):
+            self.writer.write(stats_fn, 'a', row)
 
-                row_data = time_info + args_from_cmd + actual_bitrate_loss + delta + passed + wifi_scoring_link_data_info +\
-                           wifi_scoring_air_data_info + wifi_monitoring_link_data_info + wifi_monitoring_air_data_info
-                self.utils.write2file(output_fn, 'a', row_data)
-                cnt += 1
+    @classmethod
+    def format_value(cls, value):
+        if value != value:
+            return 'N/A'
+        return str(int(value)) if value.is_integer() else str(value)
+
+    def get_summary_values(self, suf, sample_no):
+        values = {}
+        for k, url_sfx, field in Units.SUMMARY_SOURCES:
+            values[k] = self.store.value(url_sfx, suf, sample_no, field)
+        return values
+
+    def get_bitrate_loss_and_delta(self, values):
+        tx_link_effective_quality_score = values['tx_link_effective_quality_score [%]']
+        datarate = values['datarate [Kbps]']
+        if tx_link_effective_quality_score != tx_link_effective_quality_score or datarate != datarate:
+            raise ValueError("missing sample")
+        actual_bitrate_loss_val = (float(self.dut_bitrate) - datarate) / float(self.dut_bitrate) * 100.0
+        return actual_bitrate_loss_val, tx_link_effective_quality_score - actual_bitrate_loss_val
 
-            summary_data = self.prepare_avg_row(num_of_records_for_avg, delta_total)
-            self.utils.write2file(output_fn, 'a', summary_data)
-            if not flag: self.utils.log(logging.INFO, output_fn + ' was generated.')
-            if num_of_errors > 0:
-                self.utils.write2file(self.error_file, 'a', '{}: {} error(s) detected'.format(self.output_file, num_of_errors))
+    def generate_summary(self):
+        with tracing.tracer.span('collector', 'generate summary'):
+            return self.generate_summaries()
+
+    def generate_summaries(self):
+        # the summary files are already complete on disk, only the stats files are left to write
+        results = {}
+        index = result_index.ResultIndex(self.index_file) if self.index_file else None
+        for suf, summary in self.summaries.items():
+            output_fn = summary['file'].fn
+            summary['file'].close()
+            summary_data = self.prepare_avg_row(Tool.running_stats(summary))
+            stats = summary_stats.SummaryStats.describe_all(summary['columns'])
+            self.generate_stats(output_fn, stats, summary['columns'])
+            self.utils.log(logging.INFO, output_fn + ' was generated.')
+            if index is not None:
+                index.register(output_fn, summary_data)
+            if summary['errors'] > 0:
+                self.writer.write(self.error_file, 'a', '{}: {} error(s) detected'.format(self.output_file,
+                                                                                           summary['errors']))
+            results[suf] = {'summary_file': output_fn,
+                            'avg_row': summary_data,
+                            'test_result': summary_data.split(',')[Units.SUMMARY_HEADER.index('test result')],
+                            'stats': stats,
+                            'errors': summary['errors']}
+        self.writer.close()
+        if index is not None:
+            index.close()
+        return results
+
+    def join_iperf(self, sides):
+        # sides is a list of (name, nominal bit rate [Kbps], iperf series); one row per sample with the iperf
+        # interval that was running at the sample time and the bit rate loss measured by iperf
+        output_fn = '.'.join(self.output_file.split('.')[:-1]) + '_iperf.csv'
+        header = ['time [sec]', 'sample time [sec]']
+        for name, nominal, series in sides:
+            header += ['{} {}'.format(name, k) for k in iperf_results.IperfResults.FIELDS]
+            header += ['{} measured bitrate loss [%]'.format(name), '{} live rate [Kbps]'.format(name)]
+        self.writer.write(output_fn, 'w', ','.join(header))
+        starts = [[s[0] for s in series] for name, nominal, series in sides]
+        for sample_no, (nominal_time, sample_time) in enumerate(self.sample_times):
+            row = [str(nominal_time), '{:.3f}'.format(sample_time)]
+            for (name, nominal, series), series_starts in zip(sides, starts):
+                values = iperf_results.IperfResults.lookup(series, series_starts, self.t0_wall + sample_time)
+                values.append((float(nominal) - values[0]) / float(nominal) * 100.0)
+                # the rate the iperf monitor reported at the sample time (NaN without a live stream)
+                values.append(self.store.value('/iperf', name, sample_no, 'rate [Kbps]'))
+                row += [self.format_value(v) for v in values]
+            self.writer.write(output_fn, 'a', ','.join(row))
+        self.writer.close()
+        self.utils.log(logging.INFO, output_fn + ' was generated.')
+        summary = {'iperf_file': output_fn}
+        for name, nominal, series in sides:
+            summary[name] = iperf_results.IperfResults.summarize(series)
+        return summary
+
+    def collect(self):
+        # in-process entry point: runs for the configured duration and returns the per band results,
+        # Ctrl+C or a failed iperf stream still produce the summary before they are re-raised
+        try:
+            self.run()
+        except (KeyboardInterrupt, iperf_monitor.IperfStreamError):
+            self.stop = datetime.datetime.now().time()
+            self.generate_summary()
+            raise
+        self.stop = datetime.datetime.now().time()
+        return {'bands': self.generate_summary(),
+                'num_of_iter': self.num_of_iter,
+                'missed_ticks': self.missed_ticks,
+                'early_stopped': self.early_stopped,
+                'sample_times': self.sample_times}
 
 
 def main():
@@ -551,9 +649,17 @@ def main():
     parser.add_option('--dut-bitrate', dest='dut_bitrate', type='int', help='bit rate of device under test in Kbps (required)')
     parser.add_option('--external-ap-load', dest='external_ap_load', type='int', help='external AP load in Mbps (required)')
     parser.add_option('--external-ap-channel', dest='external_ap_channel', type='int', help='external AP channel (required)')
-    parser.add_option('--period', dest='period', type="int", default=30, help='idletime between two samples, default: 30sec (optional)')
+    parser.add_option('--period', dest='period', type="float", default=30, help='idletime between two samples, default: 30sec (optional)')
     parser.add_option('--tolerance', dest='tolerance', type="float", default=10.0, help='approved tolerance for bitrate loss in percents, default: 10.0% (optional)')
     parser.add_option('--duration', dest='duration', type="int", default=20*60, help='maximal duration of data collection process, default 1200sec (optional)')
+    parser.add_option('--timeout', dest='request_timeout', type="int", default=10, help='timeout of a single endpoint request, default: 10sec (optional)')
+    parser.add_option('--warmup', dest='warmup', type="int", default=2, help='number of first samples left out of the averages, default: 2 (optional)')
+    parser.add_option('--early-stop', dest='early_stop', action='store_true', default=False, help='stop before --duration once the pass/fail verdict is statistically stable (optional)')
+    parser.add_option('--min-samples', dest='min_samples', type="int", default=10, help='minimal number of samples before an early stop, default: 10 (optional)')
+    parser.add_option('--confidence', dest='confidence', type="float", default=0.95, help='confidence level of the early stop verdict, default: 0.95 (optional)')
+    parser.add_option('--export-raw', dest='export_raw', action='store_true', default=False, help='also write the raw per-endpoint <output>_<endpoint>_<band>_raw.csv files, off by default when run standalone; the QoE executor enables it unless --no-export-raw (optional)')
+    parser.add_option('--index', dest='index_file', type="string", help='register the final averages in this SQLite result index (optional)')
+    parser.add_option('--trace', dest='trace_file', type="string", help='write Chrome trace events of the ticks, endpoint fetches and parsing to this file (optional)')
     parser.add_option('--output', dest='output_file', type="string", default='output.csv', help='path to output file, default: output.csv (optional)')
     (opts, args) = parser.parse_args()
     assert opts.url is not None, "--url is required"
@@ -562,10 +668,15 @@ def main():
     assert opts.external_ap_channel is not None, "--external-ap-channel is required"
     assert 0.0 <= opts.tolerance <= 100.0, "--tolerance should be in the range [0, 100]"
     assert opts.duration > 0, "--duration should be positive integer"
+    assert opts.period > 0, "--period should be positive"
+    assert opts.warmup >= 0, "--warmup should not be negative"
+    assert 0.0 < opts.confidence < 1.0, "--confidence should be in the range (0, 1)"
     tool = Tool(url_val=opts.url, period_val=opts.period, output_file_val=opts.output_file,
                 dut_bitrate=opts.dut_bitrate, external_ap_load=opts.external_ap_load,
                 external_ap_channel=opts.external_ap_channel, tolerance=opts.tolerance,
-                duration=opts.duration)
+                duration=opts.duration, request_timeout=opts.request_timeout, export_raw=opts.export_raw,
+                warmup=opts.warmup, early_stop=opts.early_stop, min_samples=opts.min_samples,
+                confidence=opts.confidence, index_file=opts.index_file)
     utils.logger.log(logging.INFO, "Running with arguments:")
     utils.logger.log(logging.INFO, "--url {}".format(tool.url))
     utils.logger.log(logging.INFO, "--period {}".format(tool.period))
@@ -575,16 +686,25 @@ def main():
     utils.logger.log(logging.INFO, "--external-ap-channel {}".format(tool.external_ap_channel))
     utils.logger.log(logging.INFO, "--tolerance {}".format(tool.tolerance))
     utils.logger.log(logging.INFO, "--duration {}".format(tool.duration))
+    utils.logger.log(logging.INFO, "--timeout {}".format(tool.request_timeout))
+    utils.logger.log(logging.INFO, "--export-raw {}".format(tool.export_raw))
+    utils.logger.log(logging.INFO, "--warmup {}".format(tool.warmup))
+    utils.logger.log(logging.INFO, "--early-stop {}".format(tool.early_stop))
+    utils.logger.log(logging.INFO, "--min-samples {}".format(tool.min_samples))
+    utils.logger.log(logging.INFO, "--confidence {}".format(opts.confidence))
+    utils.logger.log(logging.INFO, "--index {}".format(tool.index_file))
+    utils.logger.log(logging.INFO, "--trace {}".format(opts.trace_file))
     utils.logger.log(logging.INFO, "\n(Ctrl+C to exit)\n")
+    if opts.trace_file:
+        tracing.tracer.enable()
     try:
-        tool.run()
+        tool.collect()
     except KeyboardInterrupt:
-        tool.stop = datetime.datetime.now().time()
-        tool.generate_summary()
-        tool.exit_when_done()
-
-    tool.stop = datetime.datetime.now().time()
-    tool.generate_summary()
+        pass
+    if opts.trace_file:
+        tracing.tracer.export_chrome(opts.trace_file)
+        for line in tracing.tracer.report():
+            utils.logger.log(logging.INFO, line)
     tool.exit_when_done()
 
 if __name__ == "__main__":
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+# global imports
+import re
+import time
+import shlex
+import logging
+# local imports
+import tracing
+
+
+logger = logging.getLogger()
+
+
+class StepResult(object):
+    def __init__(self, name, rc=None, elapsed=0.0, output=''):
+        self.name = name
+        self.rc = rc
+        self.elapsed = elapsed
+        self.output = output
+
+    @property
+    def ok(self):
+        return self.rc == 0
+
+    def __str__(self):
+        if self.rc is None:
+            return "{}: skipped".format(self.name)
+        return "{}: rc {} in {:.3f}sec".format(self.name, self.rc, self.elapsed)
+
+
+class RemoteBatch(object):
+    # a host's sequence of steps as one shell script run by a single exec; each step is framed by marker lines
+    # carrying its exit status and duration, readiness waits poll on the host instead of one exec per poll
+    MARKER = '__qoe_step__'
+    # a step whose output does not end with a newline (printf) leaves the end marker at the end of its last line
+    END_RE = re.compile(MARKER + r' end (\d+) (\d+) (\d+)$')
+
+    def __init__(self):
+        self.steps = []
+        self.waits = []
+
+    def add(self, name, cmd, check=False):
+        # a failed check step ends the script, the remaining steps are reported as skipped
+        self.steps.append((name, cmd, check))
+        return self
+
+    def add_wait(self, name, probe, timeout, interval=1.0, check=False):
+        cmd = "__deadline=$(( $(date +%s) + {} )); until {}; do [ $(date +%s) -ge $__deadline ] && break; " \
+              "sleep {}; done; {}".format(int(timeout), probe, interval, probe)
+        self.waits.append(name)
+        return self.add(name, cmd, check)
+
+    def script(self):
+        lines = []
+        for i, (name, cmd, check) in enumerate(self.steps):
+            lines.append("echo '{} begin {}'".format(RemoteBatch.MARKER, i))
+            lines.append("__t0=$(date +%s%N)")
+            lines.append("( {} ) 2>&1".format(cmd))
+            lines.append("__rc=$?")
+            lines.append("echo \"{} end {} $__rc $(( ($(date +%s%N) - __t0) / 1000000 ))\"".format(RemoteBatch.MARKER,
+                                                                                                   i))
+            if check:
+                lines.append("[ $__rc -eq 0 ] || exit $__rc")
+        return '\n'.join(lines)
+
+    def command(self):
+        return "/bin/sh -c {}".format(shlex.quote(self.script()))
+
+    def parse(self, output):
+        results = [StepResult(name) for name, cmd, check in self.steps]
+        current = None
+        for line in output.splitlines():
+            match = RemoteBatch.END_RE.search(line)
+            if match:
+                if current is not None:
+                    results[current].output += line[:match.start()]
+                i, rc, elapsed_ms = [int(g) for g in match.groups()]
+                results[i].rc = rc
+                results[i].elapsed = elapsed_ms / 1000.0
+                current = None
+            elif line.startswith(RemoteBatch.MARKER + ' begin '):
+                current = int(line.split()[-1])
+            elif current is not None:
+                results[current].output += line + '\n'
+        return results
+
+    def failed(self, results):
+        # the check steps and the waits decide whether a run went through, a plain step may fail (killall)
+        return [result.name for (name, cmd, check), result in zip(self.steps, results)
+                if (check or name in self.waits) and not result.ok]
+
+    def run(self, utils, host_name, user_name, password, port=22, tries=3):
+        # {step name: StepResult}; like run_cmd_via_ssh a failed run is repeated with a backoff, the steps are
+        # written to be safe to run again (stop, reconnect, start)
+        for i in range(tries):
+            rc, stdout_ = utils.run_cmd_via_ssh(host_name, user_name, password, self.command(), port=port,
+                                                retry=False)
+            results = self.parse(stdout_.decode('utf-8', 'replace'))
+            for result in results:
+                logger.log(logging.DEBUG, "{}: {}".format(host_name, result))
+            failed = self.failed(results)
+            if not failed or i == tries - 1:
+                break
+            backoff = min(2 ** (i + 1), 20)
+            logger.log(logging.DEBUG, "{}: {} failed, waiting for {}sec before retry...".format(
+                host_name, ', '.join(failed), backoff))
+            with tracing.tracer.span('sleep', 'batch retry backoff', host=host_name):
+                time.sleep(backoff)
+            utils.record_probe('batch retry backoff', backoff, True)
+        return dict((result.name, result) for result in results)
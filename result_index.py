@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+# global imports
+import os
+import re
+import time
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ResultIndex(object):
+    # one row per band summary file with its header and final averages row; the collector registers a scenario
+    # when it finishes, make_summary only reads files whose size or mtime changed since they were indexed
+    SCENARIO_RE = re.compile(r'^TP(\d+)_dut_ch(\d+)_(\d+)_int_ch(\d+)_(\d+)_(.+)\.csv$')
+    FILTERS = ['work_dir', 'test_id', 'dut_channel', 'dut_bitrate', 'int_channel', 'int_load', 'band']
+    COLUMNS = ['summary_file', 'scenario_id', 'header', 'avg_row', 'mtime', 'size', 'registered'] + FILTERS
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS results ("
+                              "summary_file TEXT PRIMARY KEY, work_dir TEXT, scenario_id TEXT, test_id INTEGER, "
+                              "dut_channel INTEGER, dut_bitrate INTEGER, int_channel INTEGER, int_load INTEGER, "
+                              "band TEXT, header TEXT, avg_row TEXT, mtime REAL, size INTEGER, registered REAL)")
+            # indexes of earlier versions lack the header, their rows are read again on the next update
+            if 'header' not in [row[1] for row in self.conn.execute("PRAGMA table_info(results)")]:
+                self.conn.execute("ALTER TABLE results ADD COLUMN header TEXT")
+            for column in ResultIndex.FILTERS:
+                self.conn.execute("CREATE INDEX IF NOT EXISTS results_{0} ON results ({0})".format(column))
+
+    @classmethod
+    def read_header(cls, fn):
+        with open(fn, 'r') as fh:
+            return fh.readline().rstrip('\r\n')
+
+    @classmethod
+    def describe_file(cls, fn, header, avg_row, st):
+        name = os.path.basename(fn)
+        info = dict((column, None) for column in ResultIndex.COLUMNS)
+        info.update({'summary_file': fn,
+                     'work_dir': os.path.basename(os.path.dirname(fn)),
+                     'scenario_id': name[: name.find('.csv')],
+                     'header': header,
+                     'avg_row': avg_row,
+                     'mtime': st.st_mtime,
+                     'size': st.st_size,
+                     'registered': time.time()})
+        match = ResultIndex.SCENARIO_RE.match(name)
+        if match:
+            for key, value in zip(['test_id', 'dut_channel', 'dut_bitrate', 'int_channel', 'int_load'], match.groups()):
+                info[key] = int(value)
+            info['band'] = match.group(6)
+        return info
+
+    def register(self, fn, avg_row):
+        self.register_many([ResultIndex.describe_file(os.path.abspath(fn), ResultIndex.read_header(fn), avg_row,
+                                                      os.stat(fn))])
+
+    def register_many(self, infos):
+        # one transaction for the whole batch
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO results ({}) VALUES ({})".format(
+                ','.join(ResultIndex.COLUMNS), ','.join(':' + column for column in ResultIndex.COLUMNS)), infos)
+
+    def update(self, files_list, read_avg_row, workers=1):
+        # files that are unchanged since they were indexed are not opened at all, the others are read by a
+        # pool of workers while the sqlite connection stays in the calling thread
+        known = dict((row[0], (row[1], row[2])) for row in
+                     self.conn.execute("SELECT summary_file, mtime, size FROM results WHERE header IS NOT NULL"))
+
+        def scan(fn):
+            # a file removed since the directory was listed is skipped, prune() drops its old row
+            try:
+                st = os.stat(fn)
+                if known.get(fn) == (st.st_mtime, st.st_size):
+                    return None
+                return ResultIndex.describe_file(fn, ResultIndex.read_header(fn), read_avg_row(fn), st)
+            except FileNotFoundError:
+                return None
+
+        cwd = os.getcwd()
+        files_list = [os.path.normpath(os.path.join(cwd, fn)) for fn in files_list]
+        if workers > 1 and len(files_list) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                infos = [info for info in pool.map(scan, files_list) if info is not None]
+        else:
+            infos = [info for info in map(scan, files_list) if info is not None]
+        self.register_many(infos)
+        return len(infos)
+
+    def prune(self, dir_path):
+        # summary files that were deleted from dir_path since they were indexed
+        dir_path = os.path.join(os.path.abspath(dir_path), '')
+        gone = [row[0] for row in self.conn.execute("SELECT summary_file FROM results WHERE summary_file LIKE ?",
+                                                     (dir_path + '%',))
+                if not os.path.exists(row[0])]
+        with self.conn:
+            self.conn.executemany("DELETE FROM results WHERE summary_file = ?", [(fn,) for fn in gone])
+        return len(gone)
+
+    def query(self, columns=('scenario_id', 'avg_row'), **filters):
+        where = []
+        params = []
+        for column in ResultIndex.FILTERS:
+            if filters.get(column) is not None:
+                where.append("{} = ?".format(column))
+                params.append(filters[column])
+        sql = "SELECT {} FROM results".format(','.join(columns))
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY work_dir, test_id, scenario_id, summary_file"
+        return self.conn.execute(sql, params).fetchall()
+
+    def close(self):
+        self.conn.close()
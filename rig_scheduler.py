@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+# global imports
+import threading
+import logging
+# local imports
+import utils
+
+
+class ResourceLocks(object):
+    # one lock per named resource (station address, serial port, gateway url); a scenario takes all locks
+    # of its rig in sorted order, so rigs that share a resource are serialized without deadlocking
+    def __init__(self):
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, resources):
+        resources = sorted(set(resources))
+        with self.lock:
+            locks = [self.locks.setdefault(r, threading.Lock()) for r in resources]
+        for lock in locks:
+            lock.acquire()
+        return locks
+
+    @classmethod
+    def release(cls, locks):
+        for lock in reversed(locks):
+            lock.release()
+
+
+class RigScheduler(object):
+    def __init__(self, rigs):
+        self.rigs = rigs
+        self.resource_locks = ResourceLocks()
+        self.tests_lock = threading.Lock()
+        self.errors = []
+        self.utils = utils.Utils()
+
+    def next_test(self, tests):
+        with self.tests_lock:
+            if self.errors:
+                return []
+            return next(tests, [])
+
+    def run_rig(self, rig, tests):
+        while True:
+            test_data_list = self.next_test(tests)
+            if len(test_data_list) == 0:
+                return
+            locks = self.resource_locks.acquire(rig.get_resources())
+            try:
+                rig.run_test(test_data_list)
+            except BaseException as err:
+                self.utils.log(logging.ERROR, "rig {} failed on test {}: {}".format(rig.rig_name, test_data_list[0], err))
+                with self.tests_lock:
+                    self.errors.append(err)
+                return
+            finally:
+                self.resource_locks.release(locks)
+
+    def run(self, queues):
+        # a single queue of tests is shared by all rigs, otherwise every rig runs its own
+        threads = []
+        for i, rig in enumerate(self.rigs):
+            tests = queues[0] if len(queues) == 1 else queues[i]
+            thread = threading.Thread(target=self.run_rig, args=(rig, tests), name=rig.rig_name, daemon=True)
+            thread.start()
+            threads.append(thread)
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt as err:
+            # no rig picks up a new test after Ctrl+C
+            with self.tests_lock:
+                self.errors.append(err)
+            raise
+        if self.errors:
+            raise self.errors[0]
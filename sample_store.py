@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+# global imports
+from array import array
+
+NAN = float('nan')
+
+
+class SampleStore(object):
+    # column-oriented sample store: per (endpoint, band) one array('l') of sample numbers and one array('d')
+    # per field; values that are missing or not numeric are kept as NaN
+    def __init__(self):
+        self.samples = {}
+        self.columns = {}
+        self.positions = {}
+
+    @classmethod
+    def to_float(cls, value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return NAN
+
+    def append(self, url_sfx, suf, sample_no, fields, values):
+        key = (url_sfx, suf)
+        if key not in self.columns:
+            self.samples[key] = array('l')
+            self.columns[key] = dict((field, array('d')) for field in fields)
+            self.positions[key] = {}
+        self.positions[key][sample_no] = len(self.samples[key])
+        self.samples[key].append(sample_no)
+        for field, value in zip(fields, values):
+            self.columns[key][field].append(self.to_float(value))
+
+    def column(self, url_sfx, suf, field):
+        return self.columns.get((url_sfx, suf), {}).get(field, array('d'))
+
+    def value(self, url_sfx, suf, sample_no, field):
+        key = (url_sfx, suf)
+        pos = self.positions.get(key, {}).get(sample_no)
+        if pos is None or field not in self.columns[key]:
+            return NAN
+        return self.columns[key][field][pos]
+
+    def __len__(self):
+        return sum(len(samples) for samples in self.samples.values())
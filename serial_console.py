@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+# global imports
+import re
+import time
+import threading
+import logging
+import serial
+
+
+logger = logging.getLogger()
+
+
+class SerialConsole(object):
+    # keeps the port open between command batches, reads whatever is buffered in one go and returns as soon as
+    # the prompt (or a caller supplied pattern) ends the output; timeout bounds the wait for silent consoles.
+    # The lines of a multi-line command ('user\rpassword\rcmd') are sent one by one, each waiting for its own
+    # prompt, so an intermediate 'Password:' never ends the command
+    PROMPT = re.compile(br'([#>$]|[Ll]ogin:|[Pp]assword:)\s*$')
+    SHELL_PROMPT = re.compile(br'[#>$]\s*$')
+
+    def __init__(self, port, baudrate, prompt=None, timeout=1.0, serial_factory=serial.serial_for_url):
+        self.port = port
+        self.prompt = re.compile(prompt) if isinstance(prompt, bytes) else prompt or SerialConsole.PROMPT
+        self.timeout = timeout
+        self.ser = serial_factory(port, baudrate, timeout=0.05)
+        self.lock = threading.RLock()
+
+    def read_until(self, pattern, timeout):
+        buf = b''
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            chunk = self.ser.read(self.ser.in_waiting or 1)
+            if chunk:
+                buf += chunk
+                if pattern.search(buf):
+                    return buf, True
+        return buf, False
+
+    def send(self, cmd, expect=None, timeout=None):
+        # returns (response, matched), matched tells whether the last line ended with the expected prompt
+        timeout = timeout or self.timeout
+        lines = cmd.split('\r')
+        with self.lock:
+            # late output of the previous command is kept with this response, but cannot end it
+            response = self.ser.read(self.ser.in_waiting) if self.ser.in_waiting else b''
+            for i, line in enumerate(lines):
+                last = i == len(lines) - 1
+                self.ser.write((line + ('\r\n' if last else '\r')).encode())
+                output, matched = self.read_until((expect or self.prompt) if last else self.prompt, timeout)
+                response += output
+                if not matched:
+                    break
+        response = response.decode('utf-8', 'replace')
+        logger.log(logging.DEBUG, 'Serial request: {}\tSerial response: {}'.format(cmd, response))
+        if not matched:
+            logger.log(logging.DEBUG, 'Serial: no prompt on {} after {}sec'.format(self.port, timeout))
+        return response, matched
+
+    def send_all(self, commands_list, expect=None, timeout=None):
+        # the whole sequence (e.g. a login) holds the console, so concurrent callers cannot interleave; a
+        # command is a string or a (command, expected prompt) pair
+        with self.lock:
+            return [self.send(cmd, expect, timeout) if isinstance(cmd, str) else self.send(cmd[0], cmd[1], timeout)
+                    for cmd in commands_list]
+
+    def close(self):
+        with self.lock:
+            self.ser.close()
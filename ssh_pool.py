@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+# global imports
+import socket
+import threading
+import time
+import logging
+import paramiko
+
+
+logger = logging.getLogger()
+
+
+class HostStats(object):
+    def __init__(self):
+        self.connects = 0
+        self.reconnects = 0
+        self.connect_time = 0.0
+        self.execs = 0
+        self.exec_time = 0.0
+        self.exec_max = 0.0
+
+    def add_connect(self, elapsed, reconnect):
+        self.connects += 1
+        self.connect_time += elapsed
+        if reconnect:
+            self.reconnects += 1
+
+    def add_exec(self, elapsed):
+        self.execs += 1
+        self.exec_time += elapsed
+        self.exec_max = max(self.exec_max, elapsed)
+
+    def __str__(self):
+        connect_avg = self.connect_time / self.connects if self.connects else 0.0
+        exec_avg = self.exec_time / self.execs if self.execs else 0.0
+        return "connects: {} (reconnects: {}, avg {:.3f}sec), execs: {} (avg {:.3f}sec, max {:.3f}sec)".format(
+            self.connects, self.reconnects, connect_avg, self.execs, exec_avg, self.exec_max)
+
+
+class SshSessionPool(object):
+    # one keep-alive SSHClient per (host, user, port), reconnected on demand when its transport dies
+    def __init__(self, keepalive=30, connect_timeout=10, client_factory=paramiko.SSHClient):
+        self.keepalive = keepalive
+        self.connect_timeout = connect_timeout
+        self.client_factory = client_factory
+        self.clients = {}
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.key_locks = {}
+
+    def key_lock(self, key):
+        with self.lock:
+            if key not in self.key_locks:
+                self.key_locks[key] = threading.Lock()
+                self.stats[key] = HostStats()
+            return self.key_locks[key]
+
+    @classmethod
+    def is_alive(cls, client):
+        transport = client.get_transport()
+        return transport is not None and transport.is_active()
+
+    def connect(self, key, password, reconnect):
+        hostname, username, port = key
+        t1 = time.monotonic()
+        client = self.client_factory()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(hostname, port=port, username=username, password=password, timeout=self.connect_timeout)
+        client.get_transport().set_keepalive(self.keepalive)
+        elapsed = time.monotonic() - t1
+        self.stats[key].add_connect(elapsed, reconnect)
+        logger.log(logging.DEBUG, "ssh session to {}@{}:{} opened in {:.3f}sec".format(username, hostname, port,
+                                                                                        elapsed))
+        return client
+
+    def get_client(self, hostname, username, password, port=22):
+        key = (hostname, username, port)
+        with self.key_lock(key):
+            client = self.clients.get(key)
+            if client is not None and self.is_alive(client):
+                return client
+            if client is not None:
+                logger.log(logging.DEBUG, "ssh session to {} is dead, reconnecting...".format(hostname))
+                client.close()
+            client = self.connect(key, password, self.stats[key].connects > 0)
+            self.clients[key] = client
+            return client
+
+    def drop(self, hostname, username, port=22):
+        key = (hostname, username, port)
+        with self.key_lock(key):
+            client = self.clients.pop(key, None)
+            if client is not None:
+                client.close()
+
+    def exec_command(self, hostname, username, password, cmd, port=22, timeout=None):
+        # only opening the channel is retried: once the command may have started on the remote side, errors
+        # (timeouts included) go to the caller rather than running a non-idempotent command twice
+        t1 = time.monotonic()
+        channel = self.open_session(hostname, username, password, port)
+        try:
+            if timeout is not None:
+                channel.settimeout(timeout)
+            channel.exec_command(cmd)
+            out, err = channel.makefile('rb').read(), channel.makefile_stderr('rb').read()
+            rc = channel.recv_exit_status()
+        finally:
+            channel.close()
+        self.stats[(hostname, username, port)].add_exec(time.monotonic() - t1)
+        return rc, out, err
+
+    def open_session(self, hostname, username, password, port=22):
+        # a new channel on the pooled session, reconnected once when the session turns out dead; nothing has
+        # been run on the remote side yet, so the retry is always safe
+        for attempt in range(2):
+            client = self.get_client(hostname, username, password, port)
+            try:
+                return client.get_transport().open_session()
+            except (paramiko.SSHException, EOFError, socket.error, AttributeError):
+                self.drop(hostname, username, port)
+                if attempt:
+                    raise
+
+    def open_sftp(self, hostname, username, password, port=22):
+        # an SFTP channel on the pooled session, the caller closes it once its batch of transfers is done
+        try:
+            return self.get_client(hostname, username, password, port).open_sftp()
+        except (paramiko.SSHException, EOFError, socket.error):
+            self.drop(hostname, username, port)
+            return self.get_client(hostname, username, password, port).open_sftp()
+
+    def open_channel(self, hostname, username, password, cmd, port=22):
+        # a command that keeps running on its own channel of the pooled session, its output is read by the caller
+        channel = self.open_session(hostname, username, password, port)
+        channel.set_combine_stderr(True)
+        channel.exec_command(cmd)
+        return channel
+
+    def report(self):
+        with self.lock:
+            return ["{}@{}:{} - {}".format(k[1], k[0], k[2], v) for k, v in sorted(self.stats.items())]
+
+    def close(self):
+        with self.lock:
+            clients = list(self.clients.values())
+            self.clients.clear()
+        for client in clients:
+            client.close()
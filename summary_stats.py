@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+# global imports
+import math
+import statistics
+
+STATS_HEADER = ['metric', 'samples', 'mean', 'median', 'p5', 'p95', 'stddev', 'pass ratio [%]']
+
+
+class SummaryStats(object):
+    @classmethod
+    def percentile(cls, sorted_values, q):
+        # linear interpolation between closest ranks
+        pos = (len(sorted_values) - 1) * q / 100.0
+        lo = int(math.floor(pos))
+        hi = min(lo + 1, len(sorted_values) - 1)
+        return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+    @classmethod
+    def describe(cls, values):
+        values = sorted(v for v in values if v == v)
+        if not values:
+            return {'samples': 0}
+        return {'samples': len(values),
+                'mean': math.fsum(values) / len(values),
+                'median': statistics.median(values),
+                'p5': cls.percentile(values, 5),
+                'p95': cls.percentile(values, 95),
+                'stddev': statistics.stdev(values) if len(values) > 1 else 0.0}
+
+    @classmethod
+    def describe_all(cls, columns):
+        return dict((metric, cls.describe(values)) for metric, values in columns.items())
+
+    @classmethod
+    def pass_ratio(cls, deltas, tolerance):
+        deltas = [d for d in deltas if d == d]
+        if not deltas:
+            return float('nan')
+        return 100.0 * sum(1 for d in deltas if abs(d) <= tolerance) / len(deltas)
+
+    @classmethod
+    def to_rows(cls, stats, metrics, pass_ratios=None):
+        rows = []
+        for metric in metrics:
+            s = stats[metric]
+            row = [metric, str(s['samples'])]
+            for k in STATS_HEADER[2:-1]:
+                row.append(str(s[k]) if s['samples'] else 'N/A')
+            ratio = (pass_ratios or {}).get(metric)
+            row.append('N/A' if ratio is None or ratio != ratio else str(ratio))
+            rows.append(','.join(row))
+        return rows
+
+
+class RunningStats(object):
+    # Welford's streaming mean/variance, O(1) per sample
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value):
+        self.n += 1
+        diff = value - self.mean
+        self.mean += diff / self.n
+        self.m2 += diff * (value - self.mean)
+
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    def stddev(self):
+        return math.sqrt(self.variance())
+
+    def confidence_interval(self, z):
+        half_width = z * math.sqrt(self.variance() / self.n) if self.n else float('inf')
+        return self.mean - half_width, self.mean + half_width
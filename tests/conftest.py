@@ -0,0 +1,7 @@
+# global imports
+import os
+import sys
+
+
+# the modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,28 @@
+# global imports
+import json
+# local imports
+import campaign_journal
+
+
+def write_journal(path, scenarios, torn):
+    # scenarios: [(scenario id, final event)]; torn is the start of a record cut off by a crash
+    with open(path, 'w') as fh:
+        fh.write(json.dumps({'event': 'old'}) + '\n')
+        fh.write(json.dumps({'event': 'campaign', 'work_dir': 'work', 'tests_file': 'tests.csv'}) + '\n')
+        for scenario_id, event in scenarios:
+            fh.write(json.dumps({'event': 'started', 'scenario_id': scenario_id, 'rig': 'DEFAULT'}) + '\n')
+            fh.write(json.dumps({'event': event, 'scenario_id': scenario_id, 'rig': 'DEFAULT'}) + '\n')
+        fh.write(torn)
+
+
+def test_torn_last_line_is_skipped_and_closed_off(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    write_journal(path, [('TP1', 'done'), ('TP2', 'failed')], '{"event": "done", "scenario_id": "TP3", "ri')
+    journal = campaign_journal.CampaignJournal(path)
+    assert journal.load()['work_dir'] == 'work'
+    assert journal.is_done('TP1') and journal.status('TP2') == 'failed' and journal.status('TP3') is None
+    # the next record starts on a line of its own
+    journal.scenario_started('TP3', 'DEFAULT')
+    journal = campaign_journal.CampaignJournal(path)
+    journal.load()
+    assert journal.status('TP3') == 'started' and journal.finished('DEFAULT') == 2
@@ -0,0 +1,48 @@
+# global imports
+import random
+# local imports
+import campaign_planner
+
+
+def make_rows(n=24, seed=3):
+    # [test id, dut_channel, dut_data, int_channel, int_data] over 3 channels and 2 loads, shuffled
+    rng = random.Random(seed)
+    rows = [[i + 1, 6, [20000, 40000][i % 2], [1, 6, 11][i % 3], 60000] for i in range(n)]
+    rng.shuffle(rows)
+    return rows
+
+
+def config_changes(rows):
+    return sum(1 for prev, row in zip(rows, rows[1:]) if (prev[2], prev[3]) != (row[2], row[3]))
+
+
+def test_plan_keeps_config_groups_together():
+    planner = campaign_planner.ScenarioPlanner(60, 0, reboot_every=0)
+    rows = make_rows()
+    planned = planner.plan(rows)
+    assert sorted(planned) == sorted(rows)
+    # 6 configurations: one change between each of them
+    assert config_changes(planned) == 5
+    assert planner.estimate(planned) < planner.estimate(rows)
+
+
+def test_plan_regroups_after_every_reboot():
+    planner = campaign_planner.ScenarioPlanner(60, 0, reboot_every=5)
+    planned = planner.plan(make_rows())
+    # a reboot clears the configuration, within the 5 tests between reboots the groups stay together
+    for i in range(0, len(planned), 5):
+        assert config_changes(planned[i:i + 5]) <= 1
+    assert planner.estimate(planned) < planner.estimate(make_rows())
+
+
+def test_split_plans_every_rig_on_its_own():
+    planner = campaign_planner.ScenarioPlanner(60, 0, reboot_every=5)
+    rows = make_rows(30)
+    queues = planner.split(rows, 2)
+    assert sorted(row for queue in queues for row in queue) == sorted(rows)
+    for queue in queues:
+        assert queue == planner.plan(queue)
+        for i in range(0, len(queue), 5):
+            assert config_changes(queue[i:i + 5]) <= 1
+    # the rigs get about the same work
+    assert abs(planner.estimate(queues[0]) - planner.estimate(queues[1])) <= planner.estimate(rows) * 0.2
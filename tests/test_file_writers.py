@@ -0,0 +1,51 @@
+# global imports
+import os
+# local imports
+import file_writers
+
+
+def read(fn):
+    with open(fn) as fh:
+        return fh.read()
+
+
+def test_rotate_keeps_the_rows_and_starts_a_fresh_file(tmp_path):
+    fn, rotated_fn = str(tmp_path / 'summary.csv'), str(tmp_path / 'summary.1.csv')
+    pool = file_writers.FileWriterPool(batch_size=100, flush_interval=0)
+    pool.write(fn, 'w', 'a,b')
+    pool.write(fn, 'a', '1,2')
+    pool.rotate(fn, rotated_fn, header='a,b')
+    pool.write(fn, 'a', '3,4')
+    pool.close()
+    assert read(rotated_fn) == 'a,b\n1,2\n'
+    assert read(fn) == 'a,b\n3,4\n'
+    assert sorted(os.listdir(str(tmp_path))) == ['summary.1.csv', 'summary.csv']
+
+
+def test_rotate_syncs_before_each_rename(tmp_path, monkeypatch):
+    fn, rotated_fn = str(tmp_path / 'summary.csv'), str(tmp_path / 'summary.1.csv')
+    calls = []
+    fsync, replace = os.fsync, os.replace
+    monkeypatch.setattr(file_writers.os, 'fsync', lambda fd: calls.append('fsync') or fsync(fd))
+    monkeypatch.setattr(file_writers.os, 'replace', lambda src, dst: calls.append(
+        'replace ' + os.path.basename(dst)) or replace(src, dst))
+    pool = file_writers.FileWriterPool(flush_interval=0)
+    pool.write(fn, 'w', '1,2')
+    pool.rotate(fn, rotated_fn)
+    pool.close()
+    # the old content, then the fresh file, then the directory entry
+    assert calls[:5] == ['fsync', 'replace summary.1.csv', 'fsync', 'replace summary.csv', 'fsync']
+    assert read(rotated_fn) == '1,2\n' and read(fn) == ''
+
+
+def test_trailer_is_rewritten_in_place(tmp_path):
+    fn = str(tmp_path / 'summary.csv')
+    trailer_file = file_writers.TrailerFile(fn, 'a,b')
+    trailer_file.append('1,2', 'avg 1.5,2.5')
+    assert read(fn) == 'a,b\n1,2\navg 1.5,2.5\n'
+    trailer_file.append('3,4', 'avg 2,3')
+    # a shorter trailer leaves nothing of the longer one behind
+    assert read(fn) == 'a,b\n1,2\n3,4\navg 2,3\n'
+    trailer_file.append(None, 'avg N/A')
+    trailer_file.close()
+    assert read(fn) == 'a,b\n1,2\n3,4\navg N/A\n'
@@ -0,0 +1,106 @@
+# global imports
+import json
+import time
+import socket
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+# local imports
+import http_client
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests += 1
+        if self.path == '/slow':
+            time.sleep(0.5)
+        if self.path == '/flaky' and self.server.requests == 1:
+            self.send_error(503)
+            return
+        if self.path == '/missing':
+            self.send_error(404)
+            return
+        body = json.dumps({'path': self.path}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    httpd.requests = 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def url(httpd, path):
+    return 'http://127.0.0.1:{}{}'.format(httpd.server_address[1], path)
+
+
+def test_connection_is_kept_alive(server):
+    client = http_client.HttpClient()
+    assert client.get_json(url(server, '/a')) == {'path': '/a'}
+    assert client.get_json(url(server, '/b')) == {'path': '/b'}
+    assert sum(len(conns) for conns in client.idle.values()) == 1
+    client.close()
+
+
+def test_stale_connection_is_retried_once(server):
+    client = http_client.HttpClient()
+    client.get_json(url(server, '/a'))
+    # the server side of the idle connection goes away
+    for conns in client.idle.values():
+        for conn in conns:
+            conn.sock.shutdown(socket.SHUT_RDWR)
+    assert client.get_json(url(server, '/b')) == {'path': '/b'}
+    client.close()
+
+
+def test_timeout_bounds_the_whole_call(server):
+    client = http_client.HttpClient(backoff=0.05)
+    client.get_json(url(server, '/a'))
+    t1 = time.monotonic()
+    with pytest.raises(socket.timeout):
+        client.get_json(url(server, '/slow'), timeout=0.3)
+    # the retries share the 0.3sec, the tick of the collector waits for timeout+1
+    assert time.monotonic() - t1 < 0.45
+    client.close()
+
+
+def test_server_error_is_retried_with_backoff(server):
+    client = http_client.HttpClient(backoff=0.05)
+    assert client.get_json(url(server, '/flaky')) == {'path': '/flaky'}
+    assert server.requests == 2
+    client.close()
+
+
+def test_refused_connection_is_retried_then_raised():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    client = http_client.HttpClient(timeout=1, retries=2, backoff=0.1)
+    t1 = time.monotonic()
+    with pytest.raises(ConnectionRefusedError):
+        client.get_json('http://127.0.0.1:{}/a'.format(port))
+    # two backoffs, 0.1 and 0.2sec
+    assert 0.3 <= time.monotonic() - t1 < 1.0
+
+
+def test_client_error_is_not_retried(server):
+    client = http_client.HttpClient()
+    with pytest.raises(http_client.HttpError):
+        client.get_json(url(server, '/missing'))
+    assert server.requests == 1
+    client.close()
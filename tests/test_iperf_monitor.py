@@ -0,0 +1,62 @@
+# global imports
+import json
+import time
+import pytest
+# local imports
+import iperf_monitor
+
+
+class FakeChannel(object):
+    # hands out the given output, then the exit status
+    def __init__(self, lines, rc):
+        self.chunks = [(line + '\n').encode() for line in lines]
+        self.rc = rc
+
+    def recv(self, size):
+        return self.chunks.pop(0) if self.chunks else b''
+
+    def recv_exit_status(self):
+        return self.rc
+
+    def close(self):
+        pass
+
+
+def interval(rate):
+    return json.dumps({'event': 'interval', 'data': {'sum': {'bits_per_second': rate * 1000.0}}})
+
+
+def run(channel, **kwargs):
+    monitor = iperf_monitor.IperfMonitor('dut', 'st', channel, 1000, **kwargs).start()
+    monitor.thread.join(timeout=1.0)
+    return monitor
+
+
+def test_client_that_ran_its_time_is_finished():
+    monitor = run(FakeChannel([interval(900), json.dumps({'event': 'end', 'data': {}})], 0))
+    assert monitor.finished and monitor.is_done() and monitor.is_running()
+    monitor.check()
+    assert monitor.latest_rate() != monitor.latest_rate()
+
+
+def test_early_exit_is_a_failure():
+    monitor = run(FakeChannel([interval(900)], 1))
+    assert not monitor.finished and monitor.is_done()
+    with pytest.raises(iperf_monitor.IperfStreamError):
+        monitor.check()
+
+
+def test_exit_after_stop_is_not_a_failure():
+    channel = FakeChannel([], 143)
+    monitor = iperf_monitor.IperfMonitor('dut', 'st', channel, 1000)
+    monitor.stop()
+    monitor.start().thread.join(timeout=1.0)
+    assert monitor.failure is None and monitor.is_done()
+
+
+def test_client_without_json_stream_is_not_checked_for_stalls():
+    monitor = iperf_monitor.IperfMonitor('dut', 'st', FakeChannel([], 0), 1000, live=False, stall_timeout=0.0)
+    monitor.started -= 1.0
+    assert monitor.is_running()
+    time.sleep(0.01)
+    monitor.check()
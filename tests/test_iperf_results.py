@@ -0,0 +1,84 @@
+# global imports
+import json
+# local imports
+import iperf_results
+import mini_data_collector
+
+
+T0 = 1700000000.0
+
+
+def interval(start, kbps, lost=None, jitter=None, omitted=False):
+    s = {'start': start, 'end': start + 1.0, 'bits_per_second': kbps * 1000.0, 'omitted': omitted}
+    if lost is not None:
+        s.update({'lost_percent': lost, 'jitter_ms': jitter})
+    return {'sum': s}
+
+
+def test_json_report_prefers_the_server_intervals(tmp_path):
+    # a -J --get-server-output UDP run: the client does not know loss and jitter, the server does
+    doc = {'start': {'timestamp': {'timesecs': T0}},
+           'intervals': [interval(0.0, 40000), interval(1.0, 40000)],
+           'server_output_json': {'start': {'timestamp': {'timesecs': T0 + 0.5}},
+                                  'intervals': [interval(0.0, 0, omitted=True), interval(0.0, 36000, 10.0, 0.5),
+                                                interval(1.0, 32000, 20.0, 1.5)]}}
+    fn = tmp_path / 'iperf3.json'
+    fn.write_text(json.dumps(doc))
+    series = iperf_results.IperfResults.parse(iperf_results.IperfResults.load(str(fn)))
+    assert series == [(T0 + 0.5, T0 + 1.5, 36000.0, 10.0, 0.5), (T0 + 1.5, T0 + 2.5, 32000.0, 20.0, 1.5)]
+    summary = iperf_results.IperfResults.summarize(series)
+    assert summary == {'throughput [Kbps]': 34000.0, 'lost [%]': 15.0, 'jitter [ms]': 1.0, 'intervals': 2}
+
+
+def test_truncated_json_stream_keeps_the_intervals_it_has(tmp_path):
+    # a --json-stream run killed mid-write: no end event, the last line cut off
+    lines = [json.dumps({'event': 'start', 'data': {'timestamp': {'timesecs': T0}}}),
+             json.dumps({'event': 'interval', 'data': interval(0.0, 36000)}),
+             json.dumps({'event': 'interval', 'data': interval(1.0, 32000)}),
+             json.dumps({'event': 'interval', 'data': interval(2.0, 28000)})[:30]]
+    fn = tmp_path / 'iperf3.json'
+    fn.write_text('\n'.join(lines))
+    series = iperf_results.IperfResults.parse(iperf_results.IperfResults.load(str(fn)))
+    assert [s[:3] for s in series] == [(T0, T0 + 1.0, 36000.0), (T0 + 1.0, T0 + 2.0, 32000.0)]
+    # the client side has no loss or jitter
+    assert all(s[3] != s[3] and s[4] != s[4] for s in series)
+    assert iperf_results.IperfResults.load(str(tmp_path / 'missing.json')) is None
+    assert iperf_results.IperfResults.parse(None) == []
+
+
+def test_lookup_picks_the_covering_interval():
+    series = [(T0, T0 + 1.0, 36000.0, 10.0, 0.5), (T0 + 2.0, T0 + 3.0, 32000.0, 20.0, 1.5)]
+    starts = [s[0] for s in series]
+    lookup = iperf_results.IperfResults.lookup
+    assert lookup(series, starts, T0 + 0.5) == [36000.0, 10.0, 0.5]
+    assert lookup(series, starts, T0 + 2.0) == [32000.0, 20.0, 1.5]
+    # before the first interval, in a gap and after the last one there is nothing to join
+    for wall_time in (T0 - 0.5, T0 + 1.5, T0 + 3.0):
+        assert all(v != v for v in lookup(series, starts, wall_time))
+
+
+def test_join_onto_samples_by_scenario_and_direction(tmp_path):
+    tool = mini_data_collector.Tool(url_val='http://127.0.0.1:9', period_val=1.0,
+                                    output_file_val=str(tmp_path / 'TP1_dut_ch6_40000_int_ch6_60000.csv'),
+                                    dut_bitrate=40000, external_ap_load=60000, external_ap_channel=6,
+                                    tolerance=20.0, duration=60)
+    tool.t0_wall = T0
+    tool.sample_times = [(0.0, 0.2), (1.0, 1.1), (2.0, 2.3)]
+    tool.store.append('/iperf', 'dut', 1, ['rate [Kbps]'], [35000.0])
+    dut = [(T0, T0 + 1.0, 36000.0, 10.0, 0.5), (T0 + 1.0, T0 + 2.0, 32000.0, 20.0, 1.5)]
+    interferer = [(T0 + 1.0, T0 + 3.0, 30000.0, 50.0, 2.0)]
+    summary = tool.join_iperf([('dut', 40000, dut), ('int', 60000, interferer)])
+    fn = str(tmp_path / 'TP1_dut_ch6_40000_int_ch6_60000_iperf.csv')
+    assert summary['iperf_file'] == fn
+    assert summary['dut']['intervals'] == 2 and summary['int']['throughput [Kbps]'] == 30000.0
+    with open(fn) as fh:
+        lines = fh.read().splitlines()
+    assert lines[0].split(',')[2:8] == ['dut throughput [Kbps]', 'dut lost [%]', 'dut jitter [ms]',
+                                        'dut measured bitrate loss [%]', 'dut live rate [Kbps]',
+                                        'int throughput [Kbps]']
+    rows = [line.split(',') for line in lines[1:]]
+    assert [row[:2] for row in rows] == [['0.0', '0.200'], ['1.0', '1.100'], ['2.0', '2.300']]
+    # each direction is joined against its own series and nominal rate
+    assert rows[0][2:] == ['36000', '10', '0.5', '10', 'N/A', 'N/A', 'N/A', 'N/A', 'N/A', 'N/A']
+    assert rows[1][2:] == ['32000', '20', '1.5', '20', '35000', '30000', '50', '2', '50', 'N/A']
+    assert rows[2][2:] == ['N/A', 'N/A', 'N/A', 'N/A', 'N/A', '30000', '50', '2', '50', 'N/A']
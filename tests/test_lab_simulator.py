@@ -0,0 +1,50 @@
+# global imports
+import os
+import sys
+import json
+import subprocess
+# local imports
+import result_index
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_one_rig_campaign_end_to_end(tmp_path):
+    # a whole campaign against the simulated lab, 30 lab seconds of collection at 600 lab seconds per second
+    tests_fn = tmp_path / 'tests.csv'
+    tests_fn.write_text('1,6,40000,1,60000\n')
+    lab_dir = tmp_path / 'lab'
+    proc = subprocess.run([sys.executable, '-m', 'lab_simulator', '--lab-dir', str(lab_dir), '--speed', '600',
+                           '--duration', '30', '--tests', str(tests_fn)],
+                          cwd=REPO_DIR, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=300)
+    assert proc.returncode == 0, proc.stdout.decode('utf-8', 'replace')[-2000:]
+
+    work_dirs = [name for name in os.listdir(str(lab_dir)) if name.endswith('-lab')]
+    assert len(work_dirs) == 1
+    work_dir = str(lab_dir / work_dirs[0])
+    with open(os.path.join(work_dir, 'campaign_journal.jsonl')) as fh:
+        records = [json.loads(line) for line in fh]
+    scenario_id = 'TP1_dut_ch6_40000_int_ch1_60000'
+    assert [(r['event'], r.get('scenario_id')) for r in records] == \
+        [('campaign', None), ('started', scenario_id), ('done', scenario_id)]
+    assert records[0]['work_dir'] == work_dirs[0]
+    assert records[-1]['outputs'] == [os.path.join(work_dirs[0], scenario_id + '_2.4GHz.csv')]
+
+    summary_fn = os.path.join(str(lab_dir), records[-1]['outputs'][0])
+    with open(summary_fn) as fh:
+        lines = fh.read().splitlines()
+    assert lines[0].startswith('time [sec],sample time [sec],nominal bit rate [Kbps]')
+    # samples with their time, then the averages trailer without one and with the verdict
+    assert len(lines) > 3 and all(line.split(',')[0] for line in lines[1:-1])
+    trailer = lines[-1].split(',')
+    assert trailer[0] == '' and ('Passed!' in trailer or 'Failed!' in trailer)
+    for suffix in ('_2.4GHz_stats.csv', '_iperf.csv'):
+        assert os.path.exists(os.path.join(work_dir, scenario_id + suffix))
+
+    index = result_index.ResultIndex(str(lab_dir / 'result_index.db'))
+    try:
+        rows = index.query(columns=('scenario_id', 'test_id', 'band', 'avg_row'), work_dir=work_dirs[0])
+    finally:
+        index.close()
+    assert rows == [(scenario_id + '_2.4GHz', 1, '2.4GHz', lines[-1])]
@@ -0,0 +1,78 @@
+# global imports
+import os
+# local imports
+import make_summary
+import mini_data_collector
+import result_index
+
+
+def write(fn, text):
+    with open(str(fn), 'w') as fh:
+        fh.write(text)
+    return str(fn)
+
+
+def test_read_last_line(tmp_path):
+    fn = write(tmp_path / 'a.csv', 'header\n1,2\n,,avg\n\n')
+    assert make_summary.SummaryGen.read_last_line(fn) == ',,avg\n'
+    # lines longer than one block
+    fn = write(tmp_path / 'b.csv', 'header\n' + 'x' * 10000 + '\n' + 'y' * 5000 + '\n')
+    assert make_summary.SummaryGen.read_last_line(fn, block_size=1024) == 'y' * 5000 + '\n'
+    fn = write(tmp_path / 'c.csv', 'only line')
+    assert make_summary.SummaryGen.read_last_line(fn) == 'only line\n'
+
+
+def test_empty_file_gives_no_row(tmp_path):
+    write(tmp_path / 'TP1_dut_ch6_40000_int_ch1_60000_2.4GHz.csv', 'header\n1,2\n,,5.0,Passed!\n')
+    write(tmp_path / 'TP2_dut_ch6_40000_int_ch1_60000_2.4GHz.csv', '')
+    out_file = str(tmp_path / 'out' / 'summary.csv')
+    os.makedirs(os.path.dirname(out_file))
+    make_summary.SummaryGen(str(tmp_path), out_file).run()
+    with open(out_file) as fh:
+        lines = fh.read().splitlines()
+    assert [line for line in lines[1:] if line] == ['TP1_dut_ch6_40000_int_ch1_60000_2.4GHz,5.0,Passed!']
+
+
+def test_side_outputs_are_not_summaries(tmp_path):
+    summary = write(tmp_path / 'TP1_dut_ch6_40000_int_ch1_60000_2.4GHz.csv', 'header\n,,5.0\n')
+    for suffix in ('2.4GHz_stats', 'iperf', 'wifi_scoring.link_data_2.4GHz_raw'):
+        write(tmp_path / 'TP1_dut_ch6_40000_int_ch1_60000_{}.csv'.format(suffix), 'header\n')
+    assert make_summary.SummaryGen(str(tmp_path), str(tmp_path / 'summary.csv')).files_list == [summary]
+
+
+def test_file_removed_during_the_scan_is_skipped(tmp_path):
+    kept = write(tmp_path / 'TP1_dut_ch6_40000_int_ch1_60000_2.4GHz.csv', 'header\n,,5.0\n')
+    gone = str(tmp_path / 'TP2_dut_ch6_40000_int_ch1_60000_2.4GHz.csv')
+    index = result_index.ResultIndex()
+    assert index.update([kept, gone], make_summary.SummaryGen.read_last_line, workers=2) == 1
+    assert index.query() == [('TP1_dut_ch6_40000_int_ch1_60000_2.4GHz', ',,5.0\n')]
+
+
+def summary_file(dir_path, header, values):
+    # header, one sample row and the averages row of a band summary, values by column name
+    os.makedirs(str(dir_path), exist_ok=True)
+    avg_row = ','.join(str(values.get(k, '')) for k in header)
+    return write(dir_path / 'TP1_dut_ch6_40000_int_ch1_60000_2.4GHz.csv',
+                 ','.join(header) + '\n' + avg_row + '\n' + avg_row + ',\n')
+
+
+def test_comparison_reads_rows_against_their_own_header(tmp_path):
+    delta = make_summary.RunComparison.DELTA_KEY
+    current = mini_data_collector.Units.SUMMARY_HEADER
+    # summaries written before the sample time column was added
+    legacy = [k for k in current if k != 'sample time [sec]']
+    summary_file(tmp_path / 'old', legacy, {delta: 2.0, 'test result': 'Passed!', 'rssi': -40})
+    summary_file(tmp_path / 'new', current, {'sample time [sec]': 30.012, delta: 4.5, 'test result': 'Passed!',
+                                             'rssi': -45})
+    index = result_index.ResultIndex()
+    index.update([str(tmp_path / 'old' / 'TP1_dut_ch6_40000_int_ch1_60000_2.4GHz.csv'),
+                  str(tmp_path / 'new' / 'TP1_dut_ch6_40000_int_ch1_60000_2.4GHz.csv')],
+                 make_summary.SummaryGen.read_last_line)
+    comparison = make_summary.RunComparison(index, 'old', str(tmp_path / 'compare.csv'))
+    runs = comparison.load()
+    assert runs['old']['TP1_dut_ch6_40000_int_ch1_60000_2.4GHz'][delta] == 2.0
+    assert runs['new']['TP1_dut_ch6_40000_int_ch1_60000_2.4GHz']['rssi'] == -45.0
+    rows, regressions = comparison.compare(runs)
+    assert regressions == [('new', 'TP1_dut_ch6_40000_int_ch1_60000_2.4GHz', 'delta')]
+    header = make_summary.RunComparison.HEADER
+    assert rows[0][header.index('{} diff'.format(delta))] == '2.5'
@@ -0,0 +1,141 @@
+# global imports
+# local imports
+import mini_data_collector
+
+
+DELTA = 'delta [%] (tx_link_effective_quality_score-actual bitrate loss)'
+
+
+def make_tool(tmp_path, **kwargs):
+    return mini_data_collector.Tool(url_val='http://127.0.0.1:9', period_val=1.0,
+                                    output_file_val=str(tmp_path / 'scenario'), dut_bitrate=40000,
+                                    external_ap_load=60000, external_ap_channel=6, tolerance=20.0, duration=60,
+                                    early_stop=True, **kwargs)
+
+
+def add_deltas(tool, suf, values):
+    running = tool.get_band_summary(suf)['running'][DELTA]
+    for value in values:
+        running.add(value)
+
+
+def test_verdict_is_stable_once_every_band_is_clear_of_the_tolerance(tmp_path):
+    tool = make_tool(tmp_path, min_samples=5)
+    assert not tool.is_verdict_stable()
+    add_deltas(tool, '2.4GHz', [2.0, 3.0, 2.5, 2.0, 3.0])
+    assert tool.is_verdict_stable()
+    add_deltas(tool, '5GHz', [30.0, 31.0, 29.0, 30.0, 30.5])
+    assert tool.is_verdict_stable()
+
+
+def test_band_without_valid_samples_keeps_collecting(tmp_path):
+    tool = make_tool(tmp_path, min_samples=5)
+    add_deltas(tool, '2.4GHz', [2.0, 3.0, 2.5, 2.0, 3.0])
+    # the 5GHz band is reported, but none of its samples had a valid delta yet
+    add_deltas(tool, '5GHz', [])
+    assert not tool.is_verdict_stable()
+    add_deltas(tool, '5GHz', [2.0, 3.0, 2.5, 2.0])
+    assert not tool.is_verdict_stable()
+    add_deltas(tool, '5GHz', [2.5])
+    assert tool.is_verdict_stable()
+
+
+def test_verdict_near_the_tolerance_is_not_stable(tmp_path):
+    tool = make_tool(tmp_path, min_samples=5)
+    add_deltas(tool, '2.4GHz', [10.0, 30.0, 15.0, 25.0, 20.0])
+    assert not tool.is_verdict_stable()
+
+
+class FakeClock(object):
+    # stands in for the time module of the collector, sleeping only moves the clock
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, sec):
+        self.sleeps.append(round(sec, 6))
+        self.now += sec
+
+
+def test_ticks_keep_their_deadlines_and_skip_overruns(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(mini_data_collector, 'time', clock)
+    tool = make_tool(tmp_path, export_raw=False)
+    tool.duration, tool.early_stop = 6, False
+    # the fetches of the second tick take 2.5 periods
+    fetch_times = [0.1, 2.5, 0.1, 0.1, 0.1, 0.1]
+
+    def fetch_all(pool):
+        clock.now += fetch_times.pop(0)
+        return dict((sfx, {}) for sfx in mini_data_collector.Tool.url_sfxs)
+
+    monkeypatch.setattr(tool, 'fetch_all', fetch_all)
+    tool.run()
+    # rows are labelled with their nominal tick time, tick 2 was missed and tick 3 ran late
+    assert [nominal for nominal, sample in tool.sample_times] == [0.0, 1.0, 3.0, 4.0, 5.0, 6.0]
+    assert [round(sample, 6) for nominal, sample in tool.sample_times] == [0.0, 1.0, 3.5, 4.0, 5.0, 6.0]
+    assert tool.missed_ticks == 1
+    # fetch time does not add up: every sleep ends on a deadline
+    assert clock.sleeps == [0.9, 0.4, 0.9, 0.9]
+
+
+def add_sample(tool, sample_no, bands):
+    # bands: {band: (tx_link_effective_quality_score, datarate)}
+    tool.sample_times.append((float(sample_no), float(sample_no)))
+    for suf, (score, datarate) in bands.items():
+        tool.store.append('/wifi_scoring/link_data', suf, sample_no, ['tx_link_effective_quality_score'], [score])
+        tool.store.append('/wifi_monitoring/link_data', suf, sample_no, ['datarate'], [datarate])
+    tool.suf_list = list(bands)
+    tool.update_summaries()
+
+
+def read_lines(fn):
+    with open(fn) as fh:
+        return fh.read().splitlines()
+
+
+def test_summary_rows_and_trailer_stream_to_disk(tmp_path):
+    tool = make_tool(tmp_path, warmup=0)
+    # bit rate losses of 10% and 20% of the 40000Kbps offered
+    add_sample(tool, 0, {'2.4GHz': (12, 36000)})
+    add_sample(tool, 1, {'2.4GHz': (20, 32000)})
+    fn_24 = tool.summaries['2.4GHz']['file'].fn
+    lines = read_lines(fn_24)
+    assert len(lines) == 4 and lines[0] == ','.join(mini_data_collector.Units.SUMMARY_HEADER)
+    delta = mini_data_collector.Units.SUMMARY_HEADER.index(DELTA)
+    # the averages trailer holds the mean of the deltas above it
+    assert [float(line.split(',')[delta]) for line in lines[1:]] == [2.0, 0.0, 1.0]
+    # the 5GHz band first shows up at sample 2, its file gets N/A rows for the samples before
+    add_sample(tool, 2, {'2.4GHz': (30, 28000), '5GHz': (0, 40000)})
+    assert len(read_lines(fn_24)) == 5
+    lines_5 = read_lines(tool.summaries['5GHz']['file'].fn)
+    assert len(lines_5) == 5
+    assert [line.split(',')[delta] for line in lines_5[1:]] == ['N/A', 'N/A', '0.0', '0.0']
+    assert tool.summaries['5GHz']['errors'] == 2
+
+
+def test_raw_files_are_per_scenario(tmp_path):
+    sfx = '/wifi_scoring/link_data'
+    fields = mini_data_collector.Units.WIFI_HEADERS_DICT[sfx]
+    for rig, samples in (('rig1', 3), ('rig2', 2)):
+        (tmp_path / rig).mkdir()
+        tool = mini_data_collector.Tool(url_val='http://127.0.0.1:9', period_val=1.0,
+                                        output_file_val=str(tmp_path / rig / 'TP1'), dut_bitrate=40000,
+                                        external_ap_load=60000, external_ap_channel=6, tolerance=20.0,
+                                        duration=60, export_raw=True)
+        tool.suf_list = ['2.4GHz']
+        for sample_no in range(samples):
+            tool.sample_times.append((float(sample_no), float(sample_no)))
+            data = [dict((field, sample_no) for field in fields)]
+            if sample_no == 0:
+                tool.prepare_headers(data, 'http://127.0.0.1:9' + sfx, sfx)
+            tool.prepare_data(data, 'http://127.0.0.1:9' + sfx, sfx)
+        tool.writer.close()
+    for rig, samples in (('rig1', 3), ('rig2', 2)):
+        assert len(read_lines(str(tmp_path / rig / 'TP1_wifi_scoring.link_data_2.4GHz_raw.csv'))) == samples + 1
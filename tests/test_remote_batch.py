@@ -0,0 +1,50 @@
+# global imports
+import subprocess
+# local imports
+import remote_batch
+
+
+class LocalUtils(object):
+    # runs the batch in a local shell, the way run_cmd_via_ssh runs it on the host
+    def __init__(self):
+        self.runs = 0
+        self.probes = []
+
+    def run_cmd_via_ssh(self, host_name, user_name, password, cmd, port=22, retry=True):
+        self.runs += 1
+        proc = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE, env={'RUN': str(self.runs)})
+        return proc.returncode, proc.stdout
+
+    def record_probe(self, name, elapsed, ready):
+        self.probes.append((name, elapsed, ready))
+
+
+def test_steps_report_their_exit_status():
+    batch = remote_batch.RemoteBatch().add('ok', 'echo hi').add('fails', 'false', check=True).add('skipped', 'true')
+    results = batch.run(LocalUtils(), 'host', 'root', 'pass', tries=1)
+    assert results['ok'].ok and results['ok'].output == 'hi\n'
+    assert results['fails'].rc == 1 and results['skipped'].rc is None
+
+
+def test_output_without_a_trailing_newline_keeps_its_end_marker():
+    batch = remote_batch.RemoteBatch().add('printf', 'printf lab').add('after', 'echo done', check=True)
+    results = batch.run(LocalUtils(), 'host', 'root', 'pass', tries=1)
+    assert results['printf'].ok and results['printf'].output == 'lab'
+    assert results['after'].ok and results['after'].output == 'done\n'
+
+
+def test_failed_wait_reruns_the_batch(monkeypatch):
+    monkeypatch.setattr(remote_batch.time, 'sleep', lambda sec: None)
+    utils = LocalUtils()
+    batch = remote_batch.RemoteBatch().add('may fail', 'false').add_wait('second run', '[ "$RUN" = 2 ]', 0)
+    results = batch.run(utils, 'host', 'root', 'pass')
+    assert utils.runs == 2 and results['second run'].ok
+    # the backoff shows up in the probe report like the ssh retries
+    assert utils.probes == [('batch retry backoff', 2, True)]
+
+
+def test_batch_gives_up_after_its_tries(monkeypatch):
+    monkeypatch.setattr(remote_batch.time, 'sleep', lambda sec: None)
+    utils = LocalUtils()
+    results = remote_batch.RemoteBatch().add_wait('never', 'false', 0).run(utils, 'host', 'root', 'pass')
+    assert utils.runs == 3 and not results['never'].ok
@@ -0,0 +1,35 @@
+# global imports
+import sqlite3
+# local imports
+import make_summary
+import result_index
+
+
+def test_index_of_an_earlier_version_is_migrated(tmp_path):
+    fn = tmp_path / 'TP1_dut_ch6_40000_int_ch1_60000_2.4GHz.csv'
+    fn.write_text('time [sec],test result\n,Passed!\n')
+    st = fn.stat()
+    db = str(tmp_path / 'result_index.db')
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE results (summary_file TEXT PRIMARY KEY, work_dir TEXT, scenario_id TEXT, "
+                 "test_id INTEGER, dut_channel INTEGER, dut_bitrate INTEGER, int_channel INTEGER, int_load INTEGER, "
+                 "band TEXT, avg_row TEXT, mtime REAL, size INTEGER, registered REAL)")
+    conn.execute("INSERT INTO results (summary_file, scenario_id, avg_row, mtime, size) VALUES (?, ?, ?, ?, ?)",
+                 (str(fn), 'TP1_dut_ch6_40000_int_ch1_60000_2.4GHz', ',Passed!\n', st.st_mtime, st.st_size))
+    conn.commit()
+    conn.close()
+    index = result_index.ResultIndex(db)
+    assert index.query(('header',)) == [(None,)]
+    # the unchanged file is read again since its row has no header
+    assert index.update([str(fn)], make_summary.SummaryGen.read_last_line) == 1
+    assert index.query(('header', 'avg_row')) == [('time [sec],test result', ',Passed!\n')]
+    assert index.update([str(fn)], make_summary.SummaryGen.read_last_line) == 0
+    index.close()
+
+
+def test_register_stores_the_header(tmp_path):
+    fn = tmp_path / 'TP1_dut_ch6_40000_int_ch1_60000_5GHz.csv'
+    fn.write_text('a,b\n1,2\n')
+    index = result_index.ResultIndex()
+    index.register(str(fn), '1,2')
+    assert index.query(('band', 'header', 'avg_row')) == [('5GHz', 'a,b', '1,2')]
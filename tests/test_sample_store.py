@@ -0,0 +1,24 @@
+# global imports
+import math
+# local imports
+import sample_store
+
+
+def test_values_are_found_by_sample_number_when_an_endpoint_misses_a_tick():
+    store = sample_store.SampleStore()
+    for sample_no in range(4):
+        store.append('/wifi_scoring/link_data', '2.4GHz', sample_no, ['score'], [90 + sample_no])
+        # the monitoring endpoint did not answer on tick 1
+        if sample_no != 1:
+            store.append('/wifi_monitoring/link_data', '2.4GHz', sample_no, ['datarate', 'rtr'],
+                         [1000 * sample_no, 'n/a'])
+    assert list(store.column('/wifi_monitoring/link_data', '2.4GHz', 'datarate')) == [0.0, 2000.0, 3000.0]
+    assert math.isnan(store.value('/wifi_monitoring/link_data', '2.4GHz', 1, 'datarate'))
+    # later samples are not shifted by the missing one
+    assert store.value('/wifi_monitoring/link_data', '2.4GHz', 2, 'datarate') == 2000.0
+    assert store.value('/wifi_scoring/link_data', '2.4GHz', 2, 'score') == 92.0
+    # values that are not numeric, unknown fields and bands are NaN
+    assert math.isnan(store.value('/wifi_monitoring/link_data', '2.4GHz', 3, 'rtr'))
+    assert math.isnan(store.value('/wifi_monitoring/link_data', '2.4GHz', 3, 'missing'))
+    assert math.isnan(store.value('/wifi_monitoring/link_data', '5GHz', 3, 'datarate'))
+    assert len(store) == 7
@@ -0,0 +1,114 @@
+# global imports
+import os
+import pty
+import tty
+import time
+import threading
+import pytest
+# local imports
+import serial_console
+
+
+class FakeRouter(object):
+    # a router console on a pseudo terminal: echoes every line and answers with login, password or shell prompt
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.mode = 'login'
+        self.lines = []
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def answer(self, line):
+        if self.mode == 'login':
+            self.mode = 'password'
+            return 'Password: '
+        if self.mode == 'password':
+            self.mode = 'shell'
+            return 'Welcome\r\nrouter> '
+        if line == 'exit':
+            self.mode = 'login'
+            return 'Login: '
+        if line == 'system reboot':
+            return 'going down\r\n'
+        return "Unknown command '{}'\r\nrouter> ".format(line)
+
+    def serve(self):
+        buf = b''
+        while True:
+            try:
+                chunk = os.read(self.master, 1024)
+            except OSError:
+                return
+            buf += chunk.replace(b'\r\n', b'\r')
+            while b'\r' in buf:
+                line, buf = buf.split(b'\r', 1)
+                self.lines.append(line.decode())
+                # the answer of a line comes with a delay, like on a real console
+                time.sleep(self.delay)
+                os.write(self.master, line + b'\r\n' + self.answer(line.decode()).encode())
+
+    def write(self, text):
+        os.write(self.master, text.encode())
+
+    def close(self):
+        for fd in (self.master, self.slave):
+            os.close(fd)
+
+
+@pytest.fixture
+def router():
+    fake = FakeRouter()
+    yield fake
+    fake.close()
+
+
+@pytest.fixture
+def console(router):
+    console = serial_console.SerialConsole(router.port, 115200, timeout=0.5)
+    yield console
+    console.close()
+
+
+def test_login_ends_at_the_shell_prompt(router, console):
+    response, matched = console.send('admin\radmin\radmin', serial_console.SerialConsole.SHELL_PROMPT)
+    assert matched
+    assert router.lines == ['admin', 'admin', 'admin']
+    assert 'Password:' in response and 'Welcome' in response
+    assert response.endswith("Unknown command 'admin'\r\nrouter> ")
+    # nothing of the command is left over for the next one
+    time.sleep(0.1)
+    assert console.ser.in_waiting == 0
+
+
+def test_intermediate_prompt_does_not_end_a_command(router, console):
+    # the default prompt accepts a password prompt, but only after the last line of the command
+    response, matched = console.send('admin\radmin')
+    assert matched
+    assert response.endswith('router> ')
+
+
+def test_late_output_is_kept_with_the_next_response(router, console):
+    console.send('admin\radmin\radmin', serial_console.SerialConsole.SHELL_PROMPT)
+    router.write('link up\r\n')
+    time.sleep(0.1)
+    response, matched = console.send('exit')
+    assert matched
+    assert response.startswith('link up\r\n')
+    assert response.endswith('Login: ')
+
+
+def test_missing_prompt_is_reported(router, console):
+    console.send('admin\radmin\radmin', serial_console.SerialConsole.SHELL_PROMPT)
+    t1 = time.monotonic()
+    response, matched = console.send('system reboot')
+    assert not matched
+    assert 'going down' in response
+    assert time.monotonic() - t1 >= 0.5
+
+
+def test_send_all_takes_per_command_prompts(router, console):
+    results = console.send_all(['exit', ('admin\radmin\radmin', serial_console.SerialConsole.SHELL_PROMPT)])
+    assert [matched for response, matched in results] == [True, True]
+    assert results[1][0].endswith('router> ')
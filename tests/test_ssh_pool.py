@@ -0,0 +1,218 @@
+# global imports
+import io
+import socket
+import threading
+import time
+import paramiko
+import pytest
+# local imports
+import ssh_pool
+
+
+class FakeChannel(object):
+    def __init__(self, transport, cmd_error=None):
+        self.transport = transport
+        self.cmd_error = cmd_error
+        self.closed = False
+
+    def settimeout(self, timeout):
+        pass
+
+    def set_combine_stderr(self, combine):
+        pass
+
+    def exec_command(self, cmd):
+        self.transport.commands.append(cmd)
+        if self.cmd_error:
+            raise self.cmd_error
+
+    def makefile(self, mode):
+        return io.BytesIO(b'out')
+
+    def makefile_stderr(self, mode):
+        return io.BytesIO(b'')
+
+    def recv_exit_status(self):
+        return 0
+
+    def close(self):
+        self.closed = True
+
+
+class FakeTransport(object):
+    def __init__(self, commands, active=True, open_error=None, cmd_error=None):
+        self.commands = commands
+        self.active = active
+        self.open_error = open_error
+        self.cmd_error = cmd_error
+
+    def set_keepalive(self, interval):
+        pass
+
+    def is_active(self):
+        return self.active
+
+    def open_session(self):
+        if self.open_error:
+            raise self.open_error
+        return FakeChannel(self, self.cmd_error)
+
+
+class FakeClientFactory(object):
+    # hands out clients whose transports behave as listed in `transports`, one per connect
+    def __init__(self, *transports):
+        self.transports = list(transports)
+        self.commands = []
+        self.connects = 0
+
+    def __call__(self):
+        factory = self
+
+        class Client(object):
+            transport = None
+
+            def set_missing_host_key_policy(self, policy):
+                pass
+
+            def connect(self, hostname, **kwargs):
+                factory.connects += 1
+                self.transport = FakeTransport(factory.commands, **factory.transports.pop(0))
+
+            def get_transport(self):
+                return self.transport
+
+            def close(self):
+                pass
+        return Client()
+
+
+def test_session_is_reused():
+    factory = FakeClientFactory({})
+    pool = ssh_pool.SshSessionPool(client_factory=factory)
+    assert pool.exec_command('h', 'u', 'p', 'true') == (0, b'out', b'')
+    assert pool.exec_command('h', 'u', 'p', 'true') == (0, b'out', b'')
+    assert factory.connects == 1
+    assert factory.commands == ['true', 'true']
+
+
+def test_dead_session_is_reconnected_before_exec():
+    factory = FakeClientFactory({}, {})
+    pool = ssh_pool.SshSessionPool(client_factory=factory)
+    pool.exec_command('h', 'u', 'p', 'true')
+    pool.clients[('h', 'u', 22)].transport.active = False
+    pool.exec_command('h', 'u', 'p', 'true')
+    assert factory.connects == 2
+    assert pool.stats[('h', 'u', 22)].reconnects == 1
+
+
+def test_failed_open_session_is_retried_once():
+    factory = FakeClientFactory({'open_error': EOFError()}, {})
+    pool = ssh_pool.SshSessionPool(client_factory=factory)
+    assert pool.exec_command('h', 'u', 'p', 'touch x') == (0, b'out', b'')
+    assert factory.connects == 2
+    assert factory.commands == ['touch x']
+
+
+def test_failed_open_session_raises_after_retry():
+    factory = FakeClientFactory({'open_error': EOFError()}, {'open_error': paramiko.SSHException()})
+    pool = ssh_pool.SshSessionPool(client_factory=factory)
+    with pytest.raises(paramiko.SSHException):
+        pool.exec_command('h', 'u', 'p', 'touch x')
+    assert factory.commands == []
+
+
+@pytest.mark.parametrize('error', [socket.timeout(), paramiko.SSHException(), EOFError()])
+def test_started_command_is_not_rerun(error):
+    factory = FakeClientFactory({'cmd_error': error}, {})
+    pool = ssh_pool.SshSessionPool(client_factory=factory)
+    with pytest.raises(type(error)):
+        pool.exec_command('h', 'u', 'p', 'echo x >> log')
+    assert factory.commands == ['echo x >> log']
+    assert factory.connects == 1
+
+
+def test_open_channel_retries_only_the_session():
+    factory = FakeClientFactory({'open_error': socket.error()}, {})
+    pool = ssh_pool.SshSessionPool(client_factory=factory)
+    channel = pool.open_channel('h', 'u', 'p', 'iperf3 -c x')
+    assert factory.commands == ['iperf3 -c x']
+    assert not channel.closed
+
+
+class StubServer(paramiko.ServerInterface):
+    # a local paramiko SSH server answering every exec with "ran <command>" and exit status 0
+    def __init__(self):
+        self.host_key = paramiko.ECDSAKey.generate()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(4)
+        self.port = self.sock.getsockname()[1]
+        self.transports = []
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self):
+        while True:
+            try:
+                conn, peer = self.sock.accept()
+            except OSError:
+                return
+            transport = paramiko.Transport(conn)
+            transport.add_server_key(self.host_key)
+            transport.start_server(server=self)
+            self.transports.append(transport)
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL if password == 'p' else paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_channel_exec_request(self, channel, command):
+        def answer():
+            # the exec request is acknowledged only after this returns, an earlier close would fail it
+            time.sleep(0.05)
+            channel.sendall(b'ran ' + command)
+            channel.send_exit_status(0)
+            channel.close()
+        threading.Thread(target=answer, daemon=True).start()
+        return True
+
+    def close(self):
+        self.sock.close()
+        for transport in self.transports:
+            transport.close()
+
+
+@pytest.fixture
+def server():
+    stub = StubServer()
+    yield stub
+    stub.close()
+
+
+def test_real_session_is_reused_and_timed(server):
+    pool = ssh_pool.SshSessionPool()
+    try:
+        assert pool.exec_command('127.0.0.1', 'u', 'p', 'true', port=server.port) == (0, b'ran true', b'')
+        assert pool.exec_command('127.0.0.1', 'u', 'p', 'id', port=server.port) == (0, b'ran id', b'')
+        stats = pool.stats[('127.0.0.1', 'u', server.port)]
+        assert len(server.transports) == 1 and stats.connects == 1 and stats.reconnects == 0
+        assert stats.execs == 2 and 0 < stats.exec_max <= stats.exec_time and stats.connect_time > 0
+        assert pool.report() == ["u@127.0.0.1:{} - {}".format(server.port, stats)]
+    finally:
+        pool.close()
+
+
+def test_real_session_dropped_by_the_server_is_reconnected(server):
+    pool = ssh_pool.SshSessionPool()
+    try:
+        pool.exec_command('127.0.0.1', 'u', 'p', 'true', port=server.port)
+        server.transports[0].close()
+        assert pool.exec_command('127.0.0.1', 'u', 'p', 'true', port=server.port) == (0, b'ran true', b'')
+        stats = pool.stats[('127.0.0.1', 'u', server.port)]
+        assert len(server.transports) == 2 and stats.connects == 2 and stats.reconnects == 1
+    finally:
+        pool.close()
@@ -0,0 +1,38 @@
+# global imports
+import random
+import statistics
+import pytest
+# local imports
+import summary_stats
+
+
+VALUES = [random.Random(7).gauss(20.0, 5.0) for i in range(101)]
+
+
+def test_describe_matches_statistics():
+    stats = summary_stats.SummaryStats.describe(VALUES + [float('nan')])
+    assert stats['samples'] == len(VALUES)
+    assert stats['mean'] == pytest.approx(statistics.mean(VALUES))
+    assert stats['median'] == pytest.approx(statistics.median(VALUES))
+    assert stats['stddev'] == pytest.approx(statistics.stdev(VALUES))
+    # 'inclusive' interpolates between the closest ranks like SummaryStats.percentile
+    cuts = statistics.quantiles(VALUES, n=20, method='inclusive')
+    assert stats['p5'] == pytest.approx(cuts[0])
+    assert stats['p95'] == pytest.approx(cuts[-1])
+
+
+def test_running_stats_match_statistics():
+    running = summary_stats.RunningStats()
+    for value in VALUES:
+        running.add(value)
+    assert running.n == len(VALUES)
+    assert running.mean == pytest.approx(statistics.mean(VALUES))
+    assert running.variance() == pytest.approx(statistics.variance(VALUES))
+    assert running.stddev() == pytest.approx(statistics.stdev(VALUES))
+
+
+def test_pass_ratio_and_rows():
+    assert summary_stats.SummaryStats.pass_ratio([1.0, -5.0, 30.0, float('nan')], 20.0) == pytest.approx(200 / 3.0)
+    stats = summary_stats.SummaryStats.describe_all({'a': [1.0, 3.0], 'b': []})
+    assert summary_stats.SummaryStats.to_rows(stats, ['a', 'b'], {'a': 50.0}) == \
+        ['a,2,2.0,2.0,1.1,2.9,1.4142135623730951,50.0', 'b,0,N/A,N/A,N/A,N/A,N/A,N/A']
@@ -0,0 +1,19 @@
+# local imports
+import tracing
+
+
+def test_disabled_span_is_shared_and_records_nothing():
+    tracer = tracing.Tracer()
+    assert tracer.span('step', 'a') is tracer.span('step', 'b', rig='rig1') is tracing.NO_SPAN
+    with tracer.span('step', 'a'):
+        pass
+    assert tracer.events == []
+
+
+def test_enabled_span_records_its_args():
+    tracer = tracing.Tracer()
+    tracer.enable()
+    with tracer.span('step', 'a', rig='rig1'):
+        pass
+    assert [(cat, name, args) for cat, name, start, elapsed, tid, args in tracer.events] == \
+        [('step', 'a', {'rig': 'rig1'})]
@@ -0,0 +1,211 @@
+# global imports
+import configparser
+import pytest
+# local imports
+import campaign_journal
+import remote_batch
+import wifi_qoe_executor
+
+
+def write_config(tmp_path, rigs=1):
+    parser = configparser.ConfigParser(interpolation=None)
+    rig_config = dict((key, 'x') for key in wifi_qoe_executor.QoeExecutor.CONFIG_KEYS)
+    rig_config.update({'duration': '60', 'period': '1', 'tolerance': '20', 'url': 'http://127.0.0.1:9/'})
+    parser['DEFAULT'] = rig_config
+    for i in range(1, rigs):
+        parser['rig{}'.format(i + 1)] = dict(rig_config, dut_serial_com='com{}'.format(i + 1))
+    config_fn = tmp_path / 'qoe_executor.cfg'
+    with open(str(config_fn), 'w') as fh:
+        parser.write(fh)
+    tests_fn = tmp_path / 'tests.csv'
+    tests_fn.write_text('1,6,40000,1,60000\n')
+    return str(config_fn), str(tests_fn)
+
+
+@pytest.fixture(autouse=True)
+def no_http_retries(monkeypatch):
+    # the configured gateway does not exist, its requests fail without backoff
+    monkeypatch.setattr(wifi_qoe_executor.utils.Utils.http_client, 'retries', 0)
+
+
+@pytest.fixture
+def executor(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config_fn, tests_fn = write_config(tmp_path, rigs=2)
+    return wifi_qoe_executor.QoeExecutor(qoe_config=config_fn, qoe_tests=tests_fn, delay=0)
+
+
+def test_rigs_have_own_results_and_shared_state(executor):
+    first, second = executor.rigs
+    assert second.rig_name == 'rig2' and second.dut_serial_com == 'com2'
+    assert first.scenario_results is not second.scenario_results
+    first.scenario_results['a'] = 1
+    second.scenario_results['b'] = 2
+    second.test_case_number += 1
+    assert first.test_case_number == 0
+    assert executor.all_scenario_results() == {'a': 1, 'b': 2}
+    second.set_applied('channel', 'com9', 6)
+    assert first.get_applied('channel', 'com9') == 6
+    assert first.state_lock is second.state_lock
+
+
+def test_reboot_waits_for_gateway_down_then_up(executor, monkeypatch):
+    # the gateway answers once more, then refuses connections while it reboots and comes back
+    replies = [{'framework_version': {}}, ConnectionRefusedError(), ConnectionRefusedError(),
+               {'framework_version': {}}]
+    calls = []
+
+    def get_json(url, timeout=None):
+        reply = replies[min(len(calls), len(replies) - 1)]
+        calls.append(url)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    monkeypatch.setattr(executor.utils, 'write2serial', lambda port, baudrate, commands: None)
+    monkeypatch.setattr(executor.utils.http_client, 'get_json', get_json)
+    monkeypatch.setattr(wifi_qoe_executor.utils.time, 'sleep', lambda sec: None)
+    monkeypatch.setattr(wifi_qoe_executor.utils.Utils, 'probe_stats', {})
+    monkeypatch.setattr(executor, 'REBOOT_DOWN_TIMEOUT', 2)
+    monkeypatch.setattr(executor, 'REBOOT_UP_TIMEOUT', 2)
+    executor.reboot_routers()
+    assert len(calls) == 4
+    stats = wifi_qoe_executor.utils.Utils.probe_stats
+    # (count, total, longest, timeouts) per probe, neither of them ran into its timeout
+    assert stats['gateway going down'][0] == 1 and stats['gateway going down'][3] == 0
+    assert stats['gateway reboot'][0] == 1 and stats['gateway reboot'][3] == 0
+
+
+def test_channel_is_recorded_only_after_the_prompt(executor, monkeypatch):
+    answers = []
+    monkeypatch.setattr(executor.utils, 'write2serial', lambda port, baudrate, commands: answers.pop(0))
+    answers.append([('going down', False)])
+    executor.set_interferrer_2_4_channel(6)
+    assert executor.get_applied('channel', executor.int_serial_com) is None
+    answers.append([('OK\r\nrouter> ', True)])
+    executor.set_interferrer_2_4_channel(6)
+    assert executor.get_applied('channel', executor.int_serial_com) == 6
+    # already applied, nothing is sent
+    executor.set_interferrer_2_4_channel(6)
+    assert answers == []
+
+
+@pytest.mark.parametrize('listening_rc, recorded', [(0, True), (1, None)])
+def test_iperf_server_is_recorded_only_when_listening(executor, monkeypatch, listening_rc, recorded):
+    def run_batch(host_name, user_name, password, batch):
+        return {'start iperf server': remote_batch.StepResult('start iperf server', 0),
+                'iperf server listening': remote_batch.StepResult('iperf server listening', listening_rc)}
+
+    monkeypatch.setattr(executor, 'run_batch', run_batch)
+    executor.start_iperf_server('st', 'root', 'pass')
+    assert executor.get_applied('iperf_server', 'st') is recorded
+
+
+def test_dry_run_does_not_query_the_gateway(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config_fn, tests_fn = write_config(tmp_path)
+
+    def get_data_from_url(*args, **kwargs):
+        raise AssertionError('gateway queried on a dry run')
+
+    monkeypatch.setattr(wifi_qoe_executor.utils.Utils, 'get_data_from_url', get_data_from_url)
+    executor = wifi_qoe_executor.QoeExecutor(qoe_config=config_fn, qoe_tests=tests_fn, delay=0, dry_run=True)
+    assert executor.vcaf_version == 'N/A'
+    executor.run()
+
+
+@pytest.mark.parametrize('plan, queues', [('file', 1), ('optimized', 2)])
+def test_optimized_plan_gives_every_rig_its_own_queue(tmp_path, monkeypatch, plan, queues):
+    monkeypatch.chdir(tmp_path)
+    config_fn, tests_fn = write_config(tmp_path, rigs=2)
+    with open(tests_fn, 'w') as fh:
+        fh.write(''.join('{},6,40000,{},60000\n'.format(i + 1, [1, 6, 11][i % 3]) for i in range(12)))
+    executor = wifi_qoe_executor.QoeExecutor(qoe_config=config_fn, qoe_tests=tests_fn, delay=0, plan=plan,
+                                             dry_run=True)
+    plans = executor.get_test_plan()
+    assert len(plans) == queues
+    assert sorted(row[0] for rows in plans for row in rows) == list(range(1, 13))
+
+
+def test_journal_goes_to_the_work_dir(executor):
+    assert executor.journal.path == executor.work_dir + '/campaign_journal.jsonl'
+
+
+def test_resume_keeps_the_reboot_cadence(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config_fn, tests_fn = write_config(tmp_path, rigs=2)
+    journal = campaign_journal.CampaignJournal(str(tmp_path / 'journal.jsonl'))
+    journal.start_campaign('old_work_dir', tests_fn)
+    for i, rig_name in enumerate(['DEFAULT', 'DEFAULT', 'rig2', 'DEFAULT', 'rig2']):
+        journal.scenario_started('TP{}'.format(i), rig_name)
+        journal.scenario_finished('TP{}'.format(i), rig_name, 0.0, [], 'data collection failed' if i == 1 else None)
+    journal.scenario_started('TP9', 'rig2')
+    executor = wifi_qoe_executor.QoeExecutor(qoe_config=config_fn, qoe_tests=tests_fn, delay=0, resume=True,
+                                             journal=journal.path)
+    assert executor.work_dir == 'old_work_dir'
+    assert [rig.test_case_number for rig in executor.rigs] == [3, 2]
+
+
+def test_resume_skips_done_rows_and_reruns_failed_ones(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config_fn, tests_fn = write_config(tmp_path)
+    with open(tests_fn, 'w') as fh:
+        fh.write('1,6,40000,1,60000\n2,6,40000,6,60000\n3,6,20000,6,60000\n')
+    journal = campaign_journal.CampaignJournal(str(tmp_path / 'journal.jsonl'))
+    journal.start_campaign('work', tests_fn)
+    journal.scenario_finished('TP1_dut_ch6_40000_int_ch1_60000', 'DEFAULT', 0.0, [])
+    journal.scenario_finished('TP2_dut_ch6_40000_int_ch6_60000', 'DEFAULT', 0.0, [], 'data collection failed')
+    journal.scenario_started('TP3_dut_ch6_20000_int_ch6_60000', 'DEFAULT')
+    path = journal.path
+    executor = wifi_qoe_executor.QoeExecutor(qoe_config=config_fn, qoe_tests=tests_fn, delay=0, resume=True,
+                                             journal=path, dry_run=True)
+    assert executor.work_dir == 'work'
+    assert [row[0] for rows in executor.get_test_plan() for row in rows] == [2, 3]
+
+
+@pytest.mark.parametrize('version, live', [(b'iperf 3.17.1 (cJSON 1.7.15)\n', True), (b'iperf 3.9\n', False)])
+def test_iperf_client_runs_past_the_collection_window(executor, monkeypatch, version, live):
+    versions, commands = [], []
+
+    def run_cmd_via_ssh(host_name, user_name, password, cmd, port=22, retry=True):
+        versions.append(cmd)
+        return 0, version
+
+    class Channel(object):
+        def recv(self, size):
+            return b''
+
+        def recv_exit_status(self):
+            return 0
+
+    def open_channel(host_name, user_name, password, cmd, port=22):
+        commands.append(cmd)
+        return Channel()
+
+    monkeypatch.setattr(executor.utils, 'run_cmd_via_ssh', run_cmd_via_ssh)
+    monkeypatch.setattr(executor.utils.ssh_pool, 'open_channel', open_channel)
+    executor.ssh_port = '22'
+    executor.duration, executor.period, executor.delay = '10', '3', 2
+    for i in range(2):
+        monitor = executor.start_iperf_client('st', 'root', 'pass', 1000, 'work', 'id', 'dut.json', '10.0.0.1')
+        monitor.thread.join(timeout=1.0)
+        assert monitor.live is live and monitor.finished
+    # the version is asked once per host
+    assert len(versions) == 1
+    assert commands[0].startswith('/bin/mkdir -p ') and '/bin/bash -o pipefail -c ' in commands[0]
+    # delay + 4 periods of 3sec + the end margin
+    assert ' -t 19 ' in commands[0]
+    assert ('--json-stream' in commands[0]) is live and (' -J ' in commands[0]) is not live
+
+
+def test_failed_reconnect_raises(executor, monkeypatch):
+    def run_batch(host_name, user_name, password, batch):
+        return dict((name, remote_batch.StepResult(name, 1 if name == 'wifi reconnected' else 0))
+                    for name, cmd, check in batch.steps)
+
+    monkeypatch.setattr(executor, 'run_batch', run_batch)
+    with pytest.raises(Exception, match='Failed to connect to wifi ssid'):
+        executor.prepare_wlan_station('st', 'root', 'pass', 'lab')
+    with pytest.raises(Exception, match='Failed to connect to wifi ssid'):
+        executor.wifi_reconnect('st', 'root', 'pass', 'lab')
+    assert executor.get_applied('ssid', 'st') is None
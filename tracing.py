@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+# global imports
+import os
+import json
+import time
+import threading
+import contextlib
+
+
+# what a disabled tracer hands out for every span, nothing is allocated per call
+NO_SPAN = contextlib.nullcontext()
+
+
+class Tracer(object):
+    # complete spans of all threads, exported as Chrome trace-event json (chrome://tracing, Perfetto) and
+    # aggregated per phase (category/name); while disabled every span is the shared NO_SPAN
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.threads = {}
+        self.lock = threading.Lock()
+        self.t0 = time.monotonic()
+
+    def enable(self):
+        with self.lock:
+            self.enabled = True
+            self.events = []
+            self.threads = {}
+            self.t0 = time.monotonic()
+
+    def span(self, cat, name, **args):
+        if not self.enabled:
+            return NO_SPAN
+        return self.timed_span(cat, name, args)
+
+    @contextlib.contextmanager
+    def timed_span(self, cat, name, args):
+        t1 = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(cat, name, t1, time.monotonic() - t1, args)
+
+    def record(self, cat, name, start, elapsed, args=None):
+        thread = threading.current_thread()
+        with self.lock:
+            self.threads[thread.ident] = thread.name
+            self.events.append((cat, name, start - self.t0, elapsed, thread.ident, args or {}))
+
+    def export_chrome(self, fn):
+        pid = os.getpid()
+        with self.lock:
+            events = list(self.events)
+            threads = dict(self.threads)
+        trace = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                 for tid, name in threads.items()]
+        for cat, name, start, elapsed, tid, args in events:
+            trace.append({'name': name, 'cat': cat, 'ph': 'X', 'pid': pid, 'tid': tid,
+                          'ts': round(start * 1e6, 1), 'dur': round(elapsed * 1e6, 1),
+                          'args': dict((k, str(v)) for k, v in args.items())})
+        with open(fn, 'w') as fh:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, fh)
+
+    def aggregate(self):
+        # [(category, name, count, total, mean, max)], the phases that took longest first
+        phases = {}
+        with self.lock:
+            for cat, name, start, elapsed, tid, args in self.events:
+                count, total, longest = phases.get((cat, name), (0, 0.0, 0.0))
+                phases[(cat, name)] = (count + 1, total + elapsed, max(longest, elapsed))
+        rows = [(cat, name, count, total, total / count, longest)
+                for (cat, name), (count, total, longest) in phases.items()]
+        return sorted(rows, key=lambda row: (-row[3], row[0], row[1]))
+
+    def report(self):
+        wall = time.monotonic() - self.t0
+        lines = ["{:<12} {:<36} {:>7} {:>11} {:>9} {:>9} {:>7}".format('category', 'phase', 'count', 'total [sec]',
+                                                                         'mean', 'max', 'wall %')]
+        for cat, name, count, total, mean, longest in self.aggregate():
+            lines.append("{:<12} {:<36} {:>7} {:>11.3f} {:>9.3f} {:>9.3f} {:>7.1f}".format(
+                cat, name[:36], count, total, mean, longest, 100.0 * total / wall if wall else 0.0))
+        return lines
+
+
+tracer = Tracer()
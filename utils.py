@@ -1,13 +1,14 @@
-import ssl
+import os
 import sys
 import time
-import json
-import urllib.request
-import urllib.parse
-import serial
-import paramiko
+import threading
 #import wmi
 import logging
+# local imports
+import ssh_pool
+import http_client
+import serial_console
+import tracing
 
 
 logger = logging.getLogger()
@@ -19,18 +20,22 @@ logger.setLevel(logging.DEBUG)
 
 
 class Utils(object):
+    ssh_pool = ssh_pool.SshSessionPool()
+    http_client = http_client.HttpClient()
+    serial_consoles = {}
+    serial_lock = threading.Lock()
+    probe_stats = {}
+    probe_lock = threading.Lock()
+
     @classmethod
     def write2file(cls, fn, mode, data, sep='\n'):
         with open(fn, mode=mode) as data_file:
             data_file.write(data + sep)
 
     @classmethod
-    def get_data_from_url(cls, url):
+    def get_data_from_url(cls, url, timeout=None):
         try:
-            context = ssl._create_unverified_context()
-            req = urllib.request.Request(url)
-            with urllib.request.urlopen(req, context=context) as response:
-                data = json.loads(response.read().decode('utf8'))
+            data = cls.http_client.get_json(url, timeout=timeout)
         except Exception as err:
             err_msg = "An error occurred during attempt to retrieve data from {}:\n{}".format(url, str(err))
             print(err_msg)
@@ -58,38 +63,105 @@ class Utils(object):
     def log(cls, log_level, msg):
         logger.log(log_level, msg)
 
+    @classmethod
+    def get_serial_console(cls, port, baudrate):
+        with cls.serial_lock:
+            if port not in cls.serial_consoles:
+                cls.serial_consoles[port] = serial_console.SerialConsole(port, baudrate)
+            return cls.serial_consoles[port]
+
     @classmethod
     def write2serial(cls, port, baudrate, commands_list):
-        ser = serial.Serial(port, baudrate)
-        ser.isOpen()
-        for cmd in commands_list:
-            ser.write((cmd + '\r\n').encode())
-            user_info = 'Serial request: {}\tSerial response: '.format(cmd)
-            time.sleep(1)
-            while ser.inWaiting() > 0:
-                user_info += ser.read(1).decode('utf-8')
-            Utils.log(logging.DEBUG, user_info)
-        ser.close()
+        with tracing.tracer.span('serial', 'serial commands', port=port, commands=len(commands_list)):
+            return cls.get_serial_console(port, baudrate).send_all(commands_list)
+
+    @classmethod
+    def close_serial_consoles(cls):
+        with cls.serial_lock:
+            consoles = list(cls.serial_consoles.values())
+            cls.serial_consoles.clear()
+        for console in consoles:
+            console.close()
 
     @classmethod
     def run_cmd_via_ssh(cls, hostname, username, password, cmd, port=22, retry=True):
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        client.connect(hostname, port=port, username=username, password=password)
         for i in range(3):
             Utils.log(logging.DEBUG, "running '{}' on {} (try #{})".format(cmd, hostname, i))
-            stdin_, stdout_, stderr_ = client.exec_command(cmd)
-            rc = stdout_.channel.recv_exit_status()
-            stdout_, stderr_ = stdout_.read(), stderr_.read()
+            with tracing.tracer.span('ssh', 'ssh exec', host=hostname, cmd=cmd[:80]):
+                rc, stdout_, stderr_ = cls.ssh_pool.exec_command(hostname, username, password, cmd, port=port)
             Utils.log(logging.DEBUG, "stdout: {}\nstderr: {}".format(stdout_, stderr_))
             Utils.log(logging.DEBUG, "exit status: {}".format(rc))
             if rc == 0 or i == 2 or not retry:
                 break
-            Utils.log(logging.DEBUG, "waiting for 20sec before retry...")
-            time.sleep(20)
-        client.close()
+            backoff = min(2 ** (i + 1), 20)
+            Utils.log(logging.DEBUG, "waiting for {}sec before retry...".format(backoff))
+            with tracing.tracer.span('sleep', 'ssh retry backoff', host=hostname):
+                time.sleep(backoff)
+            cls.record_probe('ssh retry backoff', backoff, True)
         return rc, stdout_
 
+    @classmethod
+    def fetch_via_sftp(cls, hostname, username, password, files, port=22):
+        # files is a list of (remote path, local path), all of them go over one SFTP channel
+        fetched = []
+        sftp = cls.ssh_pool.open_sftp(hostname, username, password, port=port)
+        try:
+            with tracing.tracer.span('ssh', 'sftp fetch', host=hostname, files=len(files)):
+                for remote_path, local_path in files:
+                    try:
+                        sftp.get(remote_path, local_path)
+                    except IOError as err:
+                        Utils.log(logging.WARNING, "failed to fetch {} from {}: {}".format(remote_path, hostname, err))
+                        # paramiko creates the local file before it opens the remote one
+                        if os.path.isfile(local_path) and not os.path.getsize(local_path):
+                            os.remove(local_path)
+                        continue
+                    fetched.append(local_path)
+        finally:
+            sftp.close()
+        return fetched
+
+    @classmethod
+    def wait_until(cls, name, condition, timeout, interval=1.0):
+        # polls condition() until it holds or timeout expires, the time spent is recorded under name
+        t1 = time.monotonic()
+        while True:
+            try:
+                ready = bool(condition())
+            except Exception as err:
+                Utils.log(logging.DEBUG, "{}: probe failed: {}".format(name, err))
+                ready = False
+            elapsed = time.monotonic() - t1
+            if ready or elapsed >= timeout:
+                break
+            time.sleep(min(interval, timeout - elapsed))
+        cls.record_probe(name, elapsed, ready)
+        tracing.tracer.record('wait', name, t1, elapsed, {'ready': ready})
+        if ready:
+            Utils.log(logging.DEBUG, "{}: ready after {:.1f}sec".format(name, elapsed))
+        else:
+            Utils.log(logging.WARNING, "{}: not ready after {:.1f}sec, continuing".format(name, elapsed))
+        return ready
+
+    @classmethod
+    def record_probe(cls, name, elapsed, ready):
+        with cls.probe_lock:
+            count, total, longest, timeouts = cls.probe_stats.get(name, (0, 0.0, 0.0, 0))
+            cls.probe_stats[name] = (count + 1, total + elapsed, max(longest, elapsed), timeouts + (not ready))
+
+    @classmethod
+    def probe_report(cls):
+        with cls.probe_lock:
+            return ["{}: {} wait(s), total {:.1f}sec, avg {:.1f}sec, max {:.1f}sec, {} timeout(s)".format(
+                name, count, total, total / count, longest, timeouts)
+                for name, (count, total, longest, timeouts) in sorted(cls.probe_stats.items())]
+
+    @classmethod
+    def close_ssh_sessions(cls):
+        for line in cls.ssh_pool.report():
+            Utils.log(logging.INFO, "ssh stats: " + line)
+        cls.ssh_pool.close()
+
     @classmethod
     def wmi_connection(cls, server, username, password):
         Utils.log(logging.DEBUG, "attempting to connect with " + server + '...')
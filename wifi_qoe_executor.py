@@ -3,6 +3,7 @@
 # global imports
 import configparser
 import optparse
+import copy
 import os
 import os.path
 import datetime
@@ -10,120 +11,297 @@ import codecs
 import paramiko
 import logging
 import time
+import math
+import threading
+import re
+import urllib.parse
+import shlex
+from concurrent.futures import ThreadPoolExecutor
 # local imports
 import utils
+import rig_scheduler
+import mini_data_collector
+import campaign_planner
+import campaign_journal
+import iperf_results
+import iperf_monitor
+import remote_batch
+import serial_console
+import tracing
 
 
 class QoeExecutor(object):
-    def __init__(self, qoe_config, qoe_tests, delay):
+    def __init__(self, qoe_config, qoe_tests, delay, parallel_setup=False, force_reset=False, plan='file',
+                 dry_run=False, early_stop=False, journal=None, resume=False,
+                 index_file='result_index.db', trace_file=None, export_raw=True):
         self.conf_file = qoe_config
         self.tests_file = qoe_tests
         self.delay = delay
+        self.parallel_setup = parallel_setup
+        self.force_reset = force_reset
+        self.plan = plan
+        self.dry_run = dry_run
+        self.early_stop = early_stop
+        self.resume = resume
+        self.index_file = index_file
+        self.trace_file = trace_file
+        self.export_raw = export_raw
+        if self.trace_file:
+            tracing.tracer.enable()
+        # what was last applied to the hardware, keyed by ('channel', serial port), ('ssid', host) and
+        # ('iperf_server', host); deliberately shared by all rigs since the keys are physical resources, so every
+        # access goes through state_lock
+        self.applied_state = {}
+        self.state_lock = threading.Lock()
+        # host -> whether its iperf3 has --json-stream, shared like applied_state
+        self.iperf_live = {}
         parser = configparser.SafeConfigParser()
         with codecs.open(self.conf_file, 'r', encoding='utf-8') as f:
             parser.readfp(f)
         QoeExecutor.read_config(parser)
+        self.planner_costs = campaign_planner.ScenarioPlanner.read_costs(parser)
+        self.rig_name = 'DEFAULT'
         self.start = datetime.datetime.now().time()
         self.stop = self.start
         self.test_case_number = 0
+        self.scenario_results = {}
         now = datetime.datetime.now()
         day = str(now.day).zfill(2)
         month = str(now.month).zfill(2)
         self.system_date = "{}{}{}".format(month, day, now.year)
         self.utils = utils.Utils()
-        try:
-            self.vcaf_version = self.utils.get_data_from_url('http://192.168.1.1:8443/management/framework_version')['framework_version']['release']
-        except:
-            self.vcaf_version = 'N/A'
+        self.vcaf_version = 'N/A'
+        # a dry run only plans, it does not need the gateway
+        if not self.dry_run:
+            try:
+                self.vcaf_version = self.utils.get_data_from_url(urllib.parse.urljoin(self.url, '/management/framework_version'))['framework_version']['release']
+            except:
+                pass
         self.work_dir = self.system_date + '_' + self.vcaf_version
+        # the journal lives in the work dir of the campaign unless an explicit path is given, e.g. to resume a
+        # campaign of an earlier day
+        self.journal = campaign_journal.CampaignJournal(journal or os.path.join(self.work_dir, 'campaign_journal.jsonl'))
+        if self.resume:
+            campaign = self.journal.load()
+            if campaign:
+                # results of the resumed campaign go to its original directory even on a later day
+                self.work_dir = campaign['work_dir']
+                self.utils.log(logging.INFO, "resuming campaign {} from {}: {}".format(
+                    self.work_dir, self.journal.path, self.journal.counts()))
+            else:
+                self.utils.log(logging.WARNING, "no campaign in {}, starting a new one".format(self.journal.path))
+                self.resume = False
+        self.rigs = self.read_rigs(parser)
+        if self.resume:
+            # the reboot every 5th scenario keeps its cadence across the interruption
+            for rig in self.rigs:
+                rig.test_case_number = self.journal.finished(rig.rig_name)
+
+    CONFIG_KEYS = ['dut_st_lan', 'dut_st_lan_mng_ip', 'dut_st_lan_ip', 'dut_st_lan_user', 'dut_st_lan_pass',
+                   'dut_st_wlan', 'dut_st_wlan_mng_ip', 'dut_st_wlan_ip', 'dut_st_wlan_user', 'dut_st_wlan_pass',
+                   'dut_serial_com', 'dut_ssid', 'dut_wlan_pass',
+                   'int_st_lan', 'int_st_lan_mng_ip', 'int_st_lan_ip', 'int_st_lan_user', 'int_st_lan_pass',
+                   'int_st_wlan', 'int_st_wlan_mng_ip', 'int_st_wlan_ip', 'int_st_wlan_user', 'int_st_wlan_pass',
+                   'int_serial_com', 'int_ssid', 'int_wlan_pass',
+                   'duration', 'tolerance', 'period', 'url', 'iperf_path', 'iperf_results_dir']
+
+    # keys that may be left out of the configuration file, with their defaults
+    OPTIONAL_CONFIG_KEYS = {'ssh_port': '22'}
+
+    # hardware a scenario occupies exclusively; rigs sharing any of these never run at the same time
+    RESOURCE_KEYS = ['dut_st_lan_mng_ip', 'dut_st_wlan_mng_ip', 'int_st_lan_mng_ip', 'int_st_wlan_mng_ip',
+                     'dut_serial_com', 'int_serial_com', 'url']
+
+    # from wherever the router console is, back to its login and logged in again; a login ends at the shell prompt
+    SERIAL_LOGIN = ['exit', 'exit', 'exit'] + [('admin\radmin\radmin', serial_console.SerialConsole.SHELL_PROMPT)] * 4
+
+    # readiness probe timeouts [sec]
+    REBOOT_DOWN_TIMEOUT = 120
+    REBOOT_UP_TIMEOUT = 360
+    WIFI_TIMEOUT = 30
+    IPERF_TIMEOUT = 10
+    IPERF_PORT = 5201
+    # [sec] an iperf client outlasts the collection window by, covering the start of the other side's client
+    IPERF_END_MARGIN = 5
+    # first iperf3 release with --json-stream
+    IPERF_JSON_STREAM_VERSION = (3, 17)
+    # a scenario whose iperf stream exits, stalls or collapses is started over this many times
+    IPERF_RESTARTS = 1
 
     @classmethod
     def read_config(cls, parser):
-        cls.dut_st_lan = parser.get('DEFAULT', 'dut_st_lan')
-        cls.dut_st_lan_mng_ip = parser.get('DEFAULT', 'dut_st_lan_mng_ip')
-        cls.dut_st_lan_ip = parser.get('DEFAULT', 'dut_st_lan_ip')
-        cls.dut_st_lan_user = parser.get('DEFAULT', 'dut_st_lan_user')
-        cls.dut_st_lan_pass = parser.get('DEFAULT', 'dut_st_lan_pass')
-        cls.dut_st_wlan = parser.get('DEFAULT', 'dut_st_wlan')
-        cls.dut_st_wlan_mng_ip = parser.get('DEFAULT', 'dut_st_wlan_mng_ip')
-        cls.dut_st_wlan_ip = parser.get('DEFAULT', 'dut_st_wlan_ip')
-        cls.dut_st_wlan_user = parser.get('DEFAULT', 'dut_st_wlan_user')
-        cls.dut_st_wlan_pass = parser.get('DEFAULT', 'dut_st_wlan_pass')
-        cls.dut_serial_com = parser.get('DEFAULT', 'dut_serial_com')
-        cls.dut_ssid = parser.get('DEFAULT', 'dut_ssid')
-        cls.dut_wlan_pass = parser.get('DEFAULT', 'dut_wlan_pass')
-        cls.int_st_lan = parser.get('DEFAULT', 'int_st_lan')
-        cls.int_st_lan_mng_ip = parser.get('DEFAULT', 'int_st_lan_mng_ip')
-        cls.int_st_lan_ip = parser.get('DEFAULT', 'int_st_lan_ip')
-        cls.int_st_lan_user = parser.get('DEFAULT', 'int_st_lan_user')
-        cls.int_st_lan_pass = parser.get('DEFAULT', 'int_st_lan_pass')
-        cls.int_st_wlan = parser.get('DEFAULT', 'int_st_wlan')
-        cls.int_st_wlan_mng_ip = parser.get('DEFAULT', 'int_st_wlan_mng_ip')
-        cls.int_st_wlan_ip = parser.get('DEFAULT', 'int_st_wlan_ip')
-        cls.int_st_wlan_user = parser.get('DEFAULT', 'int_st_wlan_user')
-        cls.int_st_wlan_pass = parser.get('DEFAULT', 'int_st_wlan_pass')
-        cls.int_serial_com = parser.get('DEFAULT', 'int_serial_com')
-        cls.int_ssid = parser.get('DEFAULT', 'int_ssid')
-        cls.int_wlan_pass = parser.get('DEFAULT', 'int_wlan_pass')
-        cls.duration = parser.get('DEFAULT', 'duration')
-        cls.tolerance = parser.get('DEFAULT', 'tolerance')
-        cls.period = parser.get('DEFAULT', 'period')
-        cls.url = parser.get('DEFAULT', 'url')
-        cls.iperf_path = parser.get('DEFAULT', 'iperf_path')
-        cls.iperf_results_dir = parser.get('DEFAULT', 'iperf_results_dir')
+        for key in cls.CONFIG_KEYS:
+            setattr(cls, key, parser.get('DEFAULT', key))
+        for key, default in cls.OPTIONAL_CONFIG_KEYS.items():
+            setattr(cls, key, parser.get('DEFAULT', key, fallback=default))
+
+    def read_rigs(self, parser):
+        # [DEFAULT] is the first rig, every [rig...] section adds one more; unset keys come from [DEFAULT]
+        rigs = [self]
+        for section in parser.sections():
+            if not section.startswith('rig'):
+                continue
+            # configuration, utils, journal, applied_state and iperf_live are shared, results and counters are per rig
+            rig = copy.copy(self)
+            rig.rig_name = section
+            rig.test_case_number = 0
+            rig.scenario_results = {}
+            for key in QoeExecutor.CONFIG_KEYS:
+                setattr(rig, key, parser.get(section, key))
+            for key, default in QoeExecutor.OPTIONAL_CONFIG_KEYS.items():
+                setattr(rig, key, parser.get(section, key, fallback=default))
+            rigs.append(rig)
+        return rigs
+
+    def get_resources(self):
+        return [getattr(self, key) for key in QoeExecutor.RESOURCE_KEYS]
 
     def exit_when_done(self):
         msg = "Start time: {}\nEnd time: {}\nExiting...".format(self.start, self.stop)
         self.utils.exit_when_done(msg)
 
     def reboot_routers_via_serial_com(self):
-        cmds_list = ['exit', 'exit', 'exit', 'admin\radmin\radmin', 'admin\radmin\radmin', 'admin\radmin\radmin',
-                     'admin\radmin\radmin', 'system reboot']
-        self.utils.write2serial(self.dut_serial_com, 115200, cmds_list)
-        self.utils.write2serial(self.int_serial_com, 115200, cmds_list)
-        time.sleep(360)
+        with tracing.tracer.span('step', 'reboot', rig=self.rig_name):
+            self.reboot_routers()
+
+    def reboot_routers(self):
+        cmds_list = self.SERIAL_LOGIN + ['system reboot']
+        self.run_dut_and_int_side((self.utils.write2serial, self.dut_serial_com, 115200, cmds_list),
+                                  (self.utils.write2serial, self.int_serial_com, 115200, cmds_list))
+        self.forget_state()
+        # the interferer has no management url, its readiness is covered by the wifi probes of the next scenario
+        if self.utils.wait_until('gateway going down', lambda: not self.is_gateway_up(), self.REBOOT_DOWN_TIMEOUT, 2):
+            self.utils.wait_until('gateway reboot', self.is_gateway_up, self.REBOOT_UP_TIMEOUT, 5)
+
+    def forget_state(self):
+        # after a reboot nothing applied to this rig can be trusted any more
+        hosts = [self.int_serial_com, self.dut_st_wlan_mng_ip, self.int_st_wlan_mng_ip,
+                 self.dut_st_lan_mng_ip, self.int_st_lan_mng_ip]
+        with self.state_lock:
+            for key in list(self.applied_state):
+                if key[1] in hosts:
+                    del self.applied_state[key]
+
+    def get_applied(self, kind, resource):
+        with self.state_lock:
+            return self.applied_state.get((kind, resource))
+
+    def set_applied(self, kind, resource, value):
+        # None forgets the state, e.g. while a step that changes it is running
+        with self.state_lock:
+            if value is None:
+                self.applied_state.pop((kind, resource), None)
+            else:
+                self.applied_state[(kind, resource)] = value
+
+    def is_gateway_up(self):
+        # a rebooting gateway refuses connections or answers with an error status, both mean down
+        url = urllib.parse.urljoin(self.url, '/management/framework_version')
+        try:
+            return bool(self.utils.http_client.get_json(url, timeout=2))
+        except Exception:
+            return False
 
     def set_interferrer_2_4_channel(self, int_channel):
-        cmds_list = ['exit', 'exit', 'exit', 'admin\radmin\radmin', 'admin\radmin\radmin', 'admin\radmin\radmin',
-                     'admin\radmin\radmin',
-                     'cwmp set_params InternetGatewayDevice.LANDevice.5.WLANConfiguration.9.Channel {}'.format(
-                         int_channel)]
-        self.utils.write2serial(self.int_serial_com, 115200, cmds_list)
+        if not self.force_reset and self.get_applied('channel', self.int_serial_com) == int_channel:
+            self.utils.log(logging.INFO, "interferer already on channel {}, skipping".format(int_channel))
+            return
+        cmds_list = self.SERIAL_LOGIN + [
+            ('cwmp set_params InternetGatewayDevice.LANDevice.5.WLANConfiguration.9.Channel {}'.format(int_channel),
+             serial_console.SerialConsole.SHELL_PROMPT)]
+        self.set_applied('channel', self.int_serial_com, None)
+        response, matched = self.utils.write2serial(self.int_serial_com, 115200, cmds_list)[-1]
+        # the channel is only known to be set once the router answered the command with its shell prompt
+        if matched:
+            self.set_applied('channel', self.int_serial_com, int_channel)
+        else:
+            self.utils.log(logging.WARNING, "no prompt after setting channel {} on {}: {}".format(
+                int_channel, self.int_serial_com, response.strip()))
+
+    def run_batch(self, host_name, user_name, password, batch):
+        results = batch.run(self.utils, host_name, user_name, password, int(self.ssh_port))
+        for name in batch.waits:
+            self.utils.record_probe(name, results[name].elapsed, results[name].ok)
+        return results
+
+    def add_start_iperf_server_steps(self, batch):
+        batch.add('start iperf server', "/usr/bin/nohup {} -s  > /dev/null 2>&1 &".format(self.iperf_path), check=True)
+        batch.add_wait('iperf server listening',
+                       "(ss -ltn 2>/dev/null || netstat -ltn 2>/dev/null) | grep -q ':{} '".format(self.IPERF_PORT),
+                       self.IPERF_TIMEOUT, 0.5)
+
+    def add_stop_iperf_steps(self, batch):
+        batch.add('stop iperf', "/usr/bin/killall iperf3")
+        batch.add_wait('iperf stopped', "! /usr/bin/pgrep -x iperf3", self.IPERF_TIMEOUT, 0.5)
+
+    def add_wifi_reconnect_steps(self, batch, ssid):
+        batch.add('wifi reconnect', "/bin/bash /qoe/wifi-reconnect.sh")
+        batch.add_wait('wifi reconnected', '[ "$(/sbin/iwgetid -r)" = {} ]'.format(shlex.quote(ssid)),
+                       self.WIFI_TIMEOUT, 1)
 
     def start_iperf_server(self, host_name, user_name, password):
-        cmd = "/usr/bin/nohup {} -s  > /dev/null 2>&1 &".format(self.iperf_path)
-        rc, stdout_ = self.utils.run_cmd_via_ssh(host_name, user_name, password, cmd)
-        if rc:
+        batch = remote_batch.RemoteBatch()
+        self.add_start_iperf_server_steps(batch)
+        results = self.run_batch(host_name, user_name, password, batch)
+        if not results['start iperf server'].ok:
             raise Exception("Failed to start iperf server on {}\nExiting...".format(host_name))
+        if results['iperf server listening'].ok:
+            self.set_applied('iperf_server', host_name, True)
+
+    def get_iperf_result_path(self, work_dir, scenario_id, fn_suf):
+        return self.iperf_results_dir + '/' + work_dir + "/{}_{}".format(scenario_id, fn_suf)
+
+    def has_iperf_json_stream(self, host_name, user_name, password):
+        with self.state_lock:
+            if host_name in self.iperf_live:
+                return self.iperf_live[host_name]
+        rc, stdout_ = self.utils.run_cmd_via_ssh(host_name, user_name, password, "{} --version".format(self.iperf_path),
+                                                 int(self.ssh_port), retry=False)
+        match = re.search(rb'iperf (\d+)\.(\d+)', stdout_) if rc == 0 else None
+        live = match is not None and (int(match.group(1)), int(match.group(2))) >= self.IPERF_JSON_STREAM_VERSION
+        if not live:
+            self.utils.log(logging.WARNING, "{}: iperf3 without --json-stream ({}), its streams are not monitored "
+                                            "live".format(host_name, stdout_.decode('utf-8', 'replace').strip()
+                                                          .split('\n')[0] or 'rc {}'.format(rc)))
+        with self.state_lock:
+            self.iperf_live[host_name] = live
+        return live
 
-    def start_iperf_client(self, host_name, user_name, password, data, work_dir, scenario_id, fn_suf, st_lan_ip):
+    def collection_window(self):
+        # the collector samples until the first tick at or past the duration
+        return int(math.ceil(math.ceil(int(self.duration) / float(self.period)) * float(self.period)))
+
+    def start_iperf_client(self, host_name, user_name, password, data, work_dir, scenario_id, fn_suf, st_lan_ip,
+                           name='dut'):
         dest_dir = self.iperf_results_dir + '/' + work_dir
-        cmd = "/usr/bin/test -d {} || /bin/mkdir -p {}".format(dest_dir, dest_dir)
-        rc, stdout_ = self.utils.run_cmd_via_ssh(host_name, user_name, password, cmd)
-        if rc: raise Exception("Failed to run '{}' on {}\nExiting...".format(cmd, host_name))
-        fn = dest_dir + "/{}_{}".format(scenario_id, fn_suf)
-        cmd = "/usr/bin/nohup {} -c {} -t {} -u -i 1 --get-server-output -b {}K   > {} 2>&1 &".format(self.iperf_path,
-                                                                                                      st_lan_ip,
-                                                                                                      self.duration,
-                                                                                                      data, fn)
-        rc, stdout_ = self.utils.run_cmd_via_ssh(host_name, user_name, password, cmd)
-        time.sleep(5)
+        fn = self.get_iperf_result_path(work_dir, scenario_id, fn_suf)
+        # the client runs in the foreground of its own ssh channel just past the collection window, so it ends on
+        # its own and its last report carries the server's loss and jitter; the output is tee'd into the result
+        # file (pipefail keeps iperf3's exit status) and, with --json-stream, read live by the IperfMonitor
+        live = self.has_iperf_json_stream(host_name, user_name, password)
+        iperf_time = int(self.delay) + self.collection_window() + self.IPERF_END_MARGIN
+        iperf_cmd = "{} -c {} -t {} -u -i 1 {} --get-server-output -b {}K 2>&1 | /usr/bin/tee {}".format(
+            self.iperf_path, st_lan_ip, iperf_time, '--json-stream --forceflush' if live else '-J', data, fn)
+        cmd = "/bin/mkdir -p {} && /bin/bash -o pipefail -c {}".format(dest_dir, shlex.quote(iperf_cmd))
+        channel = self.utils.ssh_pool.open_channel(host_name, user_name, password, cmd, port=int(self.ssh_port))
+        monitor = iperf_monitor.IperfMonitor(name, host_name, channel, data, live=live).start()
+        self.utils.wait_until('iperf client running', monitor.is_running, self.IPERF_TIMEOUT, 0.5)
+        return monitor
 
     def stop_iperf(self, host_name, user_name, password):
-        cmd = "/usr/bin/killall iperf3"
-        rc, stdout_ = self.utils.run_cmd_via_ssh(host_name, user_name, password, cmd, retry=False)
-        time.sleep(3)
-        # if rc:
-        #    raise Exception("Failed to stop iperf on {}\nExiting...".format(host_name))
+        batch = remote_batch.RemoteBatch()
+        self.add_stop_iperf_steps(batch)
+        self.set_applied('iperf_server', host_name, None)
+        self.run_batch(host_name, user_name, password, batch)
 
     def connect_to_wifi_ssid(self, host, host_user, host_password, req_wifi_ssid, wlan_ssid_password):
         cmd = "/sbin/iwgetid -r"
-        rc, stdout_ = self.utils.run_cmd_via_ssh(host, host_user, host_password, cmd)
+        rc, stdout_ = self.utils.run_cmd_via_ssh(host, host_user, host_password, cmd, int(self.ssh_port))
         if rc:
             raise Exception("Failed to run '{}' on {}\nExiting...".format(cmd, host))
         if stdout_.strip() != req_wifi_ssid:
             cmd = "/usr/bin/nmcli dev wifi connect {} password {}".format(req_wifi_ssid, wlan_ssid_password)
-            rc, stdout_ = self.utils.run_cmd_via_ssh(host, host_user, host_password, cmd)
+            rc, stdout_ = self.utils.run_cmd_via_ssh(host, host_user, host_password, cmd, int(self.ssh_port))
             if rc:
                 raise Exception("Failed to connect to wifi ssid {} on {}\nExiting...".format(req_wifi_ssid, host))
 
@@ -137,70 +315,242 @@ class QoeExecutor(object):
             # [test id, dut_channel, dut_data, int_channel, int_data]
             yield ret_val
 	
-    def wifi_reconnect(self, host, host_user, host_password):
-        cmd = "/bin/bash /qoe/wifi-reconnect.sh"
-        rc, stdout_ = self.utils.run_cmd_via_ssh(host, host_user, host_password, cmd)
-        time.sleep(10)
+    def wifi_reconnect(self, host, host_user, host_password, ssid):
+        batch = remote_batch.RemoteBatch()
+        self.add_wifi_reconnect_steps(batch, ssid)
+        self.set_applied('ssid', host, None)
+        if not self.run_batch(host, host_user, host_password, batch)['wifi reconnected'].ok:
+            raise Exception("Failed to connect to wifi ssid {} on {}\nExiting...".format(ssid, host))
+        self.set_applied('ssid', host, ssid)
 
-    def run_scenario(self, dut_data, dut_channel, int_data, int_channel, test_id):
-        scenario_id = "TP{}_dut_ch{}_{}_int_ch{}_{}".format(test_id, dut_channel, dut_data, int_channel, int_data)
-        self.stop_iperf(self.dut_st_wlan_mng_ip,self.dut_st_wlan_user, self.dut_st_wlan_pass)
-        self.wifi_reconnect(self.dut_st_wlan_mng_ip, self.dut_st_wlan_user, self.dut_st_wlan_pass)
-        self.start_iperf_server(self.dut_st_wlan_mng_ip, self.dut_st_wlan_user, self.dut_st_wlan_pass)
+    def prepare_wlan_station(self, host, host_user, host_password, ssid):
+        # the iperf server keeps running between scenarios, so a station that is still associated with its ssid
+        # and serving iperf needs no restart
+        if not self.force_reset and self.get_applied('ssid', host) == ssid and \
+                self.get_applied('iperf_server', host):
+            self.utils.log(logging.INFO, "{} already connected to {} with iperf server running, skipping".format(host, ssid))
+            return
+        # stop iperf, reconnect and restart the iperf server in one round trip
+        batch = remote_batch.RemoteBatch()
+        self.add_stop_iperf_steps(batch)
+        self.add_wifi_reconnect_steps(batch, ssid)
+        self.add_start_iperf_server_steps(batch)
+        self.set_applied('iperf_server', host, None)
+        self.set_applied('ssid', host, None)
+        results = self.run_batch(host, host_user, host_password, batch)
+        if not results['wifi reconnected'].ok:
+            raise Exception("Failed to connect to wifi ssid {} on {}\nExiting...".format(ssid, host))
+        self.set_applied('ssid', host, ssid)
+        if not results['start iperf server'].ok:
+            raise Exception("Failed to start iperf server on {}\nExiting...".format(host))
+        if results['iperf server listening'].ok:
+            self.set_applied('iperf_server', host, True)
+
+    def run_dut_and_int_side(self, dut_step, int_step):
+        # steps are (callable, args...); with --parallel-setup the two rigs are driven at the same time
+        if not self.parallel_setup:
+            return [self.run_step(*dut_step), self.run_step(*int_step)]
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix=self.rig_name) as pool:
+            futures = [pool.submit(self.run_step, *dut_step), pool.submit(self.run_step, *int_step)]
+        return [future.result() for future in futures]
+
+    def run_step(self, step, *args):
+        with tracing.tracer.span('step', step.__name__, rig=self.rig_name):
+            return step(*args)
+
+    def prepare_dut_side(self):
+        self.prepare_wlan_station(self.dut_st_wlan_mng_ip, self.dut_st_wlan_user, self.dut_st_wlan_pass, self.dut_ssid)
+
+    def prepare_int_side(self, int_channel):
+        self.set_interferrer_2_4_channel(int_channel)
+        self.prepare_wlan_station(self.int_st_wlan_mng_ip, self.int_st_wlan_user, self.int_st_wlan_pass, self.int_ssid)
+
+    def start_dut_client(self, dut_data, scenario_id):
         if dut_data > 0:
-            self.start_iperf_client(self.dut_st_lan_mng_ip, self.dut_st_lan_user, self.dut_st_lan_pass, dut_data,
-                                    self.work_dir, scenario_id, 'iperf3_dut_st_wlan.log', self.dut_st_wlan_ip)
-        self.stop_iperf(self.int_st_wlan_mng_ip, self.int_st_wlan_user, self.int_st_wlan_pass)
-        self.wifi_reconnect(self.int_st_wlan_mng_ip, self.int_st_wlan_user, self.int_st_wlan_pass)
-        self.start_iperf_server(self.int_st_wlan_mng_ip, self.int_st_wlan_user, self.int_st_wlan_pass)
+            return self.start_iperf_client(self.dut_st_lan_mng_ip, self.dut_st_lan_user, self.dut_st_lan_pass,
+                                           dut_data, self.work_dir, scenario_id, 'iperf3_dut_st_wlan.json',
+                                           self.dut_st_wlan_ip, 'dut')
+
+    def start_int_client(self, int_data, scenario_id):
         if int_data > 0:
-            self.start_iperf_client(self.int_st_lan_mng_ip, self.int_st_lan_user, self.int_st_lan_pass, int_data,
-                                    self.work_dir, scenario_id, 'iperf3_int_st_wlan.log', self.int_st_wlan_ip)
-
-        cmd = "python mini_data_collector.py --dut-bitrate {} ".format(dut_data)
-        cmd += "--external-ap-load {} ".format(int_data)
-        cmd += "--external-ap-channel {} ".format(int_channel)
-        cmd += "--duration {} ".format(self.duration)
-        cmd += "--period {} ".format(self.period)
-        cmd += "--tolerance {} ".format(self.tolerance)
-        cmd += "--url {} ".format(self.url)
-        cmd += "--output {}/{}".format(self.work_dir, scenario_id)
-        if not os.path.exists(self.work_dir):
-            os.makedirs(self.work_dir)
+            return self.start_iperf_client(self.int_st_lan_mng_ip, self.int_st_lan_user, self.int_st_lan_pass,
+                                           int_data, self.work_dir, scenario_id, 'iperf3_int_st_wlan.json',
+                                           self.int_st_wlan_ip, 'int')
+
+    @classmethod
+    def get_scenario_id(cls, test_data_list):
+        return "TP{}_dut_ch{}_{}_int_ch{}_{}".format(*test_data_list[:5])
+
+    def run_scenario(self, dut_data, dut_channel, int_data, int_channel, test_id):
+        scenario_id = QoeExecutor.get_scenario_id([test_id, dut_channel, dut_data, int_channel, int_data])
+        for attempt in range(self.IPERF_RESTARTS + 1):
+            try:
+                return self.run_scenario_once(dut_data, dut_channel, int_data, int_channel, scenario_id)
+            except iperf_monitor.IperfStreamError as err:
+                if attempt == self.IPERF_RESTARTS:
+                    self.utils.log(logging.ERROR, "data collection for {} failed: {}".format(scenario_id, err))
+                    return None
+                self.utils.log(logging.WARNING, "{}: {}, restarting the scenario...".format(scenario_id, err))
+
+    def run_scenario_once(self, dut_data, dut_channel, int_data, int_channel, scenario_id):
+        self.run_dut_and_int_side((self.prepare_dut_side,), (self.prepare_int_side, int_channel))
+        # both clients start once both sides are ready, so that their time covers the same collection window
+        monitors = [monitor for monitor in
+                    self.run_dut_and_int_side((self.start_dut_client, dut_data, scenario_id),
+                                              (self.start_int_client, int_data, scenario_id))
+                    if monitor is not None]
+
+        collector = mini_data_collector.Tool(url_val=self.url, period_val=float(self.period),
+                                             output_file_val=os.path.join(self.work_dir, scenario_id),
+                                             dut_bitrate=dut_data, external_ap_load=int_data,
+                                             external_ap_channel=int_channel, tolerance=float(self.tolerance),
+                                             duration=int(self.duration), early_stop=self.early_stop,
+                                             export_raw=self.export_raw, index_file=self.index_file, monitors=monitors)
+        os.makedirs(self.work_dir, exist_ok=True)
 
         self.utils.log(logging.INFO, "waiting for {}sec before data collection...".format(self.delay))
-        time.sleep(self.delay)
+        with tracing.tracer.span('sleep', 'delay before collection', rig=self.rig_name):
+            time.sleep(self.delay)
+
+        self.utils.log(logging.INFO, "collecting data for {}...".format(scenario_id))
+        stream_error = None
+        try:
+            with tracing.tracer.span('collector', 'collect', rig=self.rig_name, scenario=scenario_id):
+                results = collector.collect()
+        except iperf_monitor.IperfStreamError as err:
+            stream_error = err
+            results = None
+        except Exception as err:
+            self.utils.log(logging.ERROR, "data collection for {} failed: {}".format(scenario_id, err))
+            results = None
+        self.scenario_results[scenario_id] = results
+
+        for monitor in monitors:
+            monitor.stop()
+        if results is not None and not collector.early_stopped:
+            self.utils.wait_until('iperf client finished', lambda: all(monitor.is_done() for monitor in monitors),
+                                  self.IPERF_END_MARGIN + self.IPERF_TIMEOUT, 0.5)
+        elif monitors and stream_error is None:
+            self.utils.log(logging.INFO, "stopping the iperf clients before their end, {} has no loss and jitter "
+                                         "of the servers".format(scenario_id))
+
+        self.run_dut_and_int_side((self.stop_iperf, self.dut_st_lan_mng_ip, self.dut_st_lan_user, self.dut_st_lan_pass),
+                                  (self.stop_iperf, self.int_st_lan_mng_ip, self.int_st_lan_user, self.int_st_lan_pass))
+        for monitor in monitors:
+            monitor.close()
+        if stream_error is not None:
+            raise stream_error
+        if results is not None:
+            with tracing.tracer.span('step', 'fetch_iperf_results', rig=self.rig_name):
+                sides = self.fetch_iperf_results(scenario_id, dut_data, int_data)
+            if sides:
+                results['iperf'] = collector.join_iperf(sides)
+        return results
 
-        rc = os.system(cmd)
-        # if rc:
-        #    raise Exception("mini_data_collector script finished with error code {}\nExiting...".format(rc))
+    def fetch_iperf_results(self, scenario_id, dut_data, int_data):
+        # the finished iperf3 json files are copied next to the summaries and parsed into per second series
+        sides = []
+        for name, host_name, user_name, password, data, fn_suf in [
+                ('dut', self.dut_st_lan_mng_ip, self.dut_st_lan_user, self.dut_st_lan_pass, dut_data,
+                 'iperf3_dut_st_wlan.json'),
+                ('int', self.int_st_lan_mng_ip, self.int_st_lan_user, self.int_st_lan_pass, int_data,
+                 'iperf3_int_st_wlan.json')]:
+            if data <= 0:
+                continue
+            local_fn = os.path.join(self.work_dir, "{}_{}".format(scenario_id, fn_suf))
+            remote_fn = self.get_iperf_result_path(self.work_dir, scenario_id, fn_suf)
+            try:
+                fetched = self.utils.fetch_via_sftp(host_name, user_name, password, [(remote_fn, local_fn)],
+                                                    int(self.ssh_port))
+            except Exception as err:
+                self.utils.log(logging.WARNING, "failed to fetch iperf results from {}: {}".format(host_name, err))
+                continue
+            if fetched:
+                sides.append((name, data, iperf_results.IperfResults.parse(iperf_results.IperfResults.load(local_fn))))
+        return sides
+
+    def run_test(self, test_data_list):
+        test_id, dut_channel, dut_data, int_channel, int_data = test_data_list[0], test_data_list[1], \
+                                                                test_data_list[2], test_data_list[3], \
+                                                                test_data_list[4]
+        # test id, dut_channel, dut_data, int_channel, int_data]
+        self.utils.log(logging.INFO, "rig {}: running test {}".format(self.rig_name, test_id))
+        scenario_id = QoeExecutor.get_scenario_id(test_data_list)
+        started = time.time()
+        self.journal.scenario_started(scenario_id, self.rig_name)
+        try:
+            with tracing.tracer.span('scenario', 'scenario', rig=self.rig_name, scenario=scenario_id):
+                results = self.run_scenario(dut_data, dut_channel, int_data, int_channel, test_id)
+        except BaseException as err:
+            self.journal.scenario_finished(scenario_id, self.rig_name, started, [],
+                                           '{}: {}'.format(type(err).__name__, err))
+            raise
+        if results is None:
+            self.journal.scenario_finished(scenario_id, self.rig_name, started, [], 'data collection failed')
+        else:
+            self.journal.scenario_finished(scenario_id, self.rig_name, started,
+                                           [band['summary_file'] for band in results['bands'].values()])
+        self.test_case_number += 1
+        if self.test_case_number % 5 == 0:
+            self.reboot_routers_via_serial_com()
 
-        self.utils.log(logging.INFO, "iperf client will be stopped in 3 sec...")
-        time.sleep(3)
+    def all_scenario_results(self):
+        results = {}
+        for rig in self.rigs:
+            results.update(rig.scenario_results)
+        return results
 
-        self.stop_iperf(self.dut_st_lan_mng_ip, self.dut_st_lan_user, self.dut_st_lan_pass)
-        self.stop_iperf(self.int_st_lan_mng_ip, self.int_st_lan_user, self.int_st_lan_pass)
+    def get_test_plan(self):
+        # one queue the rigs share, or with an optimized plan on several rigs one queue per rig
+        rows = list(self.get_qoe_tests_data_info())
+        if self.resume:
+            done = [row for row in rows if self.journal.is_done(QoeExecutor.get_scenario_id(row))]
+            rows = [row for row in rows if not self.journal.is_done(QoeExecutor.get_scenario_id(row))]
+            self.utils.log(logging.INFO, "skipping {} completed test(s), {} left".format(len(done), len(rows)))
+        planner = campaign_planner.ScenarioPlanner(self.duration, self.delay, costs=self.planner_costs)
+        if self.plan == 'optimized':
+            self.utils.log(logging.INFO, "estimated runtime in file order: {:.0f}sec".format(
+                planner.estimate(rows) / len(self.rigs)))
+            if len(self.rigs) > 1:
+                queues = planner.split(rows, len(self.rigs))
+                total = max(planner.log_plan(queue, 1, rig.rig_name) for rig, queue in zip(self.rigs, queues))
+                self.utils.log(logging.INFO, "estimated runtime: {:.0f}sec ({:.1f}h) on {} rig(s)".format(
+                    total, total / 3600.0, len(self.rigs)))
+                return queues
+            rows = planner.plan(rows)
+        planner.log_plan(rows, len(self.rigs))
+        return [rows]
 
     def run(self):
-        test_data_gen = self.get_qoe_tests_data_info()
+        queues = [iter(rows) for rows in self.get_test_plan()]
+        if self.dry_run:
+            return
+        if not self.resume:
+            os.makedirs(self.work_dir, exist_ok=True)
+            self.journal.start_campaign(self.work_dir, self.tests_file)
         try:
+            if len(self.rigs) > 1:
+                rig_scheduler.RigScheduler(self.rigs).run(queues)
+                return
             while True:
-                test_data_list = next(test_data_gen)
+                test_data_list = next(queues[0], [])
                 if len(test_data_list) == 0:
                     break
-                test_id, dut_channel, dut_data, int_channel, int_data = test_data_list[0], test_data_list[1], \
-                                                                        test_data_list[2], test_data_list[3], \
-                                                                        test_data_list[4]
-                # test id, dut_channel, dut_data, int_channel, int_data]
-                self.set_interferrer_2_4_channel(int_channel)
-                self.run_scenario(dut_data, dut_channel, int_data, int_channel, test_id)
-                self.test_case_number += 1
-                if self.test_case_number % 5 == 0:
-                    self.reboot_routers_via_serial_com()
+                self.run_test(test_data_list)
 
         finally:
-            self.stop_iperf(self.dut_st_wlan_mng_ip, self.dut_st_wlan_user, self.dut_st_wlan_pass)
-            self.stop_iperf(self.int_st_wlan_mng_ip, self.int_st_wlan_user, self.int_st_wlan_pass)
+            for rig in self.rigs:
+                rig.stop_iperf(rig.dut_st_wlan_mng_ip, rig.dut_st_wlan_user, rig.dut_st_wlan_pass)
+                rig.stop_iperf(rig.int_st_wlan_mng_ip, rig.int_st_wlan_user, rig.int_st_wlan_pass)
+            for line in self.utils.probe_report():
+                self.utils.log(logging.INFO, "readiness: " + line)
+            if self.trace_file:
+                tracing.tracer.export_chrome(self.trace_file)
+                self.utils.log(logging.INFO, "trace events written to {}".format(self.trace_file))
+                for line in tracing.tracer.report():
+                    self.utils.log(logging.INFO, "phases: " + line)
+            self.utils.close_ssh_sessions()
+            self.utils.close_serial_consoles()
 
 
 def main():
@@ -209,6 +559,28 @@ def main():
                       help='path to QoE executor configuration file, default: qoe_executor.cfg (optional)')
     parser.add_option('--tests', dest='qoe_tests', type="string", default='tests.csv',
                       help='path to QoE executor tests file, default: tests.csv (optional)')
+    parser.add_option('--parallel-setup', dest='parallel_setup', action='store_true', default=False,
+                      help='prepare the DUT and the interferer side of a scenario concurrently (optional)')
+    parser.add_option('--force-reset', dest='force_reset', action='store_true', default=False,
+                      help='reapply channel, wifi and iperf server state for every scenario even if unchanged (optional)')
+    parser.add_option('--plan', dest='plan', type="choice", choices=['file', 'optimized'], default='file',
+                      help='test order: file or optimized (grouped to minimize reconfiguration), default: file (optional)')
+    parser.add_option('--dry-run', dest='dry_run', action='store_true', default=False,
+                      help='only print the planned order and the estimated runtime (optional)')
+    parser.add_option('--early-stop', dest='early_stop', action='store_true', default=False,
+                      help='end a scenario before its duration once the pass/fail verdict is stable (optional)')
+    parser.add_option('--journal', dest='journal', type="string", default=None,
+                      help='campaign progress file, default: campaign_journal.jsonl in the work dir (optional)')
+    parser.add_option('--resume', dest='resume', action='store_true', default=False,
+                      help='continue the last campaign of --journal, by default the one of today\'s work dir: skip '
+                           'completed tests, rerun failed ones (optional)')
+    parser.add_option('--index', dest='index_file', type="string", default='result_index.db',
+                      help='SQLite result index the scenarios are registered in, default: result_index.db (optional)')
+    parser.add_option('--trace', dest='trace_file', type="string", default=None,
+                      help='write Chrome trace events of the campaign phases to this file and log a per phase '
+                           'timing table at the end (optional)')
+    parser.add_option('--no-export-raw', dest='export_raw', action='store_false', default=True,
+                      help='skip the raw per-endpoint .csv files of the scenarios, the summaries are kept (optional)')
     parser.add_option('--delay-before-start', dest='delay', type="int", default=0,
                       help='delay before data collection start, default 10sec (optional)')
     (opts, args) = parser.parse_args()
@@ -216,11 +588,25 @@ def main():
         "--config {} not a file or not exists.".format(opts.qoe_config)
     assert os.path.isfile(opts.qoe_tests) and os.path.exists(opts.qoe_tests), \
         "--tests {} not a file or not exists.".format(opts.qoe_tests)
-    qoe_executor = QoeExecutor(qoe_config=opts.qoe_config, qoe_tests=opts.qoe_tests, delay=opts.delay)
+    qoe_executor = QoeExecutor(qoe_config=opts.qoe_config, qoe_tests=opts.qoe_tests, delay=opts.delay,
+                               parallel_setup=opts.parallel_setup, force_reset=opts.force_reset, plan=opts.plan,
+                               dry_run=opts.dry_run, early_stop=opts.early_stop, journal=opts.journal,
+                               resume=opts.resume, index_file=opts.index_file, trace_file=opts.trace_file,
+                               export_raw=opts.export_raw)
     qoe_executor.utils.log(logging.INFO, "Running with arguments:")
     qoe_executor.utils.log(logging.INFO, "--config {}".format(qoe_executor.conf_file))
     qoe_executor.utils.log(logging.INFO, "--tests {}".format(qoe_executor.tests_file))
     qoe_executor.utils.log(logging.INFO, "--delay-before-start {}".format(qoe_executor.delay))
+    qoe_executor.utils.log(logging.INFO, "--parallel-setup {}".format(qoe_executor.parallel_setup))
+    qoe_executor.utils.log(logging.INFO, "--force-reset {}".format(qoe_executor.force_reset))
+    qoe_executor.utils.log(logging.INFO, "--plan {}".format(qoe_executor.plan))
+    qoe_executor.utils.log(logging.INFO, "--dry-run {}".format(qoe_executor.dry_run))
+    qoe_executor.utils.log(logging.INFO, "--early-stop {}".format(qoe_executor.early_stop))
+    qoe_executor.utils.log(logging.INFO, "--journal {}".format(qoe_executor.journal.path))
+    qoe_executor.utils.log(logging.INFO, "--resume {}".format(qoe_executor.resume))
+    qoe_executor.utils.log(logging.INFO, "--index {}".format(qoe_executor.index_file))
+    qoe_executor.utils.log(logging.INFO, "--trace {}".format(qoe_executor.trace_file))
+    qoe_executor.utils.log(logging.INFO, "--no-export-raw {}".format(not qoe_executor.export_raw))
     qoe_executor.utils.log(logging.INFO, "(Ctrl+C to exit)\n")
     try:
         qoe_executor.run()